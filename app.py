@@ -2,28 +2,50 @@ import os
 from fastapi import FastAPI, File, UploadFile, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
-from anthropic import Anthropic
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse, Response
+from anthropic import AsyncAnthropic
 from pyzerox import zerox
 from pyzerox.core.types import Page
-from pyzerox.models.modellitellm import litellmmodel
+from pyzerox.models import model_registry
 import asyncio
 import tempfile
 import json
 import logging
-from typing import List, Dict, Any, AsyncGenerator
+from typing import List, Dict, Any, AsyncGenerator, Callable, Optional
 from PIL import Image
 import io
 from fastapi.middleware.gzip import GZipMiddleware
 import uuid
 import shutil
+import functools
+import time
 from pathlib import Path
+from contextlib import asynccontextmanager, contextmanager
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+# Vision model used for OCR, shared through the model registry
+OCR_MODEL = "gpt-4o-mini"
+OCR_PROVIDER = "openai"
+ANALYSIS_MODEL = "claude-3-5-sonnet-20241022"
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Validates the OCR model client once at startup, every request then shares it, and runs the job workers"""
+    try:
+        await asyncio.to_thread(model_registry.get, OCR_MODEL)
+    except Exception as e:
+        # Requests report the missing configuration, the service still starts
+        logger.warning(f"OCR model client not ready at startup: {str(e)}")
+    await job_store.start()
+    yield
+    await job_store.stop()
+    model_registry.close()
+
+app = FastAPI(lifespan=lifespan)
 
 # Add GZip compression for large responses
 app.add_middleware(GZipMiddleware, minimum_size=1000)
@@ -45,37 +67,295 @@ BASE_DIR = Path(__file__).resolve().parent
 STATIC_DIR = BASE_DIR / "static"
 app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
 
-# Store active analysis jobs
-active_jobs: Dict[str, Dict[str, Any]] = {}
+# Job queue limits, a full queue answers 429 instead of starting more work
+MAX_QUEUED_JOBS = int(os.getenv("MAX_QUEUED_JOBS", "16"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_TTL_SECONDS = float(os.getenv("JOB_TTL_SECONDS", "3600"))
+RETRY_AFTER_SECONDS = 30
+
+# Section requests in flight at a time for one analysis job
+ANALYSIS_CONCURRENCY = int(os.getenv("ANALYSIS_CONCURRENCY", "3"))
+
+class JobStore:
+    """
+    Analysis jobs processed from a bounded queue by a fixed pool of workers, finished jobs are evicted after their TTL.
+    A job only keeps its latest status, progress and partial result until its final result or error, never a backlog of
+    events, so a client that stopped reading costs no more than one job state
+    """
+
+    def __init__(self, max_queued: int, workers: int, ttl: float):
+        self.max_queued = max_queued
+        self.workers = workers
+        self.ttl = ttl
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        # Jobs a worker is running, the queued ones are counted by the queue
+        self._running = 0
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._evict_expired()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # Jobs still waiting for a worker won't run, release their files
+        while self._queue is not None and not self._queue.empty():
+            job_id, run, cleanup = self._queue.get_nowait()
+            self.publish(job_id, {"status": "error", "error": "Service shutting down"})
+            if cleanup is not None:
+                cleanup()
+
+    def is_full(self) -> bool:
+        return self._queue is None or self._queue.full()
+
+    def queued(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def running(self) -> int:
+        return self._running
+
+    def submit(
+        self,
+        run: Callable[[], AsyncGenerator[Dict[str, Any], None]],
+        cleanup: Optional[Callable[[], None]] = None
+    ) -> str:
+        """
+        Queues a job running the given event generator, raises asyncio.QueueFull when the queue is full.
+        cleanup is called once the job is done, or dropped on shutdown
+        """
+        if self._queue is None:
+            raise asyncio.QueueFull()
+        job_id = str(uuid.uuid4())
+        self._queue.put_nowait((job_id, run, cleanup))
+        self.jobs[job_id] = {
+            "status": "queued",
+            "progress": 0,
+            "result": None,
+            "partial_result": None,
+            "error": None,
+            # Analysis input tokens, uncached and read from or written to the provider's prompt cache, and output tokens
+            "usage": None,
+            "created_at": time.time(),
+            "finished_at": None,
+            # Set on every change, woken up by the streaming response of the request which submitted the job
+            "updated": asyncio.Event(),
+        }
+        return job_id
+
+    def publish(self, job_id: str, event: Dict[str, Any]) -> None:
+        """Applies a job event to the job's state and wakes up the job's stream"""
+        job = self.jobs.get(job_id)
+        if job is None or job["finished_at"] is not None:
+            return
+        if event["status"] == "partial_result":
+            job["partial_result"] = event.get("result")
+        else:
+            job["status"] = event["status"]
+            job["progress"] = event.get("progress", job["progress"])
+        if event["status"] == "completed":
+            job["result"] = event.get("result")
+            job["usage"] = event.get("usage")
+        if event["status"] == "error":
+            job["error"] = event.get("error")
+        if event["status"] in ("completed", "error"):
+            job["finished_at"] = time.time()
+            # The result supersedes the partial ones
+            job["partial_result"] = None
+        job["updated"].set()
+
+    async def _work(self) -> None:
+        while True:
+            job_id, run, cleanup = await self._queue.get()
+            self._running += 1
+            events = run()
+            try:
+                async for event in events:
+                    self.publish(job_id, event)
+            except Exception as e:
+                logger.error(f"Error in job {job_id}: {str(e)}")
+                ERRORS.labels("job", type(e).__name__).inc()
+                self.publish(job_id, {"status": "error", "error": str(e)})
+            finally:
+                # Also when the worker is cancelled on shutdown
+                await events.aclose()
+                if cleanup is not None:
+                    cleanup()
+                self.publish(job_id, {"status": "error", "error": "Job ended without a result"})
+                self._running -= 1
+                self._queue.task_done()
+
+    async def _evict_expired(self) -> None:
+        while True:
+            await asyncio.sleep(min(60.0, self.ttl))
+            now = time.time()
+            expired = [
+                job_id for job_id, job in self.jobs.items()
+                if job["finished_at"] is not None and now - job["finished_at"] > self.ttl
+            ]
+            for job_id in expired:
+                del self.jobs[job_id]
+
+job_store = JobStore(MAX_QUEUED_JOBS, JOB_WORKERS, JOB_TTL_SECONDS)
+
+# Prometheus metrics, exported in the text format on /metrics
+PAGES_PROCESSED = Counter("ocr_pages_processed_total", "OCR pages processed, by how their content was produced", ["provenance"])
+PAGE_STAGE_SECONDS = Histogram(
+    "ocr_page_stage_seconds",
+    "Time spent per page in each OCR stage",
+    ["stage"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+LLM_REQUEST_SECONDS = Histogram(
+    "llm_request_seconds",
+    "Latency of model requests",
+    ["provider", "model"],
+    buckets=(0.5, 1, 2.5, 5, 10, 20, 30, 60, 120),
+)
+LLM_TOKENS = Counter("llm_tokens_total", "Model token usage", ["provider", "model", "kind"])
+ERRORS = Counter("errors_total", "Errors, by stage and exception type", ["stage", "type"])
+OCR_IN_FLIGHT = Gauge("ocr_requests_in_flight", "OCR model requests in flight")
+ACTIVE_JOBS = Gauge("active_jobs", "Analysis jobs running on a worker")
+ACTIVE_JOBS.set_function(job_store.running)
+QUEUED_JOBS = Gauge("queued_jobs", "Analysis jobs waiting for a worker")
+QUEUED_JOBS.set_function(job_store.queued)
+
+# Stages of a page sent to the vision model, see pyzerox.core.types.Page
+PAGE_STAGES = ("render_time", "encode_time", "queue_wait", "model_latency")
+
+def record_page_metrics(page: Page) -> None:
+    """zerox on_page hook, records every OCR page as it completes"""
+    PAGES_PROCESSED.labels(page.provenance).inc()
+    if page.provenance != "vision" or page.cache_hit:
+        return
+    if not page.content:
+        ERRORS.labels("ocr", "page_failed").inc()
+    for stage in PAGE_STAGES:
+        PAGE_STAGE_SECONDS.labels(stage).observe(getattr(page, stage) / 1000)
+    LLM_TOKENS.labels(OCR_PROVIDER, OCR_MODEL, "input").inc(page.input_tokens)
+    LLM_TOKENS.labels(OCR_PROVIDER, OCR_MODEL, "output").inc(page.output_tokens)
+
+@contextmanager
+def track_ocr_request():
+    """zerox track_request hook, wraps every OCR model request to count the requests in flight and time them"""
+    with OCR_IN_FLIGHT.track_inprogress(), LLM_REQUEST_SECONDS.labels(OCR_PROVIDER, OCR_MODEL).time():
+        yield
 
-async def process_image_with_model(image_path: str) -> str:
-    """Process a single image using litellmmodel directly"""
+def record_anthropic_usage(response, started: float, job_usage: Optional[Dict[str, int]] = None) -> None:
+    """Records the latency and token usage of an Anthropic messages response, adding the usage to the job's when given"""
+    LLM_REQUEST_SECONDS.labels("anthropic", ANALYSIS_MODEL).observe(time.perf_counter() - started)
+    # input_tokens are the uncached input tokens, prompt cache reads and writes are reported apart
+    usage = {
+        "input_tokens": response.usage.input_tokens,
+        "cache_read_input_tokens": getattr(response.usage, "cache_read_input_tokens", None) or 0,
+        "cache_creation_input_tokens": getattr(response.usage, "cache_creation_input_tokens", None) or 0,
+        "output_tokens": response.usage.output_tokens,
+    }
+    LLM_TOKENS.labels("anthropic", ANALYSIS_MODEL, "input").inc(usage["input_tokens"])
+    LLM_TOKENS.labels("anthropic", ANALYSIS_MODEL, "cache_read").inc(usage["cache_read_input_tokens"])
+    LLM_TOKENS.labels("anthropic", ANALYSIS_MODEL, "cache_write").inc(usage["cache_creation_input_tokens"])
+    LLM_TOKENS.labels("anthropic", ANALYSIS_MODEL, "output").inc(usage["output_tokens"])
+    if job_usage is not None:
+        for kind, tokens in usage.items():
+            job_usage[kind] = job_usage.get(kind, 0) + tokens
+
+async def process_image_with_model(image_content: bytes) -> str:
+    """Process a single in-memory image using litellmmodel directly"""
     try:
-        model = litellmmodel(model="gpt-4o-mini")
-        completion = await model.completion(
-            image_path=image_path,
-            maintain_format=True,
-            prior_page=""
-        )
+        model = model_registry.get(OCR_MODEL)
+        with track_ocr_request():
+            completion = await model.completion(
+                image_path=None,
+                maintain_format=True,
+                prior_page="",
+                image_bytes=image_content
+            )
+        PAGES_PROCESSED.labels("vision").inc()
+        LLM_TOKENS.labels(OCR_PROVIDER, OCR_MODEL, "input").inc(completion.input_tokens)
+        LLM_TOKENS.labels(OCR_PROVIDER, OCR_MODEL, "output").inc(completion.output_tokens)
         return completion.content if completion else ""
     except Exception as e:
         logger.error(f"Error processing image with model: {str(e)}")
+        ERRORS.labels("ocr", type(e).__name__).inc()
         return ""
 
-async def analyze_content(contract_text: str, anthropic_key: str, job_id: str) -> AsyncGenerator[bytes, None]:
-    """Analyze contract content and stream results"""
-    try:
-        client = Anthropic(api_key=anthropic_key)
-        
-        # Update job status
-        active_jobs[job_id]["status"] = "validating"
-        active_jobs[job_id]["progress"] = 10
-        yield f"data: {json.dumps({'status': 'validating', 'progress': 10})}\n\n".encode('utf-8')
+# Sections of the analysis, each one asked independently of the others
+ANALYSIS_SECTIONS = [
+    ("quyền_lợi", "Hãy phân tích phần Quyền lợi của hợp đồng. Liệt kê tất cả quyền lợi bảo hiểm, chi tiết mức bảo hiểm, điều kiện áp dụng. Trích dẫn chính xác các điều khoản liên quan."),
+    ("chi_phí_tổng_thể_hàng_năm", "Hãy phân tích Chi phí tổng thể/hàng năm. Bao gồm phí bảo hiểm cơ bản, các loại phí khác, lịch đóng phí. Trích dẫn biểu phí cụ thể."),
+    ("giá_trị_hoàn_lại", "Hãy phân tích Giá trị hoàn lại. Giải thích cách tính, điều kiện áp dụng, và bảng tỷ lệ phí hủy hợp đồng theo năm."),
+    ("các_điều_khoản_loại_trừ", "Hãy phân tích các Điều khoản loại trừ. Liệt kê và giải thích chi tiết từng trường hợp loại trừ, điều kiện đặc biệt."),
+    ("quy_trình_claim", "Hãy phân tích Quy trình claim. Mô tả các bước thực hiện, hồ sơ yêu cầu, thời hạn nộp hồ sơ.")
+]
+
+def contract_prefix(contract_text: str) -> List[Dict[str, Any]]:
+    """System prompt of the section requests, the same for every section of a contract so the provider caches it once per job"""
+    return [
+        {
+            "type": "text",
+            "text": "Bạn là chuyên gia phân tích hợp đồng bảo hiểm. Hãy phân tích kỹ lưỡng và trích xuất thông tin chi tiết bằng tiếng Việt. Với mỗi phần, hãy trích dẫn chính xác điều khoản liên quan, sử dụng danh sách có dấu gạch đầu dòng (-) và bảng markdown khi cần thiết."
+        },
+        {
+            "type": "text",
+            "text": f"Đây là nội dung hợp đồng bảo hiểm cần phân tích:\n\n{contract_text}",
+            # Everything up to here is the cached prefix, only the section prompt differs between requests
+            "cache_control": {"type": "ephemeral"}
+        }
+    ]
+
+async def analyze_section(
+    client: AsyncAnthropic,
+    semaphore: asyncio.Semaphore,
+    prefix: List[Dict[str, Any]],
+    section_key: str,
+    prompt: str,
+    events: asyncio.Queue,
+    job_usage: Dict[str, int],
+    prefix_cached: Optional[asyncio.Event] = None,
+    prefix_written: Optional[asyncio.Event] = None
+) -> tuple:
+    """
+    Analyze one section of the contract once the prefix is cached (if waiting on prefix_cached) and a slot of the job's
+    semaphore is free. The response is streamed so prefix_written (if given) is set as soon as the response begins
+    """
+    if prefix_cached is not None:
+        await prefix_cached.wait()
+    async with semaphore:
+        events.put_nowait({"status": f"analyzing_{section_key}"})
+        started = time.perf_counter()
+        async with client.messages.stream(
+            model=ANALYSIS_MODEL,
+            max_tokens=4000,
+            temperature=0,
+            system=prefix,
+            messages=[{"role": "user", "content": prompt}]
+        ) as stream:
+            async for stream_event in stream:
+                # The provider has cached the prefix once the response begins, other requests can read it from then on
+                if stream_event.type == "message_start" and prefix_written is not None:
+                    prefix_written.set()
+            response = await stream.get_final_message()
+        record_anthropic_usage(response, started, job_usage)
+        return section_key, response.content[0].text.strip()
+
+async def analyze_content(
+    contract_text: str,
+    anthropic_key: str,
+    concurrency: int = ANALYSIS_CONCURRENCY
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """Analyze contract content and yield progress events, sections are analyzed concurrently and yielded as each finishes"""
+    async with AsyncAnthropic(api_key=anthropic_key) as client:
+        yield {"status": "validating", "progress": 10}
         
         # First, validate if this is an insurance contract
         logger.info("Validating document type...")
-        validation_response = client.messages.create(
-            model="claude-3-5-sonnet-20241022",
+        started = time.perf_counter()
+        validation_response = await client.messages.create(
+            model=ANALYSIS_MODEL,
             max_tokens=1000,
             temperature=0,
             system="Bạn là chuyên gia phân tích tài liệu. Hãy xác định xem đây có phải là hợp đồng bảo hiểm hay không.",
@@ -91,6 +371,8 @@ async def analyze_content(contract_text: str, anthropic_key: str, job_id: str) -
                 }
             ]
         )
+        job_usage: Dict[str, int] = {}
+        record_anthropic_usage(validation_response, started, job_usage)
 
         validation_text = validation_response.content[0].text.strip().upper()
         is_insurance_contract = "YES" in validation_text and "NO" not in validation_text
@@ -105,69 +387,163 @@ async def analyze_content(contract_text: str, anthropic_key: str, job_id: str) -
                 "các_điều_khoản_loại_trừ": "Không phải hợp đồng bảo hiểm",
                 "quy_trình_claim": "Không phải hợp đồng bảo hiểm"
             }
-            active_jobs[job_id]["status"] = "completed"
-            active_jobs[job_id]["result"] = result
-            active_jobs[job_id]["progress"] = 100
-            yield f"data: {json.dumps({'status': 'completed', 'progress': 100, 'result': result})}\n\n".encode('utf-8')
+            yield {"status": "completed", "progress": 100, "result": result, "usage": job_usage}
             return
 
-        # Initialize conversation and analysis
-        messages = [{"role": "user", "content": f"Tôi sẽ gửi cho bạn một hợp đồng bảo hiểm để phân tích từng phần. Đây là nội dung hợp đồng:\n\n{contract_text}"}]
-        analysis = {}
-
-        # Analyze each section
-        sections = [
-            ("quyền_lợi", "Hãy phân tích phần Quyền lợi của hợp đồng. Liệt kê tất cả quyền lợi bảo hiểm, chi tiết mức bảo hiểm, điều kiện áp dụng. Trích dẫn chính xác các điều khoản liên quan."),
-            ("chi_phí_tổng_thể_hàng_năm", "Tiếp theo, hãy phân tích Chi phí tổng thể/hàng năm. Bao gồm phí bảo hiểm cơ bản, các loại phí khác, lịch đóng phí. Trích dẫn biểu phí cụ thể."),
-            ("giá_trị_hoàn_lại", "Tiếp theo, hãy phân tích Giá trị hoàn lại. Giải thích cách tính, điều kiện áp dụng, và bảng tỷ lệ phí hủy hợp đồng theo năm."),
-            ("các_điều_khoản_loại_trừ", "Tiếp theo, hãy phân tích các Điều khoản loại trừ. Liệt kê và giải thích chi tiết từng trường hợp loại trừ, điều kiện đặc biệt."),
-            ("quy_trình_claim", "Cuối cùng, hãy phân tích Quy trình claim. Mô tả các bước thực hiện, hồ sơ yêu cầu, thời hạn nộp hồ sơ.")
+        # Analyze the sections concurrently, at most `concurrency` requests at a time for this job.
+        # The first section writes the cached prefix, the others start as soon as its response begins and read it.
+        # This delays them by the first section's time to first token, not by its whole generation
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        events = asyncio.Queue()
+        prefix = contract_prefix(contract_text)
+        prefix_cached = asyncio.Event()
+        tasks = [
+            asyncio.create_task(analyze_section(
+                client, semaphore, prefix, section_key, prompt, events, job_usage,
+                prefix_cached=prefix_cached if i else None,
+                prefix_written=None if i else prefix_cached
+            ))
+            for i, (section_key, prompt) in enumerate(ANALYSIS_SECTIONS)
         ]
+        # A first section failing before its response begins doesn't hold the others back
+        tasks[0].add_done_callback(lambda task: prefix_cached.set())
+        # Finished tasks go to the same queue as the started events
+        for task in tasks:
+            task.add_done_callback(events.put_nowait)
 
-        for i, (section_key, prompt) in enumerate(sections):
-            progress = 20 + (i * 16)  # Progress from 20% to 100%
-            active_jobs[job_id]["status"] = f"analyzing_{section_key}"
-            active_jobs[job_id]["progress"] = progress
-            
-            yield f"data: {json.dumps({'status': f'analyzing_{section_key}', 'progress': progress})}\n\n".encode('utf-8')
-            
-            messages.append({"role": "user", "content": prompt})
-            response = client.messages.create(
-                model="claude-3-5-sonnet-20241022",
-                max_tokens=4000,
-                temperature=0,
-                system="Bạn là chuyên gia phân tích hợp đồng bảo hiểm. Hãy phân tích kỹ lưỡng và trích xuất thông tin chi tiết bằng tiếng Việt. Với mỗi phần, hãy trích dẫn chính xác điều khoản liên quan, sử dụng danh sách có dấu gạch đầu dòng (-) và bảng markdown khi cần thiết.",
-                messages=messages
-            )
-            analysis[section_key] = response.content[0].text.strip()
-            messages.append({"role": "assistant", "content": response.content[0].text})
+        analysis = {}
+        try:
+            while len(analysis) < len(tasks):
+                event = await events.get()
+                progress = 20 + len(analysis) * 80 // len(tasks)  # Progress from 20% to 100%
+                if isinstance(event, asyncio.Task):
+                    section_key, text = event.result()
+                    analysis[section_key] = text
+                    progress = 20 + len(analysis) * 80 // len(tasks)
 
-            # Update partial results
-            partial_result = {
-                "ocr_text": contract_text,
-                **analysis
-            }
-            active_jobs[job_id]["partial_result"] = partial_result
-            yield f"data: {json.dumps({'status': 'partial_result', 'progress': progress, 'result': partial_result})}\n\n".encode('utf-8')
+                    # Partial results, in section order
+                    partial_result = {
+                        "ocr_text": contract_text,
+                        **{key: analysis[key] for key, _ in ANALYSIS_SECTIONS if key in analysis}
+                    }
+                    yield {"status": "partial_result", "progress": progress, "result": partial_result}
+                else:
+                    yield {**event, "progress": progress}
+        finally:
+            # A failed section or a closed stream stops the remaining ones, before the client is closed under them
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
 
         # Final result
         result = {
             "ocr_text": contract_text,
-            **analysis
+            **{key: analysis[key] for key, _ in ANALYSIS_SECTIONS}
         }
-        active_jobs[job_id]["status"] = "completed"
-        active_jobs[job_id]["result"] = result
-        active_jobs[job_id]["progress"] = 100
-        yield f"data: {json.dumps({'status': 'completed', 'progress': 100, 'result': result})}\n\n".encode('utf-8')
+        logger.info(f"Analysis token usage: {job_usage}")
+        yield {"status": "completed", "progress": 100, "result": result, "usage": job_usage}
+
+async def run_analysis(
+    file_path: Optional[str],
+    image_contents: Optional[List[tuple]],
+    anthropic_key: str
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """Run OCR and the analysis of one job on a worker, yielding progress events"""
+    contents = []
 
+    if file_path:
+        yield {"status": "processing_pdf", "progress": 5}
+
+        # Process PDF file using zerox
+        try:
+            result = await zerox(
+                file_path=file_path,
+                model=OCR_MODEL,
+                cleanup=True,
+                on_page=record_page_metrics,
+                track_request=track_ocr_request
+            )
+        except Exception as e:
+            logger.error(f"Error processing PDF: {str(e)}")
+            ERRORS.labels("ocr", type(e).__name__).inc()
+            result = None
+        if result and result.pages:
+            contents.extend([page.content for page in result.pages])
+        else:
+            yield {"status": "error", "error": "Không thể xử lý file PDF. Vui lòng kiểm tra lại file đầu vào."}
+            return
+
+    else:
+        # Process all images
+        total_images = len(image_contents)
+        for i, (img_content, img_name) in enumerate(image_contents):
+            yield {"status": f"processing_image_{i+1}/{total_images}", "progress": int((i / total_images) * 15)}  # Progress up to 15%
+            
+            result = await process_image_with_model(img_content)
+            if result:
+                contents.append(result)
+                logger.info(f"Successfully processed image {i}")
+            else:
+                logger.error(f"No results for image {i}")
+
+    if not contents:
+        yield {"status": "error", "error": "Không thể trích xuất được nội dung từ file. Vui lòng kiểm tra lại file đầu vào."}
+        return
+
+    logger.info(f"OCR processing complete, extracted {len(contents)} pages")
+    contract_text = "\n\n".join(contents)
+    logger.info(f"Extracted text length: {len(contract_text)} characters")
+
+    try:
+        async for event in analyze_content(contract_text, anthropic_key):
+            yield event
     except Exception as e:
         logger.error(f"Error in analyze_content: {str(e)}")
-        active_jobs[job_id]["status"] = "error"
-        active_jobs[job_id]["error"] = str(e)
-        yield f"data: {json.dumps({'status': 'error', 'error': str(e)})}\n\n".encode('utf-8')
+        ERRORS.labels("analysis", type(e).__name__).inc()
+        yield {"status": "error", "error": str(e)}
+
+def queue_full_error() -> HTTPException:
+    ERRORS.labels("queue", "QueueFull").inc()
+    return HTTPException(
+        status_code=429,
+        detail="Hệ thống đang bận. Vui lòng thử lại sau.",
+        headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+    )
+
+def job_event(event: Dict[str, Any]) -> bytes:
+    return f"data: {json.dumps(event)}\n\n".encode('utf-8')
 
-async def process_files(job_id: str, file_content: bytes = None, file_name: str = None, image_contents: List[tuple] = None):
-    """Process files and update job status"""
+async def stream_job_events(job_id: str) -> AsyncGenerator[bytes, None]:
+    """
+    Stream a job's progress as server-sent events until it completes or fails. Only the latest state is sent on every
+    change, a slow reader skips intermediate progress but always gets the latest partial result and the final event
+    """
+    job = job_store.jobs[job_id]
+    yield job_event({"status": "queued", "progress": 0, "job_id": job_id})
+    sent_state = ("queued", 0)
+    sent_partial_result = None
+    while True:
+        await job["updated"].wait()
+        job["updated"].clear()
+        if job["status"] == "completed":
+            yield job_event({"status": "completed", "progress": 100, "result": job["result"], "usage": job["usage"]})
+            return
+        if job["status"] == "error":
+            yield job_event({"status": "error", "error": job["error"]})
+            return
+        if job["partial_result"] is not None and job["partial_result"] is not sent_partial_result:
+            sent_partial_result = job["partial_result"]
+            yield job_event({"status": "partial_result", "progress": job["progress"], "result": sent_partial_result})
+        if (job["status"], job["progress"]) != sent_state:
+            sent_state = (job["status"], job["progress"])
+            yield job_event({"status": job["status"], "progress": job["progress"]})
+
+@app.post("/analyze")
+async def analyze_contract(
+    file: UploadFile = File(None),
+    images: List[UploadFile] = File([])
+):
+    """Queue an analysis job and stream its results. Answers 429 when the job queue is full"""
     try:
         # Check API keys
         openai_key = os.getenv("OPENAI_API_KEY")
@@ -178,120 +554,66 @@ async def process_files(job_id: str, file_content: bytes = None, file_name: str
         if not anthropic_key:
             raise HTTPException(status_code=500, detail="ANTHROPIC_API_KEY not found in environment variables")
 
-        # Create temp directory for files
+        is_pdf = bool(file and file.filename and file.filename.lower().endswith('.pdf'))
+        if not is_pdf and not images:
+            raise HTTPException(status_code=400, detail="Vui lòng tải lên file PDF hoặc ảnh hợp đồng bảo hiểm")
+
+        # Refuse before reading the upload when no job can be queued
+        if job_store.is_full():
+            raise queue_full_error()
+
+        # Create temp directory for files, the job removes it once done
         temp_dir = tempfile.mkdtemp()
         try:
-            contents = []
-            
-            if file_content and file_name and file_name.lower().endswith('.pdf'):
-                active_jobs[job_id]["status"] = "processing_pdf"
-                active_jobs[job_id]["progress"] = 5
-                
-                # Process PDF file using zerox
-                file_path = os.path.join(temp_dir, file_name)
+            file_path = None
+            image_data = []
+            if is_pdf:
+                # Spool the upload to disk in chunks, zerox reads the file in place from there
+                file_path = os.path.join(temp_dir, os.path.basename(file.filename))
                 with open(file_path, "wb") as f:
-                    f.write(file_content)
-                
-                result = await zerox(file_path=file_path, model="gpt-4o-mini", cleanup=True)
-                if result and result.pages:
-                    contents.extend([page.content for page in result.pages])
-                else:
-                    raise HTTPException(status_code=400, detail="Không thể xử lý file PDF. Vui lòng kiểm tra lại file đầu vào.")
-            
-            elif image_contents:
-                # Process all images
-                total_images = len(image_contents)
-                for i, (img_content, img_name) in enumerate(image_contents):
-                    try:
-                        active_jobs[job_id]["status"] = f"processing_image_{i+1}/{total_images}"
-                        active_jobs[job_id]["progress"] = int((i / total_images) * 15)  # Progress up to 15%
-                        
-                        file_path = os.path.join(temp_dir, f"page_{i}{os.path.splitext(img_name)[1]}")
-                        with open(file_path, "wb") as f:
-                            f.write(img_content)
-                        
-                        result = await process_image_with_model(file_path)
-                        if result:
-                            contents.append(result)
-                            logger.info(f"Successfully processed image {i}")
-                        else:
-                            logger.error(f"No results for image {i}")
-                    except Exception as e:
-                        logger.error(f"Error processing image {i}: {str(e)}")
-                        continue
+                    await asyncio.to_thread(shutil.copyfileobj, file.file, f, 1024 * 1024)
             else:
-                raise HTTPException(status_code=400, detail="Vui lòng tải lên file PDF hoặc ảnh hợp đồng bảo hiểm")
-
-            if not contents:
-                raise HTTPException(status_code=400, detail="Không thể trích xuất được nội dung từ file. Vui lòng kiểm tra lại file đầu vào.")
-
-            logger.info(f"OCR processing complete, extracted {len(contents)} pages")
-            contract_text = "\n\n".join(contents)
-            logger.info(f"Extracted text length: {len(contract_text)} characters")
-
-            # Return streaming response
-            return StreamingResponse(
-                analyze_content(contract_text, anthropic_key, job_id),
-                media_type="text/event-stream",
-                headers={
-                    "Cache-Control": "no-cache",
-                    "Connection": "keep-alive",
-                    "X-Accel-Buffering": "no",
-                    "Access-Control-Allow-Origin": "*",
-                    "Content-Encoding": "none"
-                }
-            )
+                for img in images:
+                    content = await img.read()
+                    image_data.append((content, img.filename))
 
-        finally:
-            # Clean up temp directory
+            job_id = job_store.submit(
+                functools.partial(run_analysis, file_path, image_data, anthropic_key),
+                cleanup=functools.partial(shutil.rmtree, temp_dir, ignore_errors=True)
+            )
+        except asyncio.QueueFull:
             shutil.rmtree(temp_dir, ignore_errors=True)
+            raise queue_full_error()
+        except Exception:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            raise
 
-    except Exception as e:
-        logger.error(f"Error in process_files: {str(e)}")
-        active_jobs[job_id]["status"] = "error"
-        active_jobs[job_id]["error"] = str(e)
-        raise
-
-@app.post("/analyze")
-async def analyze_contract(
-    file: UploadFile = File(None),
-    images: List[UploadFile] = File([])
-):
-    """Start analysis and stream results"""
-    try:
-        job_id = str(uuid.uuid4())
-        active_jobs[job_id] = {
-            "status": "starting",
-            "progress": 0,
-            "result": None,
-            "partial_result": None,
-            "error": None
-        }
-        
-        # Read all files first
-        file_data = None
-        if file:
-            content = await file.read()
-            file_data = (content, file.filename)
-        
-        image_data = []
-        if images:
-            for img in images:
-                content = await img.read()
-                image_data.append((content, img.filename))
-        
-        # Process files and return streaming response
-        return await process_files(
-            job_id,
-            file_content=file_data[0] if file_data else None,
-            file_name=file_data[1] if file_data else None,
-            image_contents=image_data if image_data else None
+        return StreamingResponse(
+            stream_job_events(job_id),
+            media_type="text/event-stream",
+            headers={
+                "Cache-Control": "no-cache",
+                "Connection": "keep-alive",
+                "X-Accel-Buffering": "no",
+                "Access-Control-Allow-Origin": "*",
+                "Content-Encoding": "none"
+            }
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error starting analysis: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Job status, finished jobs are kept for JOB_TTL_SECONDS
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = job_store.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"job_id": job_id, **{key: value for key, value in job.items() if key != "updated"}}
+
 # Serve index.html at root
 @app.get("/")
 async def read_root():
@@ -301,6 +623,11 @@ async def read_root():
         raise HTTPException(status_code=404, detail="index.html not found")
     return FileResponse(str(index_path))
 
+# Prometheus scrape endpoint
+@app.get("/metrics")
+async def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 # Health check endpoint for Vercel
 @app.get("/health")
 async def health_check():
@@ -0,0 +1,46 @@
+import sys
+
+import pytest
+
+import pyzerox  # noqa: F401, loads the modules patched below
+
+pdf_module = sys.modules["pyzerox.processor.pdf"]
+zerox_module = sys.modules["pyzerox.core.zerox"]
+
+
+class FakePipeline:
+    """
+    Runs zerox on a placeholder PDF without poppler or a provider: pdf2image renders every page as render(page_number)
+    (the page number as a string by default, which the pipeline treats as the image path) and get_model returns a
+    model whose completion is the given coroutine function.
+    """
+
+    def __init__(self, monkeypatch, tmp_path):
+        self.monkeypatch = monkeypatch
+        self.source = tmp_path / "doc.pdf"
+        ## (pdf_path, first_page, last_page) of every convert_from_path call
+        self.rendered = []
+
+    def __call__(self, pages: int, completion, render=str, model: str = "gpt-4o-mini") -> str:
+        def convert_from_path(pdf_path, first_page, last_page, **kwargs):
+            self.rendered.append((pdf_path, first_page, last_page))
+            return [render(page) for page in range(first_page, last_page + 1)]
+
+        class StubModel:
+            system_prompt = ""
+            kwargs = {}
+
+            async def completion(self, image_path, maintain_format, prior_page, image_bytes=None):
+                return await completion(image_path, maintain_format, prior_page, image_bytes)
+
+        StubModel.model = model
+        self.source.write_bytes(b"%PDF-1.4")
+        self.monkeypatch.setattr(pdf_module, "pdfinfo_from_path", lambda path: {"Pages": pages})
+        self.monkeypatch.setattr(pdf_module, "convert_from_path", convert_from_path)
+        self.monkeypatch.setattr(zerox_module, "get_model", lambda model, system_prompt=None, **kwargs: StubModel())
+        return str(self.source)
+
+
+@pytest.fixture
+def fake_pipeline(monkeypatch, tmp_path):
+    return FakePipeline(monkeypatch, tmp_path)
@@ -0,0 +1,344 @@
+import asyncio
+import functools
+import json
+import os
+import shutil
+import threading
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("ANTHROPIC_API_KEY", "test")
+
+import app
+from fastapi.testclient import TestClient
+import pytest
+from prometheus_client import REGISTRY
+
+from pyzerox.models import CompletionResponse
+
+
+def count_tokens(text: str) -> int:
+    return len(text) // 4
+
+
+class FakeMessage:
+    def __init__(self, text: str, usage: dict):
+        self.content = [type("TextBlock", (), {"text": text})()]
+        self.usage = type("Usage", (), usage)()
+
+
+class FakeStream:
+    def __init__(self, client, kwargs):
+        self.client = client
+        self.kwargs = kwargs
+        self.message = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.client.finish(self.kwargs)
+
+    async def __aiter__(self):
+        ## the prefix is cached once the response begins
+        self.message = await self.client.respond(self.kwargs, stream=True)
+        yield type("Event", (), {"type": "message_start"})()
+        await asyncio.sleep(self.client.latency_for(self.kwargs))
+        yield type("Event", (), {"type": "message_stop"})()
+
+    async def get_final_message(self):
+        return self.message
+
+
+class FakeAnthropic:
+    """
+    In-process stand-in for AsyncAnthropic simulating prompt prefix caching: the system blocks up to the last one marked
+    with cache_control are written to the cache once a response begins, later requests with the same prefix read them.
+    Tokens are counted as 4 characters each.
+    """
+
+    def __init__(self, latency: float = 0.02, fail_section: str = None, section_latency: dict = None):
+        self.latency = latency
+        self.fail_section = fail_section
+        ## generation time of the sections whose prompt contains a key, instead of latency
+        self.section_latency = section_latency or {}
+        self.cache = set()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.started = []
+        ## ("start" | "end", prompt) of every request, in order
+        self.log = []
+        self.closed = False
+        ## requests still running when the client was closed
+        self.ended_after_close = 0
+        self.messages = self
+
+    def __call__(self, api_key=None):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.closed = True
+
+    def stream(self, **kwargs):
+        return FakeStream(self, kwargs)
+
+    async def create(self, **kwargs):
+        try:
+            message = await self.respond(kwargs)
+            await asyncio.sleep(self.latency_for(kwargs))
+            return message
+        finally:
+            self.finish(kwargs)
+
+    def latency_for(self, kwargs) -> float:
+        prompt = kwargs["messages"][-1]["content"]
+        return next((latency for key, latency in self.section_latency.items() if key in prompt), self.latency)
+
+    def finish(self, kwargs):
+        self.in_flight -= 1
+        self.ended_after_close += self.closed
+        self.log.append(("end", kwargs["messages"][-1]["content"]))
+
+    async def respond(self, kwargs, stream: bool = False) -> FakeMessage:
+        system = kwargs["system"]
+        blocks = [{"type": "text", "text": system}] if isinstance(system, str) else list(system)
+        prompt = kwargs["messages"][-1]["content"]
+        self.started.append(prompt)
+        self.log.append(("start", prompt))
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        ## time to first token
+        await asyncio.sleep(self.latency / 2)
+        if self.fail_section and self.fail_section in prompt:
+            raise RuntimeError(f"section failed: {self.fail_section}")
+
+        cut = max((index + 1 for index, block in enumerate(blocks) if "cache_control" in block), default=0)
+        prefix_key = json.dumps(blocks[:cut], ensure_ascii=False)
+        prefix_tokens = sum(count_tokens(block["text"]) for block in blocks[:cut])
+        cached = cut and prefix_key in self.cache
+        if cut:
+            self.cache.add(prefix_key)
+        usage = {
+            "input_tokens": sum(count_tokens(block["text"]) for block in blocks[cut:]) + count_tokens(prompt),
+            "cache_read_input_tokens": prefix_tokens if cached else 0,
+            "cache_creation_input_tokens": 0 if cached else prefix_tokens,
+            "output_tokens": 10,
+        }
+        text = "YES" if isinstance(system, str) else prompt[:40]
+        return FakeMessage(text, usage)
+
+
+async def collect(events):
+    return [event async for event in events]
+
+
+def test_prefix_cache_usage(monkeypatch):
+    fake = FakeAnthropic()
+    monkeypatch.setattr(app, "AsyncAnthropic", fake)
+    contract_text = "Điều 1. Quyền lợi bảo hiểm. " * 400
+
+    events = asyncio.run(collect(app.analyze_content(contract_text, "key", concurrency=5)))
+    usage = events[-1]["usage"]
+    prefix_tokens = sum(count_tokens(block["text"]) for block in app.contract_prefix(contract_text))
+    ## the first section writes the prefix, the four others read it
+    assert usage["cache_creation_input_tokens"] == prefix_tokens
+    assert usage["cache_read_input_tokens"] == 4 * prefix_tokens
+    ## only the validation request and the section prompts are uncached
+    validation_tokens = count_tokens(fake.started[0]) + count_tokens(
+        "Bạn là chuyên gia phân tích tài liệu. Hãy xác định xem đây có phải là hợp đồng bảo hiểm hay không."
+    )
+    assert usage["input_tokens"] == validation_tokens + sum(count_tokens(prompt) for _, prompt in app.ANALYSIS_SECTIONS)
+    ## the other sections start once the first response begins, not once it is done
+    first_section, second_section = app.ANALYSIS_SECTIONS[0][1], app.ANALYSIS_SECTIONS[1][1]
+    assert fake.log.index(("start", second_section)) < fake.log.index(("end", first_section))
+
+
+def test_sections_are_combined_in_order(monkeypatch):
+    ## the first sections take the longest, so they finish last
+    section_latency = {
+        prompt: 0.05 * (len(app.ANALYSIS_SECTIONS) - index) for index, (_, prompt) in enumerate(app.ANALYSIS_SECTIONS)
+    }
+    fake = FakeAnthropic(section_latency=section_latency)
+    monkeypatch.setattr(app, "AsyncAnthropic", fake)
+
+    events = asyncio.run(collect(app.analyze_content("Hợp đồng bảo hiểm " * 50, "key", concurrency=5)))
+    finished = [event for event in events if event["status"] == "partial_result"]
+    assert list(finished[0]["result"])[1:] == [app.ANALYSIS_SECTIONS[-1][0]]
+
+    result = events[-1]["result"]
+    assert events[-1]["status"] == "completed"
+    assert list(result) == ["ocr_text"] + [key for key, _ in app.ANALYSIS_SECTIONS]
+    for key, prompt in app.ANALYSIS_SECTIONS:
+        assert result[key] == prompt[:40].strip()
+    ## partial results keep the section order too
+    for event in finished:
+        keys = list(event["result"])[1:]
+        assert keys == [key for key, _ in app.ANALYSIS_SECTIONS if key in keys]
+    assert [event["progress"] for event in finished] == sorted(event["progress"] for event in finished)
+
+
+def test_section_concurrency_limit(monkeypatch):
+    fake = FakeAnthropic(latency=0.05)
+    monkeypatch.setattr(app, "AsyncAnthropic", fake)
+
+    events = asyncio.run(collect(app.analyze_content("Hợp đồng bảo hiểm " * 50, "key", concurrency=2)))
+    assert events[-1]["status"] == "completed"
+    assert fake.peak_in_flight == 2
+    assert len(fake.started) == 1 + len(app.ANALYSIS_SECTIONS)
+
+
+def test_failed_section_fails_the_job(monkeypatch):
+    async def fake_ocr(image_content):
+        return "Hợp đồng bảo hiểm " * 50
+
+    failing_prompt = app.ANALYSIS_SECTIONS[2][1]
+    fake = FakeAnthropic(fail_section=failing_prompt, section_latency={prompt: 1.0 for _, prompt in app.ANALYSIS_SECTIONS[3:]})
+    monkeypatch.setattr(app, "AsyncAnthropic", fake)
+    monkeypatch.setattr(app, "process_image_with_model", fake_ocr)
+
+    async def analyze():
+        with pytest.raises(RuntimeError, match="section failed"):
+            await collect(app.analyze_content("Hợp đồng bảo hiểm " * 50, "key", concurrency=5))
+        ## the slower sections are stopped rather than left running, and are done before the client is closed
+        return fake.in_flight
+
+    assert asyncio.run(analyze()) == 0
+    assert fake.closed and fake.ended_after_close == 0
+
+    started = time.monotonic()
+    events = asyncio.run(collect(app.run_analysis(None, [(b"png", "page.png")], "key")))
+    assert time.monotonic() - started < 1.0
+    assert events[-1] == {"status": "error", "error": f"section failed: {failing_prompt}"}
+    assert not any(event["status"] == "completed" for event in events)
+
+
+def test_job_reports_usage(monkeypatch):
+    async def fake_ocr(image_content):
+        return "Hợp đồng bảo hiểm " * 200
+
+    monkeypatch.setattr(app, "AsyncAnthropic", FakeAnthropic())
+    monkeypatch.setattr(app, "process_image_with_model", fake_ocr)
+
+    with TestClient(app.app) as client:
+        response = client.post("/analyze", files=[("images", ("page.png", b"png", "image/png"))])
+        events = [json.loads(line[len("data: "):]) for line in response.text.split("\n\n") if line]
+        job = client.get(f"/jobs/{events[0]['job_id']}").json()
+
+    assert events[-1]["status"] == "completed"
+    assert job["status"] == "completed"
+    assert job["usage"] == events[-1]["usage"]
+    assert job["usage"]["cache_read_input_tokens"] > 0 and job["usage"]["cache_creation_input_tokens"] > 0
+
+
+def wait_until(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def blocking_job(gate: threading.Event, running: list, peak: list):
+    async def run():
+        running.append(1)
+        peak.append(len(running))
+        try:
+            await asyncio.to_thread(gate.wait, 5)
+            yield {"status": "completed", "progress": 100, "result": {}, "usage": {}}
+        finally:
+            running.pop()
+
+    return run
+
+
+def test_queue_full_answers_429(monkeypatch, tmp_path):
+    monkeypatch.setattr(app.job_store, "max_queued", 1)
+    monkeypatch.setattr(app.job_store, "workers", 1)
+    gate, running, peak = threading.Event(), [], []
+    queued_dir = tmp_path / "queued"
+    queued_dir.mkdir()
+
+    with TestClient(app.app) as client:
+        ## one job on the only worker, one waiting in the queue
+        client.portal.call(app.job_store.submit, blocking_job(gate, running, peak))
+        wait_until(lambda: running)
+        queued_job = client.portal.call(
+            app.job_store.submit, blocking_job(gate, running, peak), functools.partial(shutil.rmtree, queued_dir)
+        )
+
+        response = client.post("/analyze", files=[("images", ("page.png", b"png", "image/png"))])
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == str(app.RETRY_AFTER_SECONDS)
+        assert "queued_jobs 1.0" in client.get("/metrics").text
+    gate.set()
+
+    ## the queued job never ran, shutting down fails it and removes its upload
+    assert app.job_store.jobs[queued_job]["status"] == "error"
+    assert not queued_dir.exists()
+
+
+def test_worker_limit(monkeypatch):
+    monkeypatch.setattr(app.job_store, "max_queued", 8)
+    monkeypatch.setattr(app.job_store, "workers", 2)
+    gate, running, peak = threading.Event(), [], []
+
+    with TestClient(app.app) as client:
+        jobs = [client.portal.call(app.job_store.submit, blocking_job(gate, running, peak)) for _ in range(5)]
+        wait_until(lambda: len(running) == 2)
+        time.sleep(0.1)
+        assert len(running) == 2 and app.job_store.queued() == 3
+        ## queued jobs are only counted as queued
+        metrics = client.get("/metrics").text
+        assert (metric_value(metrics, "active_jobs"), metric_value(metrics, "queued_jobs")) == (2, 3)
+        gate.set()
+        wait_until(lambda: all(app.job_store.jobs[job_id]["status"] == "completed" for job_id in jobs))
+    assert max(peak) == 2
+
+
+def test_stop_before_start():
+    asyncio.run(app.JobStore(max_queued=1, workers=1, ttl=1).stop())
+
+
+def test_finished_jobs_are_evicted(monkeypatch):
+    monkeypatch.setattr(app.job_store, "ttl", 0.05)
+    gate, running, peak = threading.Event(), [], []
+    gate.set()
+
+    with TestClient(app.app) as client:
+        job_id = client.portal.call(app.job_store.submit, blocking_job(gate, running, peak))
+        wait_until(lambda: client.get(f"/jobs/{job_id}").status_code == 404)
+
+
+def metric_value(metrics: str, sample: str) -> float:
+    for line in metrics.splitlines():
+        if line.startswith(sample + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+def test_pdf_job_metrics(fake_pipeline, monkeypatch):
+    in_flight = []
+
+    async def completion(image_path, maintain_format, prior_page, image_bytes=None) -> CompletionResponse:
+        in_flight.append(REGISTRY.get_sample_value("ocr_requests_in_flight"))
+        await asyncio.sleep(0.01)
+        return CompletionResponse(content="Hợp đồng bảo hiểm", input_tokens=10, output_tokens=5)
+
+    fake_pipeline(3, completion, model=app.OCR_MODEL)
+    monkeypatch.setattr(app, "AsyncAnthropic", FakeAnthropic())
+    latency_count = f'llm_request_seconds_count{{model="{app.OCR_MODEL}",provider="{app.OCR_PROVIDER}"}}'
+
+    with TestClient(app.app) as client:
+        before = client.get("/metrics").text
+        response = client.post("/analyze", files={"file": ("contract.pdf", b"%PDF-1.4", "application/pdf")})
+        assert json.loads(response.text.split("\n\n")[-2][len("data: "):])["status"] == "completed"
+        after = client.get("/metrics").text
+
+    ## every page request is counted in flight while it runs and timed
+    assert len(in_flight) == 3 and min(in_flight) >= 1
+    assert metric_value(after, "ocr_requests_in_flight") == 0
+    assert metric_value(after, latency_count) - metric_value(before, latency_count) == 3
+    pages = 'ocr_pages_processed_total{provenance="vision"}'
+    assert metric_value(after, pages) - metric_value(before, pages) == 3
@@ -0,0 +1,78 @@
+import asyncio
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from pyzerox.core.types import BlankPageThresholds
+from pyzerox.processor import image_to_bytes, is_blank_page, largest_ink_component, ocr_page
+
+
+def page_image(text_lines: int = 0, background: int = 255) -> bytes:
+    image = Image.new("L", (816, 1056), background)
+    draw = ImageDraw.Draw(image)
+    for line in range(text_lines):
+        draw.text((80, 100 + line * 20), "Lorem ipsum dolor sit amet, consectetur adipiscing elit " * 2, fill=0)
+    ## scanner edge, inside the ignored margin
+    draw.rectangle((0, 0, 20, 1056), fill=0)
+    return image_to_bytes(image, "png")
+
+
+def test_is_blank_page():
+    assert is_blank_page(page_image())
+    assert is_blank_page(page_image(background=200))
+    assert not is_blank_page(page_image(text_lines=10))
+    assert is_blank_page(
+        page_image(text_lines=10), BlankPageThresholds(max_ink_coverage=1.0, max_std_dev=255, max_ink_component=10 ** 6)
+    )
+
+
+def test_single_line_page_is_not_blank():
+    image = Image.new("L", (816, 1056), 255)
+    draw = ImageDraw.Draw(image)
+    ## dust alone leaves the page blank
+    for x, y in ((150, 200), (600, 450), (300, 900)):
+        draw.ellipse((x, y, x + 2, y + 2), fill=0)
+    assert is_blank_page(image_to_bytes(image, "png"))
+
+    total = image.copy()
+    ImageDraw.Draw(total).text((100, 500), "Total premium: 12,500,000 VND", fill=0)
+    assert not is_blank_page(image_to_bytes(total, "png"))
+
+    signature = image.copy()
+    ImageDraw.Draw(signature).line((450, 900, 700, 900), fill=0, width=2)
+    assert not is_blank_page(image_to_bytes(signature, "png"))
+
+
+def test_largest_ink_component():
+    ink = np.zeros((512, 512), dtype=bool)
+    ink[10, 10] = ink[11, 11] = True
+    ## a serpentine line through most of the mask, the worst case for propagating labels
+    for row in range(100, 400, 4):
+        ink[row, 50:450] = True
+    for row in range(100, 396, 8):
+        ink[row : row + 4, 449] = True
+        ink[row + 4 : row + 8, 50] = True
+    line = int(np.count_nonzero(ink[50:, :]))
+    assert largest_ink_component(ink, gap=0) == line
+    ## diagonal neighbours join, and the gap joins specks close to each other
+    assert largest_ink_component(ink[:50, :50], gap=0) == 2
+    specks = np.zeros((20, 20), dtype=bool)
+    specks[5, 5] = specks[5, 8] = True
+    assert largest_ink_component(specks, gap=0) == 1
+    ## two crosses of 9 pixels sharing 2
+    assert largest_ink_component(specks, gap=2) == 16
+    assert largest_ink_component(np.zeros((8, 8), dtype=bool)) == 0
+
+
+class FailingModel:
+    model = "gpt-4o-mini"
+
+    async def completion(self, **kwargs):
+        raise AssertionError("blank pages must not reach the model")
+
+
+def test_blank_page_skips_model():
+    page = asyncio.run(
+        ocr_page(page_image(), FailingModel(), page_number=3, blank_page_thresholds=BlankPageThresholds())
+    )
+    assert (page.page, page.content, page.provenance, page.input_tokens) == (3, "", "blank", 0)
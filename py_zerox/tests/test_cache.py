@@ -0,0 +1,83 @@
+import asyncio
+import time
+
+from pyzerox.cache import InMemoryCache, SQLiteCache, make_cache_key
+from pyzerox.models import CompletionResponse
+from pyzerox.processor import ocr_page
+
+
+class CountingModel:
+    """Stand-in for litellmmodel counting the completion calls."""
+
+    model = "gpt-4o-mini"
+    system_prompt = "Convert the following PDF page to markdown."
+    kwargs = {"temperature": 0}
+
+    def __init__(self):
+        self.calls = 0
+
+    async def completion(self, image_path, maintain_format, prior_page, image_bytes=None) -> CompletionResponse:
+        self.calls += 1
+        return CompletionResponse(content="# Title", input_tokens=100, output_tokens=10)
+
+
+def test_cache_key_covers_request():
+    key = make_cache_key(b"image", "gpt-4o-mini", "prompt", "", {"temperature": 0})
+    assert key == make_cache_key(b"image", "gpt-4o-mini", "prompt", "", {"temperature": 0})
+    assert key != make_cache_key(b"other image", "gpt-4o-mini", "prompt", "", {"temperature": 0})
+    assert key != make_cache_key(b"image", "gpt-4o", "prompt", "", {"temperature": 0})
+    assert key != make_cache_key(b"image", "gpt-4o-mini", "prompt", "prior page", {"temperature": 0})
+    assert key != make_cache_key(b"image", "gpt-4o-mini", "prompt", "", {"temperature": 1})
+
+
+def test_ocr_page_cache_hit():
+    model = CountingModel()
+    cache = InMemoryCache()
+
+    async def run():
+        first = await ocr_page(b"png bytes", model, cache=cache)
+        second = await ocr_page(b"png bytes", model, cache=cache)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert model.calls == 1
+    assert not first.cache_hit and first.input_tokens == 100
+    assert second.cache_hit and second.input_tokens == 0
+    assert second.content == first.content
+
+
+def test_in_memory_cache_lru_eviction():
+    cache = InMemoryCache(max_entries=2)
+    value = CompletionResponse(content="", input_tokens=0, output_tokens=0)
+
+    async def run():
+        await cache.set("a", value)
+        await cache.set("b", value)
+        await cache.get("a")
+        await cache.set("c", value)
+        return await cache.get("a"), await cache.get("b")
+
+    a, b = asyncio.run(run())
+    assert a is not None and b is None
+
+
+def test_sqlite_cache_persistence_and_eviction(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    value = CompletionResponse(content="page", input_tokens=1, output_tokens=2)
+
+    async def fill():
+        cache = SQLiteCache(path, max_entries=2)
+        for key in ("a", "b", "c"):
+            await cache.set(key, value)
+            time.sleep(0.01)
+        cache.close()
+
+    async def read():
+        cache = SQLiteCache(path, ttl=60)
+        return len(cache), await cache.get("a"), await cache.get("c")
+
+    asyncio.run(fill())
+    entries, a, c = asyncio.run(read())
+    assert entries == 2
+    assert a is None
+    assert c == value
@@ -0,0 +1,38 @@
+import asyncio
+import os
+
+from pyzerox import zerox
+from pyzerox.checkpoint import SQLiteCheckpointStore
+from pyzerox.models import CompletionResponse
+
+
+def test_resume_sequential_maintain_format(fake_pipeline, tmp_path):
+    requests = []
+    failing_pages = {"3"}
+
+    async def completion(image_path, maintain_format, prior_page, image_bytes=None) -> CompletionResponse:
+        page_number = os.path.basename(image_path)
+        requests.append((page_number, prior_page))
+        if page_number in failing_pages:
+            raise RuntimeError("provider outage")
+        return CompletionResponse(content=f"page {page_number}", input_tokens=10, output_tokens=1)
+
+    source = fake_pipeline(4, completion)
+    checkpoint = SQLiteCheckpointStore(str(tmp_path / "checkpoints.db"))
+
+    def run():
+        requests.clear()
+        return asyncio.run(zerox(
+            file_path=source, maintain_format=True, checkpoint=checkpoint, render_processes=1, cleanup=False
+        ))
+
+    first = run()
+    assert [page.page for page in first.pages] == [1, 2, 4]
+
+    failing_pages.clear()
+    second = run()
+    ## only the failed page is processed again, with the recorded page before it as its context
+    assert [page_number for page_number, _ in requests] == ["3"]
+    assert requests[0][1] == "page 2"
+    assert [(page.page, page.resumed) for page in second.pages] == [(1, True), (2, True), (3, False), (4, True)]
+    assert second.resumed_pages == 3 and second.input_tokens == 40
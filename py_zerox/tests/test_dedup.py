@@ -0,0 +1,66 @@
+import asyncio
+import io
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from pyzerox.models import CompletionResponse
+from pyzerox.processor import PageHashIndex, image_to_bytes, perceptual_hash, process_pages_as_completed
+
+
+def page_image(title: str, noise: int = 0, jpeg: bool = False) -> bytes:
+    image = Image.new("L", (816, 1056), 255)
+    draw = ImageDraw.Draw(image)
+    draw.text((80, 60), title, fill=0)
+    for line in range(40):
+        draw.text((80, 120 + line * 22), f"{title} clause {line}: the insured party shall notify the insurer " * 1, fill=0)
+    if noise:
+        pixels = np.asarray(image, dtype=np.int16) + np.random.default_rng(0).integers(-noise, noise, (1056, 816))
+        image = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+    if jpeg:
+        return image_to_bytes(image, "jpeg", quality=70)
+    return image_to_bytes(image, "png")
+
+
+def distance(first: bytes, second: bytes) -> float:
+    first_hash, second_hash = perceptual_hash(first), perceptual_hash(second)
+    return np.unpackbits(first_hash ^ second_hash).sum() / (first_hash.size * 8)
+
+
+def test_perceptual_hash():
+    assert distance(page_image("Schedule A"), page_image("Schedule A", noise=6, jpeg=True)) <= 0.02
+    assert distance(page_image("Schedule A"), page_image("Annex B")) > 0.02
+    ## pages differing in a character hash alike, the ink map verification keeps them apart
+    assert distance(page_image("Schedule A"), page_image("Schedule B")) <= 0.02
+
+
+class CountingModel:
+    model = "gpt-4o-mini"
+    system_prompt = ""
+    kwargs = {}
+
+    def __init__(self):
+        self.calls = 0
+
+    async def completion(self, image_path, maintain_format, prior_page, image_bytes=None) -> CompletionResponse:
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return CompletionResponse(content=f"call {self.calls}", input_tokens=10, output_tokens=5)
+
+
+def test_duplicate_pages_share_one_call():
+    model = CountingModel()
+    index = PageHashIndex()
+    images = [page_image("Letterhead"), page_image("Annex B"), page_image("Letterhead", noise=6), page_image("Letterheaf")]
+
+    async def run(images):
+        return [page async for _, page in process_pages_as_completed(images, 3, model, ordered=True, page_hash_index=index)]
+
+    pages = asyncio.run(run(images))
+    assert model.calls == 3
+    assert [page.provenance for page in pages] == ["vision", "vision", "duplicate", "vision"]
+    assert pages[2].content == pages[0].content and pages[2].input_tokens == 0
+
+    ## a shared index deduplicates across calls as well
+    pages = asyncio.run(run([page_image("Annex B", jpeg=True)]))
+    assert model.calls == 3 and pages[0].provenance == "duplicate"
@@ -0,0 +1,121 @@
+import asyncio
+import os
+
+import pytest
+from aiohttp import web
+
+from pyzerox.core.types import DownloadLimits
+from pyzerox.errors import DownloadLimitExceeded, ResourceUnreachableException
+from pyzerox.processor import download_file, link_or_copy
+
+CONTENT = bytes(range(256)) * 4096
+
+
+async def serve(handler):
+    app = web.Application()
+    app.router.add_get("/files/doc.pdf", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/files/doc.pdf?signature=abc"
+
+
+def test_download_resumes_after_dropped_connection(tmp_path):
+    ranges = []
+
+    async def handler(request):
+        ranges.append(request.headers.get("Range"))
+        response = web.StreamResponse(headers={"ETag": '"v1"', "Accept-Ranges": "bytes"})
+        if request.headers.get("Range"):
+            start = int(request.headers["Range"][len("bytes=") : -1])
+            assert request.headers["If-Range"] == '"v1"'
+            response.set_status(206)
+            response.headers["Content-Range"] = f"bytes {start}-{len(CONTENT) - 1}/{len(CONTENT)}"
+            response.content_length = len(CONTENT) - start
+            await response.prepare(request)
+            await response.write(CONTENT[start:])
+            return response
+
+        ## first request: send half the file and drop the connection
+        response.content_length = len(CONTENT)
+        await response.prepare(request)
+        await response.write(CONTENT[: len(CONTENT) // 2])
+        request.transport.close()
+        return response
+
+    async def run():
+        runner, url = await serve(handler)
+        try:
+            return await download_file(url, str(tmp_path), DownloadLimits(max_retries=2))
+        finally:
+            await runner.cleanup()
+
+    local_path = asyncio.run(run())
+    assert local_path == str(tmp_path / "doc.pdf")
+    assert open(local_path, "rb").read() == CONTENT
+    assert ranges[0] is None and ranges[1].startswith("bytes=")
+
+
+def test_download_size_limit(tmp_path):
+    async def handler(request):
+        return web.Response(body=CONTENT)
+
+    async def run():
+        runner, url = await serve(handler)
+        try:
+            await download_file(url, str(tmp_path), DownloadLimits(max_size=1024))
+        finally:
+            await runner.cleanup()
+
+    with pytest.raises(DownloadLimitExceeded):
+        asyncio.run(run())
+
+
+def test_stalled_read_is_not_reported_as_timeout(tmp_path):
+    async def handler(request):
+        response = web.StreamResponse()
+        response.content_length = len(CONTENT)
+        await response.prepare(request)
+        await response.write(CONTENT[:1024])
+        await asyncio.sleep(5)
+        return response
+
+    async def run():
+        runner, url = await serve(handler)
+        try:
+            await download_file(url, str(tmp_path), DownloadLimits(timeout=60, read_timeout=0.2, max_retries=1))
+        finally:
+            await runner.cleanup()
+
+    ## the read timeout ran out on every attempt, the total timeout did not
+    with pytest.raises(ResourceUnreachableException) as error:
+        asyncio.run(run())
+    assert "stalled" in str(error.value) and "2 attempts" in str(error.value)
+
+
+def test_local_files_are_used_in_place(tmp_path):
+    source = tmp_path / "scan.pdf"
+    source.write_bytes(CONTENT)
+    temp_dir = tmp_path / "temp"
+    temp_dir.mkdir()
+
+    assert asyncio.run(download_file(str(source), str(temp_dir))) == str(source)
+
+    ## when a private path is needed, the file is linked rather than copied
+    linked = asyncio.run(download_file(str(source), str(temp_dir), in_place=False))
+    assert linked == str(temp_dir / "scan.pdf")
+    assert os.stat(linked).st_ino == source.stat().st_ino
+
+
+def test_link_or_copy_falls_back_to_copy(tmp_path, monkeypatch):
+    source = tmp_path / "scan.pdf"
+    source.write_bytes(CONTENT)
+
+    def no_link(source, destination):
+        raise OSError("cross-device link")
+
+    monkeypatch.setattr(os, "link", no_link)
+    copied = link_or_copy(str(source), str(tmp_path / "copy.pdf"))
+    assert open(copied, "rb").read() == CONTENT
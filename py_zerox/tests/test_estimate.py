@@ -0,0 +1,64 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+from PyPDF2 import PdfWriter
+
+import pyzerox
+from pyzerox import DEFAULT_SYSTEM_PROMPT, estimate_zerox
+from pyzerox.core.estimate import project_duration
+from pyzerox.processor import rendered_page_size
+from pyzerox.scheduler import estimate_request_tokens
+
+
+def test_rendered_page_size():
+    ## the default size scales the height to 1056 pixels and keeps the aspect ratio
+    assert rendered_page_size(612, 792) == (816, 1056)
+    assert rendered_page_size(612, 792, dpi=72, size=None) == (612, 792)
+    assert rendered_page_size(612, 792, size=1000) == (773, 1000)
+
+
+def test_estimate_matches_pipeline_sizing(tmp_path):
+    writer = PdfWriter()
+    writer.add_blank_page(612, 792)
+    writer.add_blank_page(612, 792)
+    writer.pages[1].rotate(90)
+    source = tmp_path / "doc.pdf"
+    with open(source, "wb") as pdf_file:
+        writer.write(pdf_file)
+
+    estimate = asyncio.run(estimate_zerox(str(source), model="gpt-4o-mini", concurrency=1, output_tokens_per_page=100, page_latency=1000))
+    assert [(page.width, page.height) for page in estimate.pages] == [(816, 1056), (1367, 1056)]
+    assert estimate.pages[0].input_tokens == estimate_request_tokens((816, 1056), "gpt-4o-mini", DEFAULT_SYSTEM_PROMPT)
+    assert estimate.output_tokens == 200
+    assert (estimate.duration, estimate.bottleneck) == (2000, "concurrency")
+    assert estimate.cost is not None and estimate.cost > 0
+
+
+def test_project_duration_rate_limits():
+    ## 120 requests at 60 per minute: the first 60 go right away, the rest take a minute
+    assert project_duration([100] * 120, concurrency=100, requests_per_minute=60, page_latency=1000) == (61000, "requests_per_minute")
+    assert project_duration([1000] * 10, concurrency=10, tokens_per_minute=5000, page_latency=1000) == (61000, "tokens_per_minute")
+
+
+def test_cli_estimate(tmp_path):
+    writer = PdfWriter()
+    writer.add_blank_page(612, 792)
+    source = tmp_path / "doc.pdf"
+    with open(source, "wb") as pdf_file:
+        writer.write(pdf_file)
+
+    package_root = os.path.dirname(os.path.dirname(pyzerox.__file__))
+    result = subprocess.run(
+        [sys.executable, "-m", "pyzerox", "estimate", str(source), "--concurrency", "2", "--json"],
+        cwd=package_root,
+        env={**os.environ, "LITELLM_LOCAL_MODEL_COST_MAP": "True"},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    [estimate] = json.loads(result.stdout)
+    assert (estimate["file_name"], estimate["page_count"]) == ("doc", 1)
+    assert estimate["pages"][0]["width"] == 816
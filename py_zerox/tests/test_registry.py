@@ -0,0 +1,29 @@
+from pyzerox.models import ModelRegistry
+
+
+class FakeClient:
+    created = 0
+
+    def __init__(self, model, **kwargs):
+        FakeClient.created += 1
+        self.model, self.kwargs = model, kwargs
+        self.system_prompt = "default"
+
+
+def test_clients_are_shared_per_model_and_kwargs():
+    created, closed = [], []
+    registry = ModelRegistry(factory=FakeClient, on_create=created.append, on_close=closed.append)
+
+    client = registry.get("gpt-4o-mini", temperature=0)
+    assert registry.get("gpt-4o-mini", temperature=0) is client
+    assert registry.get("gpt-4o-mini", temperature=0.5) is not client
+    assert registry.get("gpt-4o-mini", system_prompt="custom", temperature=0).system_prompt == "custom"
+    assert client.system_prompt == "default"
+    assert len(created) == FakeClient.created == 3
+
+    registry.evict("gpt-4o-mini", temperature=0)
+    assert closed == [client]
+    assert registry.get("gpt-4o-mini", temperature=0) is not client
+
+    registry.close()
+    assert len(registry) == 0 and len(closed) == 4
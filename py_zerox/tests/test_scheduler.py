@@ -0,0 +1,150 @@
+import asyncio
+import time
+
+import pytest
+
+from pyzerox.scheduler import (
+    AdaptiveConcurrencyLimiter,
+    RequestScheduler,
+    TokenBucket,
+    estimate_image_tokens,
+    get_retry_after,
+    is_retryable_error,
+)
+
+
+class ProviderError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+def test_error_classification():
+    assert is_retryable_error(ProviderError(429))
+    assert is_retryable_error(ProviderError(503))
+    assert not is_retryable_error(ProviderError(400))
+
+    # errors re-raised by the model interface keep the provider error as their cause
+    try:
+        try:
+            raise ProviderError(429, {"retry-after": "2"})
+        except ProviderError as err:
+            raise Exception("completion failed") from err
+    except Exception as wrapped:
+        assert is_retryable_error(wrapped)
+        assert get_retry_after(wrapped) == 2.0
+
+
+def test_token_bucket_waits_for_refill():
+    async def run():
+        bucket = TokenBucket(capacity=10, period=1.0)
+        await bucket.acquire(10)
+        start = time.monotonic()
+        await bucket.acquire(5)
+        return time.monotonic() - start
+
+    assert asyncio.run(run()) >= 0.4
+
+
+def test_scheduler_retries_with_retry_after():
+    calls = []
+
+    async def request():
+        calls.append(time.monotonic())
+        if len(calls) < 3:
+            raise ProviderError(429, {"retry-after": "0.05"})
+        return "ok"
+
+    scheduler = RequestScheduler(max_retries=3)
+    assert asyncio.run(scheduler.run(request)) == "ok"
+    assert len(calls) == 3
+    assert calls[1] - calls[0] >= 0.05
+
+
+def test_scheduler_does_not_retry_client_errors():
+    calls = []
+
+    async def request():
+        calls.append(1)
+        raise ProviderError(400)
+
+    with pytest.raises(ProviderError):
+        asyncio.run(RequestScheduler(max_retries=3).run(request))
+    assert len(calls) == 1
+
+
+def test_image_token_estimate():
+    # 816x1056 page -> 768x994 -> 2x2 tiles
+    assert estimate_image_tokens(816, 1056, "gpt-4o") == 85 + 170 * 4
+    assert estimate_image_tokens(816, 1056, "gpt-4o-mini") == 2833 + 5667 * 4
+
+
+def test_adaptive_concurrency_aimd():
+    async def run():
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=4, max_limit=8)
+        for _ in range(4 + 5 + 6):
+            limiter.record(100)
+        grown = limiter.limit
+        limiter.record(100, ProviderError(429))
+        return grown, limiter.limit, limiter.history
+
+    grown, backed_off, history = asyncio.run(run())
+    assert grown == 7
+    assert backed_off == 3
+    assert [limit for _, limit in history] == [4, 5, 6, 7, 3]
+
+
+def test_adaptive_concurrency_bounds_in_flight():
+    async def run():
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=2)
+        peak = 0
+
+        async def task():
+            nonlocal peak
+            async with limiter:
+                peak = max(peak, limiter.in_flight)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(task() for _ in range(6)))
+        return peak
+
+    assert asyncio.run(run()) == 2
+
+
+def test_adaptive_concurrency_ignores_page_size():
+    ## constant load: 800ms per request plus 12ms per output token, one sparse page then dense and mixed pages
+    output_tokens = [40] + [1500] * 30 + [40, 600, 1500, 200, 900] * 20
+
+    def run(normalize: bool):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=4, max_limit=8)
+        for tokens in output_tokens:
+            limiter.record(800 + 12 * tokens, output_tokens=tokens if normalize else None)
+        return [limit for _, limit in limiter.history]
+
+    limits = run(normalize=True)
+    assert limits == sorted(limits) and limits[-1] == 8
+    ## compared in plain latency, the dense pages look like an overloaded provider
+    assert run(normalize=False)[1] < 4
+
+
+def test_scheduler_takes_tokens_once_across_retries():
+    calls = []
+
+    async def request():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ProviderError(429, {"retry-after": "0.01"})
+        return "ok"
+
+    async def run():
+        scheduler = RequestScheduler(requests_per_minute=600, tokens_per_minute=60_000, max_retries=3)
+        await scheduler.run(request, estimated_tokens=20_000)
+        scheduler.record_usage(20_000, 15_000)
+        return scheduler._request_bucket.tokens, scheduler._token_bucket.tokens
+
+    requests_left, tokens_left = asyncio.run(run())
+    assert len(calls) == 3
+    ## three attempts take three requests, the tokens are taken once and corrected to the actual usage
+    assert 597 <= requests_left < 598
+    assert 45_000 <= tokens_left < 45_100
@@ -0,0 +1,284 @@
+import asyncio
+import io
+import os
+import sys
+import time
+
+from PIL import Image
+
+from pyzerox import PriorPageContext, zerox, zerox_stream
+from pyzerox.core.zerox import get_output_file_name
+from pyzerox.models import CompletionResponse
+from pyzerox.processor import (
+    convert_pdf_to_images,
+    encoded_image_bytes,
+    image_to_bytes,
+    iter_pdf_images,
+    process_pages_as_completed,
+)
+
+pdf_module = sys.modules["pyzerox.processor.pdf"]
+zerox_module = sys.modules["pyzerox.core.zerox"]
+
+
+class FakeModel:
+    """Stand-in for litellmmodel, pages named "<delay>" complete after that many seconds."""
+
+    async def completion(self, image_path, maintain_format, prior_page, image_bytes=None) -> CompletionResponse:
+        await asyncio.sleep(float(image_path))
+        return CompletionResponse(content=f"page {image_path}", input_tokens=10, output_tokens=5)
+
+
+async def collect(ordered: bool):
+    return [
+        (index, page)
+        async for index, page in process_pages_as_completed(
+            ["0.03", "0.01", "0.02"], 3, FakeModel(), ordered=ordered
+        )
+    ]
+
+
+def test_completion_order():
+    results = asyncio.run(collect(ordered=False))
+    assert [index for index, _ in results] == [1, 2, 0]
+
+
+def test_page_order():
+    results = asyncio.run(collect(ordered=True))
+    assert [index for index, _ in results] == [0, 1, 2]
+    page = results[0][1]
+    assert (page.page, page.content, page.input_tokens, page.output_tokens) == (1, "page 0.03", 10, 5)
+
+
+def test_stopping_early_awaits_pending_pages():
+    cancelled = []
+
+    class CancellableModel(FakeModel):
+        async def completion(self, image_path, maintain_format, prior_page, image_bytes=None) -> CompletionResponse:
+            try:
+                return await super().completion(image_path, maintain_format, prior_page, image_bytes)
+            except asyncio.CancelledError:
+                cancelled.append(image_path)
+                raise
+
+    async def run():
+        pages = process_pages_as_completed(["0", "5", "5"], 3, CancellableModel(), ordered=False)
+        await anext(pages)
+        await pages.aclose()
+        ## the pending pages are done once the consumer has stopped, not left for the event loop to clean up
+        return list(cancelled)
+
+    assert asyncio.run(run()) == ["5", "5"]
+
+
+def test_reorder_window():
+    started = []
+    held_back = []
+
+    class SlowFirstModel(FakeModel):
+        async def completion(self, image_path, maintain_format, prior_page, image_bytes=None) -> CompletionResponse:
+            started.append(image_path)
+            return await super().completion(image_path, maintain_format, prior_page, image_bytes)
+
+    async def run():
+        images = ["0.2"] + ["0"] * 199
+        yielded = []
+        async for index, _ in process_pages_as_completed(images, 50, SlowFirstModel(), ordered=True, reorder_window=8):
+            ## pages started but not yet yielded are the ones held back (or still running)
+            held_back.append(len(started) - len(yielded))
+            yielded.append(index)
+        return yielded
+
+    assert asyncio.run(run()) == list(range(200))
+    ## the slow first page holds the dispatch at the window, not at the end of the document
+    assert max(held_back) <= 8
+
+
+def test_pipelined_rasterization(monkeypatch):
+    rendered_chunks = []
+
+    def fake_convert_from_path(first_page, last_page, **kwargs):
+        rendered_chunks.append((first_page, last_page))
+        return ["0.001"] * (last_page - first_page + 1)
+
+    monkeypatch.setattr(pdf_module, "pdfinfo_from_path", lambda path: {"Pages": 10})
+    monkeypatch.setattr(pdf_module, "convert_from_path", fake_convert_from_path)
+
+    async def run():
+        images = iter_pdf_images("doc.pdf", "", pages_per_chunk=4, max_lookahead_chunks=1, render_processes=1)
+        return [index async for index, _ in process_pages_as_completed(images, 2, FakeModel(), ordered=True)]
+
+    assert asyncio.run(run()) == list(range(10))
+    assert rendered_chunks == [(1, 4), (5, 8), (9, 10)]
+
+
+def test_process_pool_rasterization(monkeypatch):
+    def fake_convert_from_path(first_page, last_page, thread_count, **kwargs):
+        ## later chunks finish first, the images still come out in page order
+        time.sleep(0.05 * (10 - first_page) / 10)
+        return [f"{page}.png" for page in range(first_page, last_page + 1)]
+
+    monkeypatch.setattr(pdf_module, "pdfinfo_from_path", lambda path: {"Pages": 10})
+    monkeypatch.setattr(pdf_module, "convert_from_path", fake_convert_from_path)
+
+    async def run(render_shards):
+        return await convert_pdf_to_images("doc.pdf", "", render_processes=3, pages_per_chunk=3, render_shards=render_shards)
+
+    render_shards = []
+    assert asyncio.run(run(render_shards)) == [f"{page}.png" for page in range(1, 11)]
+    assert [(shard.first_page, shard.last_page) for shard in render_shards] == [(1, 3), (4, 6), (7, 9), (10, 10)]
+    assert all(shard.render_time > 0 for shard in render_shards)
+
+
+def test_in_memory_keeps_rendered_png(monkeypatch):
+    ## a PNG encoded the way PIL wouldn't by default, it has to come back byte for byte
+    with io.BytesIO() as buffer:
+        Image.new("RGB", (40, 60), "white").save(buffer, format="png", compress_level=0)
+        rendered = buffer.getvalue()
+
+    def fake_convert_from_path(first_page, last_page, **kwargs):
+        ## pdf2image parses pdftoppm's output into lazily decoded images
+        return [Image.open(io.BytesIO(rendered)) for _ in range(first_page, last_page + 1)]
+
+    monkeypatch.setattr(pdf_module, "convert_from_path", fake_convert_from_path)
+    images, _ = pdf_module._render_pages("doc.pdf", None, 1, 2, in_memory=True)
+    assert images == [rendered, rendered]
+    ## images not opened from an encoded buffer are encoded with PIL's defaults
+    blank = Image.new("RGB", (40, 60), "white")
+    assert encoded_image_bytes(blank) == image_to_bytes(blank, "png")
+
+
+def test_shared_pool_interleaves_documents():
+    calls = []
+
+    class RecordingModel(FakeModel):
+        def __init__(self, name):
+            self.name = name
+
+        async def completion(self, image_path, maintain_format, prior_page, image_bytes=None) -> CompletionResponse:
+            calls.append(self.name)
+            return await super().completion(image_path, maintain_format, prior_page, image_bytes)
+
+    async def document(name, pool):
+        return [page async for _, page in process_pages_as_completed(["0.01"] * 3, pool, RecordingModel(name))]
+
+    async def run():
+        pool = asyncio.Semaphore(1)
+        return await asyncio.gather(document("a", pool), document("b", pool))
+
+    first, second = asyncio.run(run())
+    assert len(first) == len(second) == 3
+    ## each document has one page waiting in line at a time, so neither runs all its pages first
+    assert "b" in calls[:3] and "a" in calls[3:]
+
+
+def test_selected_pages_render_from_original(fake_pipeline):
+    async def completion(image_path, maintain_format, prior_page, image_bytes=None) -> CompletionResponse:
+        return CompletionResponse(content=os.path.basename(image_path), input_tokens=1, output_tokens=1)
+
+    source = fake_pipeline(2000, completion)
+
+    async def run():
+        return [
+            page
+            async for page in zerox_stream(
+                file_path=source, select_pages=[9, 2, 3, 4, 3], render_processes=1, cleanup=False
+            )
+        ]
+
+    pages = asyncio.run(run())
+    assert [(page.page, page.content) for page in pages] == [(2, "2"), (3, "3"), (4, "4"), (9, "9")]
+    assert fake_pipeline.rendered == [(source, 2, 4), (source, 9, 9)]
+
+
+def test_page_stage_stats(fake_pipeline):
+    async def completion(image_path, maintain_format, prior_page, image_bytes=None) -> CompletionResponse:
+        await asyncio.sleep(0.01)
+        return CompletionResponse(content="page", input_tokens=10, output_tokens=5, encode_time=2.0)
+
+    source = fake_pipeline(4, completion, render=lambda page: Image.new("RGB", (40, 60), "white"))
+
+    seen = []
+    output = asyncio.run(
+        zerox(file_path=source, concurrency=1, in_memory=True, render_processes=1, on_page=seen.append)
+    )
+    assert seen == output.pages
+    page = output.pages[0]
+    assert (page.image_width, page.image_height, page.encode_time) == (40, 60, 2.0)
+    assert page.payload_bytes > 0 and page.model_latency >= 5
+    ## one slot for four pages, the later ones wait for it
+    assert output.pages[-1].queue_wait > 0
+    assert output.page_stats["queue_wait"]["max"] >= output.page_stats["queue_wait"]["p50"]
+    assert output.page_stats["input_tokens"] == {"p50": 10.0, "p90": 10.0, "p99": 10.0, "max": 10.0}
+
+
+def test_format_anchor_pages(fake_pipeline):
+    requests = []
+
+    async def completion(image_path, maintain_format, prior_page, image_bytes=None) -> CompletionResponse:
+        page_number = os.path.basename(image_path)
+        requests.append((page_number, prior_page))
+        await asyncio.sleep(0.01)
+        content = f"# Schedule\n\n| Benefit | Page |\n|---|---|\n| a | {page_number} |\n| b | {page_number} |"
+        return CompletionResponse(content=content, input_tokens=1, output_tokens=1)
+
+    source = fake_pipeline(5, completion)
+
+    output = asyncio.run(
+        zerox(file_path=source, maintain_format=True, format_anchor_pages=1, render_processes=1, cleanup=False)
+    )
+    assert [page.page for page in output.pages] == [1, 2, 3, 4, 5]
+    ## the anchor page goes alone, every other page gets the template derived from it
+    assert requests[0] == ("1", "")
+    template = "# Schedule\n\n| Benefit | Page |\n|---|---|\n| a | 1 |"
+    assert sorted(requests[1:]) == [(str(page), template) for page in range(2, 6)]
+
+
+def test_prior_page_context(fake_pipeline):
+    prior_pages = []
+    table = "## Benefits\n\n| Benefit | Amount |\n|---|---|\n" + "\n".join(f"| row {row} | {row * 100} |" for row in range(200))
+
+    async def completion(image_path, maintain_format, prior_page, image_bytes=None) -> CompletionResponse:
+        prior_pages.append(prior_page)
+        return CompletionResponse(content=table, input_tokens=100 + len(prior_page) // 4, output_tokens=1)
+
+    source = fake_pipeline(3, completion)
+
+    def run(prior_page_context=None):
+        prior_pages.clear()
+        return asyncio.run(zerox(
+            file_path=source, maintain_format=True, prior_page_context=prior_page_context, render_processes=1, cleanup=False
+        ))
+
+    full = run()
+    bounded = run(PriorPageContext(policy="structural_tail", max_tokens=64))
+    assert prior_pages[0] == "" and all(len(prior_page) <= 64 * 4 for prior_page in prior_pages)
+    ## the table the page ends in keeps its header
+    assert prior_pages[1].startswith("## Benefits\n| Benefit | Amount |\n|---|---|\n...\n")
+    assert prior_pages[1].endswith("| row 199 | 19900 |")
+    assert bounded.input_tokens < full.input_tokens
+
+
+def test_output_file_name_comes_from_input(fake_pipeline, monkeypatch, tmp_path):
+    async def completion(image_path, maintain_format, prior_page, image_bytes=None) -> CompletionResponse:
+        return CompletionResponse(content="page", input_tokens=1, output_tokens=1)
+
+    async def fake_download(file_path, temp_dir, limits=None):
+        ## downloads are saved under the URL path, without the query string
+        return downloaded
+
+    downloaded = fake_pipeline(1, completion)
+    source = tmp_path / "Q3 Report.v2.pdf"
+    source.write_bytes(b"%PDF-1.4")
+    monkeypatch.setattr(zerox_module, "download_file", fake_download)
+
+    output_dir = tmp_path / "output"
+    output = asyncio.run(zerox(file_path=str(source), output_dir=str(output_dir), render_processes=1, cleanup=False))
+    assert output.file_name == "q3_report_v2"
+    assert (output_dir / "q3_report_v2.md").read_text() == "page"
+
+    url = "https://example.com/files/Q3-Report.v2.pdf?signature=abc"
+    output = asyncio.run(zerox(file_path=url, output_dir=str(output_dir), render_processes=1, cleanup=False))
+    ## named as before streaming, from the basename of the URL as given
+    assert output.file_name == get_output_file_name(url) == "q3_report_v2"
+    assert sorted(path.name for path in output_dir.iterdir()) == ["q3_report_v2.md"]
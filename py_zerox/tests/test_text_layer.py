@@ -0,0 +1,50 @@
+import asyncio
+import os
+import sys
+
+from pyzerox import zerox
+from pyzerox.models import CompletionResponse
+from pyzerox.processor import score_text_layer, text_layer_to_markdown
+
+text_layer_module = sys.modules["pyzerox.processor.text_layer"]
+
+
+def test_score_text_layer():
+    prose = "The quick brown fox jumps over the lazy dog. " * 10
+    assert score_text_layer(prose) > 0.95
+    assert score_text_layer("") == 0.0
+    assert score_text_layer("(cid:12)(cid:34)(cid:56) " * 40) < 0.5
+    assert score_text_layer("2021 1.500.000 3.000.000 12% 4.500 " * 20) < 0.5
+
+
+def test_text_layer_to_markdown():
+    markdown = text_layer_to_markdown("First line\nof a paragraph.\n\n• an item\n• another item")
+    assert "First line of a paragraph." in markdown
+    assert "- an item" in markdown
+
+
+def test_text_layer_pages_skip_the_model(fake_pipeline, monkeypatch):
+    prose = "The quick brown fox jumps over the lazy dog. " * 10
+    texts = [prose, "(cid:12)(cid:34)(cid:56) " * 40, prose, ""]
+    requests = []
+
+    class FakeReader:
+        def __init__(self, stream):
+            self.pages = [type("PageObject", (), {"extract_text": lambda self, text=text: text})() for text in texts]
+
+    async def completion(image_path, maintain_format, prior_page, image_bytes=None) -> CompletionResponse:
+        requests.append(os.path.basename(image_path))
+        return CompletionResponse(content=f"vision {os.path.basename(image_path)}", input_tokens=10, output_tokens=5)
+
+    source = fake_pipeline(len(texts), completion)
+    monkeypatch.setattr(text_layer_module, "PdfReader", FakeReader)
+
+    output = asyncio.run(zerox(file_path=source, text_layer_threshold=0.9, render_processes=1, cleanup=False))
+    assert [(page.page, page.provenance) for page in output.pages] == [
+        (1, "text_layer"), (2, "vision"), (3, "text_layer"), (4, "vision")
+    ]
+    assert output.pages[0].content.startswith("The quick brown fox") and output.pages[0].input_tokens == 0
+    ## only the scanned pages are rendered and sent to the model
+    assert sorted(requests) == ["2", "4"]
+    assert fake_pipeline.rendered == [(source, 2, 2), (source, 4, 4)]
+    assert output.input_tokens == 20
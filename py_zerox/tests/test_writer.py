@@ -0,0 +1,50 @@
+import asyncio
+import json
+
+from pyzerox import MarkdownWriter, zerox
+from pyzerox.core.types import Page
+from pyzerox.models import CompletionResponse
+
+
+def make_page(number: int, content: str) -> Page:
+    return Page(content=content, content_length=len(content), page=number)
+
+
+def test_writes_contiguous_prefix(tmp_path):
+    markdown_path = tmp_path / "doc.md"
+
+    async def run():
+        async with MarkdownWriter(str(tmp_path), "doc", jsonl=True, page_numbers=[1, 2, 3, 5]) as writer:
+            await writer.write(make_page(2, "two"))
+            await writer.write(make_page(3, "three"))
+            ## page 1 is still missing, nothing can be written yet
+            assert markdown_path.read_text() == ""
+            await writer.write(make_page(1, "one"))
+            assert markdown_path.read_text() == "one\n\ntwo\n\nthree"
+            await writer.write(make_page(5, ""), include_markdown=False)
+
+    asyncio.run(run())
+    assert markdown_path.read_text() == "one\n\ntwo\n\nthree"
+    sidecar = [json.loads(line) for line in (tmp_path / "doc.pages.jsonl").read_text().splitlines()]
+    assert [page["page"] for page in sidecar] == [2, 3, 1, 5]
+    assert sidecar[0]["content"] == "two" and "model_latency" in sidecar[0]
+
+
+def test_output_dir_drops_page_content(fake_pipeline, tmp_path):
+    async def completion(image_path, maintain_format, prior_page, image_bytes=None) -> CompletionResponse:
+        return CompletionResponse(content=f"page {image_path.rsplit('/', 1)[-1]}", input_tokens=1, output_tokens=1)
+
+    source = fake_pipeline(3, completion)
+
+    output_dir = tmp_path / "output"
+    output = asyncio.run(zerox(
+        file_path=source, output_dir=str(output_dir), keep_page_content=False, render_processes=1, cleanup=False
+    ))
+    assert (output_dir / "doc.md").read_text() == "page 1\n\npage 2\n\npage 3"
+    ## the markdown is only on disk, the pages keep their usage
+    assert [(page.page, page.content, page.content_length) for page in output.pages] == [(1, "", 6), (2, "", 6), (3, "", 6)]
+    assert output.input_tokens == 3
+
+    ## pages keep their content by default
+    kept = asyncio.run(zerox(file_path=source, output_dir=str(output_dir), render_processes=1, cleanup=False))
+    assert [page.content for page in kept.pages] == ["page 1", "page 2", "page 3"]
@@ -1,10 +1,17 @@
-from .core import zerox
+from .core import zerox, zerox_batch, zerox_stream, estimate_zerox, MarkdownWriter, BlankPageThresholds, DownloadLimits, PriorPageContext
 from .constants.prompts import Prompts
 
 DEFAULT_SYSTEM_PROMPT = Prompts.DEFAULT_SYSTEM_PROMPT
 
 __all__ = [
     "zerox",
+    "zerox_batch",
+    "zerox_stream",
+    "estimate_zerox",
+    "MarkdownWriter",
+    "BlankPageThresholds",
+    "DownloadLimits",
+    "PriorPageContext",
     "Prompts",
     "DEFAULT_SYSTEM_PROMPT",
 ]
@@ -0,0 +1,4 @@
+# Package Imports
+from .cli import main
+
+main()
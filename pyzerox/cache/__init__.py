@@ -0,0 +1,11 @@
+from .base import BaseCache
+from .memory import InMemoryCache
+from .sqlite import SQLiteCache
+from .utils import make_cache_key
+
+__all__ = [
+    "BaseCache",
+    "InMemoryCache",
+    "SQLiteCache",
+    "make_cache_key",
+]
@@ -0,0 +1,33 @@
+from abc import ABC, abstractmethod
+from typing import Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from ..models import CompletionResponse
+
+
+class BaseCache(ABC):
+    """
+    Base class for all OCR result caches.
+    Caches map a content addressed key (see :func:`make_cache_key`) to the model's completion response.
+    """
+
+    @abstractmethod
+    async def get(
+        self,
+        key: str,
+    ) -> Optional["CompletionResponse"]:
+        raise NotImplementedError("Subclasses must implement this method")
+
+    @abstractmethod
+    async def set(
+        self,
+        key: str,
+        value: "CompletionResponse",
+    ) -> None:
+        raise NotImplementedError("Subclasses must implement this method")
+
+    @abstractmethod
+    async def clear(
+        self,
+    ) -> None:
+        raise NotImplementedError("Subclasses must implement this method")
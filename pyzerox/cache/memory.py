@@ -0,0 +1,39 @@
+from collections import OrderedDict
+from typing import Optional
+
+# Package Imports
+from .base import BaseCache
+from ..models.types import CompletionResponse
+
+
+class InMemoryCache(BaseCache):
+    """In-process LRU cache, evicts the least recently used entry once max_entries is reached."""
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+    ):
+        """
+        :param max_entries: The maximum number of completions to keep, defaults to 1024
+        :type max_entries: int, optional
+        """
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CompletionResponse]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[CompletionResponse]:
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: CompletionResponse) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
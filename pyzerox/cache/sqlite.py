@@ -0,0 +1,126 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+# Package Imports
+from .base import BaseCache
+from ..models.types import CompletionResponse
+
+
+class SQLiteCache(BaseCache):
+    """
+    Persistent on-disk cache backed by a single SQLite file, shared across runs and processes.
+    Entries older than ttl are dropped, and the least recently used entries are evicted once max_entries is exceeded.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: Optional[int] = None,
+        ttl: Optional[float] = None,
+    ):
+        """
+        :param path: Path to the SQLite database file, created if it doesn't exist.
+        :type path: str
+        :param max_entries: The maximum number of completions to keep, defaults to None (unbounded)
+        :type max_entries: int, optional
+        :param ttl: Time to live of an entry in seconds, defaults to None (never expires)
+        :type ttl: float, optional
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        ## a single connection shared by the worker threads, serialized by the lock
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS completions (
+                    key TEXT PRIMARY KEY,
+                    content TEXT NOT NULL,
+                    input_tokens INTEGER NOT NULL,
+                    output_tokens INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+                """
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS completions_accessed_at ON completions (accessed_at)"
+            )
+
+    async def get(self, key: str) -> Optional[CompletionResponse]:
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, value: CompletionResponse) -> None:
+        await asyncio.to_thread(self._set, key, value)
+
+    async def clear(self) -> None:
+        await asyncio.to_thread(self._clear)
+
+    def close(self) -> None:
+        """Closes the underlying database connection."""
+        with self._lock:
+            self._connection.close()
+
+    def _get(self, key: str) -> Optional[CompletionResponse]:
+        now = time.time()
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT content, input_tokens, output_tokens, created_at FROM completions WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+
+            content, input_tokens, output_tokens, created_at = row
+            if self.ttl is not None and now - created_at > self.ttl:
+                self._connection.execute("DELETE FROM completions WHERE key = ?", (key,))
+                return None
+
+            self._connection.execute(
+                "UPDATE completions SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            return CompletionResponse(
+                content=content, input_tokens=input_tokens, output_tokens=output_tokens
+            )
+
+    def _set(self, key: str, value: CompletionResponse) -> None:
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO completions VALUES (?, ?, ?, ?, ?, ?)",
+                (key, value.content, value.input_tokens, value.output_tokens, now, now),
+            )
+            self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        if self.ttl is not None:
+            self._connection.execute(
+                "DELETE FROM completions WHERE created_at < ?", (now - self.ttl,)
+            )
+        if self.max_entries is not None:
+            self._connection.execute(
+                """
+                DELETE FROM completions WHERE key IN (
+                    SELECT key FROM completions ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+
+    def _clear(self) -> None:
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM completions")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
@@ -0,0 +1,33 @@
+import hashlib
+import json
+from typing import Any, Dict, Optional
+
+
+def make_cache_key(
+    image_bytes: bytes,
+    model: Optional[str],
+    system_prompt: str,
+    prior_page: str = "",
+    completion_kwargs: Optional[Dict[str, Any]] = None,
+) -> str:
+    """
+    Builds the content addressed cache key of a page completion.
+
+    The key is a sha256 over everything that influences the model output: the page image bytes, the model name,
+    the system prompt, the prior page context and the completion kwargs (serialized with sorted keys).
+    """
+    digest = hashlib.sha256()
+    digest.update(hashlib.sha256(image_bytes).digest())
+
+    for part in (
+        model or "",
+        system_prompt,
+        prior_page,
+        json.dumps(completion_kwargs or {}, sort_keys=True, default=str),
+    ):
+        encoded = part.encode("utf-8")
+        ## length prefix so that adjacent parts can't be shifted into each other
+        digest.update(len(encoded).to_bytes(8, "big"))
+        digest.update(encoded)
+
+    return digest.hexdigest()
@@ -0,0 +1,10 @@
+from .base import BaseCheckpointStore
+from .sqlite import SQLiteCheckpointStore
+from .utils import hash_file, make_checkpoint_key
+
+__all__ = [
+    "BaseCheckpointStore",
+    "SQLiteCheckpointStore",
+    "hash_file",
+    "make_checkpoint_key",
+]
@@ -0,0 +1,35 @@
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from ..core.types import Page
+
+
+class BaseCheckpointStore(ABC):
+    """
+    Base class for all checkpoint stores.
+    A store records the completed pages of a run under its run key (see :func:`make_checkpoint_key`), so an interrupted
+    run of the same document and configuration only processes the pages which are not done yet.
+    """
+
+    @abstractmethod
+    async def load(
+        self,
+        run_key: str,
+    ) -> Dict[int, "Page"]:
+        raise NotImplementedError("Subclasses must implement this method")
+
+    @abstractmethod
+    async def save(
+        self,
+        run_key: str,
+        page: "Page",
+    ) -> None:
+        raise NotImplementedError("Subclasses must implement this method")
+
+    @abstractmethod
+    async def clear(
+        self,
+        run_key: Optional[str] = None,
+    ) -> None:
+        raise NotImplementedError("Subclasses must implement this method")
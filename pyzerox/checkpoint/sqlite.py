@@ -0,0 +1,91 @@
+import asyncio
+import dataclasses
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+# Package Imports
+from .base import BaseCheckpointStore
+from ..core.types import Page
+
+_PAGE_FIELDS = {page_field.name for page_field in dataclasses.fields(Page)}
+
+
+class SQLiteCheckpointStore(BaseCheckpointStore):
+    """
+    Persistent checkpoint store backed by a single SQLite file, so runs can resume after the process died.
+    Every completed page is committed as soon as it is saved.
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: Path to the SQLite database file, created if it doesn't exist.
+        :type path: str
+        """
+        self.path = path
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        ## a single connection shared by the worker threads, serialized by the lock
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS pages (
+                    run_key TEXT NOT NULL,
+                    page INTEGER NOT NULL,
+                    data TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (run_key, page)
+                )
+                """
+            )
+
+    async def load(self, run_key: str) -> Dict[int, Page]:
+        return await asyncio.to_thread(self._load, run_key)
+
+    async def save(self, run_key: str, page: Page) -> None:
+        await asyncio.to_thread(self._save, run_key, page)
+
+    async def clear(self, run_key: Optional[str] = None) -> None:
+        """Forgets the pages of a run, or of every run when run_key is None."""
+        await asyncio.to_thread(self._clear, run_key)
+
+    def close(self) -> None:
+        """Closes the underlying database connection."""
+        with self._lock:
+            self._connection.close()
+
+    def _load(self, run_key: str) -> Dict[int, Page]:
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT page, data FROM pages WHERE run_key = ? ORDER BY page", (run_key,)
+            ).fetchall()
+        ## fields added to Page since the page was saved keep their defaults
+        return {
+            page_number: Page(**{key: value for key, value in json.loads(data).items() if key in _PAGE_FIELDS})
+            for page_number, data in rows
+        }
+
+    def _save(self, run_key: str, page: Page) -> None:
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?)",
+                (run_key, page.page, json.dumps(dataclasses.asdict(page), ensure_ascii=False), time.time()),
+            )
+
+    def _clear(self, run_key: Optional[str]) -> None:
+        with self._lock, self._connection:
+            if run_key is None:
+                self._connection.execute("DELETE FROM pages")
+            else:
+                self._connection.execute("DELETE FROM pages WHERE run_key = ?", (run_key,))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
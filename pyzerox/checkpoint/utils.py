@@ -0,0 +1,42 @@
+import hashlib
+import json
+from typing import Any, Dict, Optional
+
+## bytes hashed at a time
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path: str) -> str:
+    """Returns the sha256 of a file's content, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_checkpoint_key(
+    document_hash: str,
+    model: Optional[str],
+    system_prompt: str,
+    completion_kwargs: Optional[Dict[str, Any]] = None,
+    options: Optional[Dict[str, Any]] = None,
+) -> str:
+    """
+    Builds the key of a run: a sha256 over the document content hash, the model name, the system prompt, the completion
+    kwargs and the options changing the pages' output (serialized with sorted keys).
+    Runs only resume each other's pages when all of them match.
+    """
+    digest = hashlib.sha256(document_hash.encode("utf-8"))
+    for part in (
+        model or "",
+        system_prompt,
+        json.dumps(completion_kwargs or {}, sort_keys=True, default=str),
+        json.dumps(options or {}, sort_keys=True, default=str),
+    ):
+        encoded = part.encode("utf-8")
+        ## length prefix so that adjacent parts can't be shifted into each other
+        digest.update(len(encoded).to_bytes(8, "big"))
+        digest.update(encoded)
+
+    return digest.hexdigest()
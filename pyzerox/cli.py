@@ -0,0 +1,92 @@
+import argparse
+import asyncio
+import json
+from dataclasses import asdict
+from typing import List, Optional
+
+# Package Imports
+from .core import estimate_zerox
+from .core.estimate import estimate_cost, project_duration
+from .constants import EstimateDefaultOptions
+
+
+def _estimate(args: argparse.Namespace) -> None:
+    async def run():
+        return await asyncio.gather(*(
+            estimate_zerox(
+                file_path=file_path,
+                model=args.model,
+                concurrency=args.concurrency,
+                maintain_format=args.maintain_format,
+                format_anchor_pages=args.format_anchor_pages,
+                select_pages=args.select_pages,
+                text_layer_threshold=args.text_layer_threshold,
+                requests_per_minute=args.requests_per_minute,
+                tokens_per_minute=args.tokens_per_minute,
+                output_tokens_per_page=args.output_tokens_per_page,
+                page_latency=args.page_latency,
+            )
+            for file_path in args.file_paths
+        ))
+
+    estimates = asyncio.run(run())
+    if args.json:
+        print(json.dumps([asdict(estimate) for estimate in estimates], indent=2))
+        return
+
+    for estimate in estimates:
+        print(
+            f"{estimate.file_name}: {estimate.page_count} pages, {estimate.input_tokens} input / {estimate.output_tokens} output tokens, "
+            f"{_format_cost(estimate.cost)}, {estimate.duration / 60_000:.1f} min (bound by {estimate.bottleneck})"
+        )
+
+    if len(estimates) > 1:
+        ## the documents of a batch share the concurrency pool and rate limits
+        input_tokens = sum(estimate.input_tokens for estimate in estimates)
+        output_tokens = sum(estimate.output_tokens for estimate in estimates)
+        duration, bottleneck = project_duration(
+            [page.input_tokens + page.output_tokens for estimate in estimates for page in estimate.pages if page.provenance == "vision"],
+            args.concurrency,
+            args.requests_per_minute,
+            args.tokens_per_minute,
+            args.page_latency,
+        )
+        print(
+            f"total: {sum(estimate.page_count for estimate in estimates)} pages, {input_tokens} input / {output_tokens} output tokens, "
+            f"{_format_cost(estimate_cost(args.model, input_tokens, output_tokens))}, {duration / 60_000:.1f} min (bound by {bottleneck})"
+        )
+
+
+def _format_cost(cost: Optional[float]) -> str:
+    return f"${cost:.2f}" if cost is not None else "unknown cost"
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Command line entry point, run from the directory holding pyzerox (it is vendored with the app, not installed):
+    ``python -m pyzerox estimate contract.pdf --model gpt-4o-mini --concurrency 10 --requests-per-minute 500``
+    """
+    parser = argparse.ArgumentParser(prog="python -m pyzerox")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    estimate = commands.add_parser("estimate", help="Estimate the tokens, cost and duration of processing PDFs, without calling any model")
+    estimate.add_argument("file_paths", nargs="+", help="Paths or URLs of the PDF files")
+    estimate.add_argument("--model", default="gpt-4o-mini")
+    estimate.add_argument("--concurrency", type=int, default=10)
+    estimate.add_argument("--maintain-format", action="store_true")
+    estimate.add_argument("--format-anchor-pages", type=int)
+    estimate.add_argument("--select-pages", type=int, nargs="+")
+    estimate.add_argument("--text-layer-threshold", type=float)
+    estimate.add_argument("--requests-per-minute", type=int)
+    estimate.add_argument("--tokens-per-minute", type=int)
+    estimate.add_argument("--output-tokens-per-page", type=int, default=EstimateDefaultOptions.OUTPUT_TOKENS_PER_PAGE)
+    estimate.add_argument("--page-latency", type=float, default=EstimateDefaultOptions.PAGE_LATENCY, help="Time (ms) of one page request")
+    estimate.add_argument("--json", action="store_true", help="Print the estimates, with every page, as JSON")
+    estimate.set_defaults(handler=_estimate)
+
+    args = parser.parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,25 @@
-from .conversion import PDFConversionDefaultOptions
+from .conversion import (
+    PDFConversionDefaultOptions,
+    TextLayerDefaultOptions,
+    BlankPageDefaultOptions,
+    PageHashDefaultOptions,
+    DownloadDefaultOptions,
+    FormatTemplateDefaultOptions,
+    EstimateDefaultOptions,
+    PriorPageContextDefaultOptions,
+)
 from .messages import Messages
 from .prompts import Prompts
 
 __all__ = [
     "PDFConversionDefaultOptions",
+    "TextLayerDefaultOptions",
+    "BlankPageDefaultOptions",
+    "PageHashDefaultOptions",
+    "DownloadDefaultOptions",
+    "FormatTemplateDefaultOptions",
+    "EstimateDefaultOptions",
+    "PriorPageContextDefaultOptions",
     "Messages",
     "Prompts",
 ]
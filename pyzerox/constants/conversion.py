@@ -6,3 +6,115 @@ class PDFConversionDefaultOptions:
     SIZE = (None, 1056)
     THREAD_COUNT = 4
     USE_PDFTOCAIRO = True
+
+    ## pipelined rasterization: pages rendered per pdf2image call and
+    ## how many rendered chunks may wait ahead of the model calls
+    PAGES_PER_CHUNK = 8
+    MAX_LOOKAHEAD_CHUNKS = 2
+
+    ## processes rasterizing page ranges in parallel, None for one per available core and 1 to render in a thread
+    ## THREAD_COUNT (poppler processes per pdf2image call) only applies when rendering in a thread
+    RENDER_PROCESSES = None
+
+    ## ordered processing: how far (in pages) processing may run ahead of the earliest page not yet yielded,
+    ## the pages completed out of order are held back in memory until then
+    REORDER_WINDOW = 32
+
+
+class TextLayerDefaultOptions:
+    """Default options for the embedded text layer fast path"""
+
+    ## pages scoring at least this (0 - 1) are converted without a model call
+    QUALITY_THRESHOLD = 0.8
+    ## pages with fewer non-whitespace characters are penalized, likely scans with a stray text layer
+    MIN_CHARS = 200
+    ## words longer than this are most likely broken extraction (missing spaces)
+    MAX_WORD_LENGTH = 30
+
+
+class BlankPageDefaultOptions:
+    """Default options for detecting blank and near-blank pages before the model call"""
+
+    ## pixels darker than the page background by more than this (0 - 255) count as ink
+    INK_DELTA = 60
+    ## pages with at most this fraction of ink pixels and grayscale standard deviation are blank,
+    ## well below a single line of text (about 0.001)
+    MAX_INK_COVERAGE = 0.0003
+    MAX_STD_DEV = 5.0
+    ## and only if no ink component (at the analysis size, grown by INK_COMPONENT_GAP pixels so the characters of a line
+    ## join up) is larger than this, i.e. the ink is dust or scanner noise rather than a word or a line
+    MAX_INK_COMPONENT = 40
+    INK_COMPONENT_GAP = 2
+    ## fraction of each side ignored, scanner edges and punch holes are not content
+    MARGIN_RATIO = 0.05
+    ## pages are downscaled to this longest side before the analysis
+    ANALYSIS_SIZE = 512
+
+
+class PageHashDefaultOptions:
+    """Default options for perceptual hash page deduplication"""
+
+    ## pages are reduced to HASH_SIZE x HASH_SIZE gradient bits to find candidate duplicates
+    HASH_SIZE = 32
+    ## gradients smaller than this (0 - 255) count as flat, so scanner noise on white paper doesn't flip bits
+    GRADIENT_MARGIN = 4
+    ## candidates are pages whose hashes differ in at most this fraction of bits
+    MAX_DISTANCE = 0.02
+
+    ## candidates are verified on ink maps of this width, a hash alone can't tell pages differing in a few characters apart
+    INK_MAP_WIDTH = 408
+    INK_DELTA = 60
+    ## near-identical pages differ in at most this many ink pixels within any INK_BLOCK_SIZE x INK_BLOCK_SIZE block
+    INK_BLOCK_SIZE = 4
+    MAX_INK_BLOCK_DIFFERENCE = 2
+
+    ## pages kept by a page hash index, the least recently used are evicted first
+    MAX_ENTRIES = 2000
+
+
+class DownloadDefaultOptions:
+    """Default options for downloading files from URLs"""
+
+    ## bytes read from the response and written to disk at a time
+    CHUNK_SIZE = 1024 * 1024
+    ## None for no size limit (bytes)
+    MAX_SIZE = None
+    ## seconds for the whole download including retries, and without receiving any data before resuming
+    TIMEOUT = 600.0
+    READ_TIMEOUT = 60.0
+    ## resume attempts after a dropped connection or a transient server error
+    MAX_RETRIES = 3
+    ## connections of the shared session, in total and to a single host
+    CONNECTION_LIMIT = 100
+    CONNECTION_LIMIT_PER_HOST = 20
+
+
+class FormatTemplateDefaultOptions:
+    """Default options for the format template of the parallel maintain_format mode"""
+
+    ## pages OCRed first, the format template is derived from their markdown
+    ANCHOR_PAGES = 1
+    ## characters of the template, it is sent with every remaining page
+    MAX_LENGTH = 2000
+    ## rows kept of every table (header, separator and a sample row)
+    TABLE_ROWS = 3
+    ## characters kept of the first line of every paragraph
+    SAMPLE_LENGTH = 80
+
+
+class EstimateDefaultOptions:
+    """Default assumptions of the pre-flight cost and duration estimate"""
+
+    ## markdown tokens generated per page, dense contract pages run higher
+    OUTPUT_TOKENS_PER_PAGE = 600
+    ## time (ms) of one page completion request
+    PAGE_LATENCY = 8000.0
+
+
+class PriorPageContextDefaultOptions:
+    """Default options for the previous page context sent with maintain_format"""
+
+    ## "full", "truncate", "structural_tail" or "summary", see pyzerox.core.types.PriorPageContext
+    POLICY = "structural_tail"
+    ## estimated tokens of the context
+    MAX_TOKENS = 512
@@ -47,6 +47,18 @@ class Messages:
     File not found or unreachable. Status Code: {0}
     """
 
+    DOWNLOAD_TOO_LARGE = """
+    File is larger than the download size limit of {0} bytes.
+    """
+
+    DOWNLOAD_TIMED_OUT = """
+    Download did not complete within {0} seconds.
+    """
+
+    DOWNLOAD_STALLED = """
+    Download stalled: no data received for {0} seconds, {1} attempts made.
+    """
+
     FILE_PATH_MISSING = """
     File path is invalid or missing.
     """
@@ -54,3 +66,5 @@ class Messages:
     FAILED_TO_SAVE_FILE = """Failed to save file to local drive"""
 
     FAILED_TO_PROCESS_IMAGE = """Failed to process image"""
+
+    BATCH_DOCUMENT_FAILED = """Failed to process document {0} in the batch. Error: {1}"""
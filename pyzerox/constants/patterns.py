@@ -4,3 +4,5 @@ class Patterns:
     MATCH_MARKDOWN_BLOCKS = r"^```[a-z]*\n([\s\S]*?)\n```$"
 
     MATCH_CODE_BLOCKS = r"^```\n([\s\S]*?)\n```$"
+
+    MATCH_LIST_ITEM = r"^\s*(?:[-*+]|\d+[.)])\s"
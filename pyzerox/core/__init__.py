@@ -1,5 +1,15 @@
-from .zerox import zerox
+from .zerox import zerox, zerox_batch, zerox_stream
+from .estimate import estimate_zerox
+from .writer import MarkdownWriter
+from .types import BlankPageThresholds, DownloadLimits, PriorPageContext
 
 __all__ = [
     "zerox",
+    "zerox_batch",
+    "zerox_stream",
+    "estimate_zerox",
+    "MarkdownWriter",
+    "BlankPageThresholds",
+    "DownloadLimits",
+    "PriorPageContext",
 ]
@@ -0,0 +1,170 @@
+import asyncio
+import math
+import tempfile
+from typing import Iterable, List, Optional, Sequence, Tuple, Union
+
+import litellm
+
+# Package Imports
+from ..processor import (
+    download_file,
+    extract_text_layer,
+    get_pdf_page_sizes,
+    rendered_page_size,
+    validate_page_numbers,
+)
+from ..errors import FileUnavailable
+from ..constants import EstimateDefaultOptions, FormatTemplateDefaultOptions, Prompts
+from ..scheduler import estimate_request_tokens, estimate_text_tokens
+from .types import DownloadLimits, PageEstimate, PriorPageContext, ZeroxEstimate
+from .zerox import get_output_file_name
+
+
+def estimate_cost(model: str, input_tokens: int, output_tokens: int) -> Optional[float]:
+    """Returns the cost (USD) of the given token usage from litellm's model prices, None when the model is unknown to litellm."""
+    ## provider prefixed names (e.g. "azure/gpt-4o-mini") fall back to the bare model name
+    prices = litellm.model_cost.get(model) or litellm.model_cost.get(model.split("/", 1)[-1])
+    if not prices or "input_cost_per_token" not in prices:
+        return None
+    return input_tokens * prices["input_cost_per_token"] + output_tokens * prices.get("output_cost_per_token", 0.0)
+
+
+def project_duration(
+    request_tokens: Sequence[int],
+    concurrency: int = 10,
+    requests_per_minute: Optional[int] = None,
+    tokens_per_minute: Optional[int] = None,
+    page_latency: float = EstimateDefaultOptions.PAGE_LATENCY,
+) -> Tuple[float, str]:
+    """
+    Projects the wall time (ms) of sending the given requests (their total tokens each) through the concurrency pool and the
+    rate limits of a :class:`RequestScheduler`, whose budgets start full. Returns the duration and the limit it is bound by.
+    """
+    if not request_tokens:
+        return 0.0, "concurrency"
+
+    bounds = {"concurrency": math.ceil(len(request_tokens) / max(1, concurrency)) * page_latency}
+    if requests_per_minute:
+        bounds["requests_per_minute"] = max(0, len(request_tokens) - requests_per_minute) / requests_per_minute * 60_000 + page_latency
+    if tokens_per_minute:
+        total_tokens = sum(request_tokens)
+        bounds["tokens_per_minute"] = max(0, total_tokens - tokens_per_minute) / tokens_per_minute * 60_000 + page_latency
+
+    bottleneck = max(bounds, key=bounds.get)
+    return bounds[bottleneck], bottleneck
+
+
+async def estimate_zerox(
+    file_path: str,
+    model: str = "gpt-4o-mini",
+    concurrency: int = 10,
+    maintain_format: bool = False,
+    format_anchor_pages: Optional[int] = None,
+    prior_page_context: Optional[PriorPageContext] = None,
+    custom_system_prompt: Optional[str] = None,
+    select_pages: Optional[Union[int, Iterable[int]]] = None,
+    text_layer_threshold: Optional[float] = None,
+    requests_per_minute: Optional[int] = None,
+    tokens_per_minute: Optional[int] = None,
+    output_tokens_per_page: int = EstimateDefaultOptions.OUTPUT_TOKENS_PER_PAGE,
+    page_latency: float = EstimateDefaultOptions.PAGE_LATENCY,
+    download_limits: Optional[DownloadLimits] = None,
+) -> ZeroxEstimate:
+    """
+    Dry run of :func:`zerox`: estimates the tokens, cost and wall time of processing a PDF without calling any model.
+
+    The page sizes are read from the PDF and turned into the image sizes pdf2image renders under PDFConversionDefaultOptions,
+    then into input tokens with the same estimate the request scheduler uses. Output tokens and the latency of a page request
+    are assumptions, tune them to past runs (ZeroxOutput.page_stats) for better projections.
+
+    Usage::
+
+        estimate = await estimate_zerox("contract.pdf", model="gpt-4o-mini", concurrency=10, requests_per_minute=500)
+        print(estimate.input_tokens, estimate.cost, estimate.duration / 60_000)
+
+    :param requests_per_minute: Requests per minute budget of the scheduler the run would use, defaults to None (unlimited)
+    :type requests_per_minute: int, optional
+    :param tokens_per_minute: Tokens per minute budget of the scheduler the run would use, defaults to None (unlimited)
+    :type tokens_per_minute: int, optional
+    :param output_tokens_per_page: The assumed markdown tokens per page, defaults to EstimateDefaultOptions.OUTPUT_TOKENS_PER_PAGE
+    :type output_tokens_per_page: int, optional
+    :param page_latency: The assumed time (ms) of one page request, defaults to EstimateDefaultOptions.PAGE_LATENCY
+    :type page_latency: float, optional
+
+    Rest of the parameters are the same as :func:`zerox`. Blank and duplicate pages can't be told apart without rendering,
+    they are estimated as vision pages.
+    """
+    if not file_path:
+        raise FileUnavailable()
+
+    if isinstance(select_pages, int):
+        select_pages = [select_pages]
+    if select_pages is not None:
+        select_pages = sorted(set(select_pages))
+
+    system_prompt = custom_system_prompt or Prompts.DEFAULT_SYSTEM_PROMPT
+    sequential = maintain_format and not format_anchor_pages
+
+    with tempfile.TemporaryDirectory() as temp_directory:
+        local_path = await download_file(file_path=file_path, temp_dir=temp_directory, limits=download_limits)
+        if not local_path:
+            raise FileUnavailable()
+
+        page_sizes = await asyncio.to_thread(get_pdf_page_sizes, local_path)
+        if select_pages is not None:
+            validate_page_numbers(select_pages, len(page_sizes))
+            page_sizes = {page_number: page_sizes[page_number] for page_number in select_pages}
+
+        text_layer = {}
+        if text_layer_threshold is not None:
+            text_layer = await asyncio.to_thread(extract_text_layer, local_path, select_pages, text_layer_threshold)
+
+    pages: List[PageEstimate] = []
+    vision_count = 0
+    for page_number, (width, height) in page_sizes.items():
+        if text_layer.get(page_number) is not None:
+            pages.append(PageEstimate(page=page_number, width=0, height=0, input_tokens=0, output_tokens=0, provenance="text_layer"))
+            continue
+
+        ## the context sent along: the previous page with sequential maintain_format, the format template past the anchor pages
+        if sequential and vision_count:
+            prior_page_tokens = output_tokens_per_page
+            if prior_page_context is not None and prior_page_context.policy != "full":
+                prior_page_tokens = min(prior_page_tokens, prior_page_context.max_tokens)
+        elif maintain_format and not sequential and vision_count >= format_anchor_pages:
+            prior_page_tokens = min(output_tokens_per_page, estimate_text_tokens("x" * FormatTemplateDefaultOptions.MAX_LENGTH))
+        else:
+            prior_page_tokens = 0
+
+        image_size = rendered_page_size(width, height)
+        pages.append(PageEstimate(
+            page=page_number,
+            width=image_size[0],
+            height=image_size[1],
+            input_tokens=estimate_request_tokens(image_size, model, system_prompt) + prior_page_tokens,
+            output_tokens=output_tokens_per_page,
+        ))
+        vision_count += 1
+
+    request_tokens = [page.input_tokens + page.output_tokens for page in pages if page.provenance == "vision"]
+    if sequential:
+        duration, bottleneck = project_duration(request_tokens, 1, requests_per_minute, tokens_per_minute, page_latency)
+    else:
+        ## the anchor pages go first, the rest only starts once they are done
+        anchor_count = min(format_anchor_pages or 0, len(request_tokens)) if maintain_format else 0
+        anchor_duration, _ = project_duration(request_tokens[:anchor_count], concurrency, requests_per_minute, tokens_per_minute, page_latency)
+        duration, bottleneck = project_duration(request_tokens[anchor_count:], concurrency, requests_per_minute, tokens_per_minute, page_latency)
+        duration += anchor_duration
+
+    input_tokens = sum(page.input_tokens for page in pages)
+    output_tokens = sum(page.output_tokens for page in pages)
+    return ZeroxEstimate(
+        file_name=get_output_file_name(file_path),
+        page_count=len(pages),
+        input_tokens=input_tokens,
+        output_tokens=output_tokens,
+        duration=duration,
+        bottleneck=bottleneck,
+        cost=estimate_cost(model, input_tokens, output_tokens),
+        pages=pages,
+    )
@@ -0,0 +1,44 @@
+from typing import Dict, Iterable, Sequence
+
+import numpy as np
+
+# Package Imports
+from .types import Page
+
+## per page stats aggregated in the output, all stage timings are in ms
+PAGE_STATS = (
+    "render_time",
+    "encode_time",
+    "queue_wait",
+    "model_latency",
+    "completion_time",
+    "payload_bytes",
+    "input_tokens",
+    "output_tokens",
+    "retries",
+)
+
+
+def page_percentiles(
+    pages: Iterable[Page],
+    stats: Sequence[str] = PAGE_STATS,
+    percentiles: Sequence[int] = (50, 90, 99),
+) -> Dict[str, Dict[str, float]]:
+    """
+    Aggregates per page stats over the pages sent to the model (text layer, blank, duplicate, cached and resumed pages are left out).
+    Returns stat -> {"p50": ..., "p90": ..., "p99": ..., "max": ...}, empty when no page was sent to the model.
+    """
+    model_pages = [page for page in pages if page.provenance == "vision" and not (page.cache_hit or page.resumed)]
+    if not model_pages:
+        return {}
+
+    values = np.array([[getattr(page, stat) for stat in stats] for page in model_pages], dtype=np.float64)
+    quantiles = np.percentile(values, percentiles, axis=0)
+    maxima = values.max(axis=0)
+    return {
+        stat: {
+            **{f"p{percentile}": float(quantiles[row, column]) for row, percentile in enumerate(percentiles)},
+            "max": float(maxima[column]),
+        }
+        for column, stat in enumerate(stats)
+    }
@@ -1,6 +1,8 @@
-from typing import List, Optional, Dict, Any, Union, Iterable
+from typing import List, Optional, Dict, Any, Union, Iterable, Tuple
 from dataclasses import dataclass, field
 
+from ..constants import BlankPageDefaultOptions, DownloadDefaultOptions, PriorPageContextDefaultOptions
+
 
 @dataclass
 class ZeroxArgs:
@@ -19,6 +21,49 @@ class ZeroxArgs:
     select_pages: Optional[Union[int, Iterable[int]]] = None
     kwargs: Dict[str, Any] = field(default_factory=dict)
 
+@dataclass
+class BlankPageThresholds:
+    """
+    Dataclass to store the thresholds below which a page image is considered blank.
+    """
+
+    max_ink_coverage: float = BlankPageDefaultOptions.MAX_INK_COVERAGE
+    max_std_dev: float = BlankPageDefaultOptions.MAX_STD_DEV
+    max_ink_component: int = BlankPageDefaultOptions.MAX_INK_COMPONENT
+    ink_delta: int = BlankPageDefaultOptions.INK_DELTA
+    margin_ratio: float = BlankPageDefaultOptions.MARGIN_RATIO
+
+
+@dataclass
+class PriorPageContext:
+    """
+    Dataclass to store how much of the previous page is sent along with every page with maintain_format.
+    """
+
+    ## "full" (the whole page), "truncate" (the end of the page), "structural_tail" (the last section heading and table header
+    ## plus the end of the page) or "summary" (the format template of the page, see pyzerox.processor.derive_format_template)
+    policy: str = PriorPageContextDefaultOptions.POLICY
+    max_tokens: int = PriorPageContextDefaultOptions.MAX_TOKENS
+
+    def __post_init__(self):
+        if self.policy not in ("full", "truncate", "structural_tail", "summary"):
+            raise ValueError(f"Unknown prior page context policy: {self.policy}")
+
+
+@dataclass
+class DownloadLimits:
+    """
+    Dataclass to store the limits of URL downloads.
+    """
+
+    ## bytes, None for no limit
+    max_size: Optional[int] = DownloadDefaultOptions.MAX_SIZE
+    ## seconds for the whole download, and without receiving any data before the download is resumed
+    timeout: float = DownloadDefaultOptions.TIMEOUT
+    read_timeout: float = DownloadDefaultOptions.READ_TIMEOUT
+    max_retries: int = DownloadDefaultOptions.MAX_RETRIES
+
+
 @dataclass
 class Page:
     """
@@ -28,6 +73,36 @@ class Page:
     content: str
     content_length: int
     page: int
+    input_tokens: int = 0
+    output_tokens: int = 0
+    completion_time: float = 0.0
+    cache_hit: bool = False
+    retries: int = 0
+    ## how the content was produced: "vision" (model call), "text_layer" (embedded PDF text), "blank" (skipped blank page)
+    ## or "duplicate" (markdown of a near-identical page)
+    provenance: str = "vision"
+    ## whether the page was completed by an earlier run and restored from the checkpoint store
+    resumed: bool = False
+    ## stage timings (ms): share of the page's render shard, encoding the image, waiting for a concurrency slot and the model calls
+    render_time: float = 0.0
+    encode_time: float = 0.0
+    queue_wait: float = 0.0
+    model_latency: float = 0.0
+    ## encoded size (bytes) and dimensions of the page image
+    payload_bytes: int = 0
+    image_width: int = 0
+    image_height: int = 0
+
+
+@dataclass
+class RenderShard:
+    """
+    Dataclass to store the rasterization time of a page range.
+    """
+
+    first_page: int
+    last_page: int
+    render_time: float
 
 
 @dataclass
@@ -41,3 +116,67 @@ class ZeroxOutput:
     input_tokens: int
     output_tokens: int
     pages: List[Page]
+    cache_hits: int = 0
+    concurrency_limit: Optional[int] = None
+    concurrency_history: List[Tuple[float, int]] = field(default_factory=list)
+    blank_pages: int = 0
+    duplicate_pages: int = 0
+    resumed_pages: int = 0
+    render_shards: List[RenderShard] = field(default_factory=list)
+    ## stat -> {"p50", "p90", "p99", "max"} over the pages sent to the model, see :func:`page_percentiles`
+    page_stats: Dict[str, Dict[str, float]] = field(default_factory=dict)
+
+
+@dataclass
+class ZeroxBatchOutput:
+    """
+    Dataclass to store the output of a zerox batch, one ZeroxOutput per document plus aggregate stats.
+    """
+
+    completion_time: float
+    outputs: List[ZeroxOutput]
+    input_tokens: int
+    output_tokens: int
+    page_count: int
+    cache_hits: int = 0
+    blank_pages: int = 0
+    duplicate_pages: int = 0
+    ## file path -> error message of the documents which failed
+    failed: Dict[str, str] = field(default_factory=dict)
+    concurrency_limit: Optional[int] = None
+    concurrency_history: List[Tuple[float, int]] = field(default_factory=list)
+    page_stats: Dict[str, Dict[str, float]] = field(default_factory=dict)
+
+
+@dataclass
+class PageEstimate:
+    """
+    Dataclass to store the pre-flight estimate of a page.
+    """
+
+    page: int
+    ## rendered image size (pixels), 0 for text layer pages
+    width: int
+    height: int
+    input_tokens: int
+    output_tokens: int
+    ## "vision" or "text_layer", as the page would be processed
+    provenance: str = "vision"
+
+
+@dataclass
+class ZeroxEstimate:
+    """
+    Dataclass to store the pre-flight estimate of a zerox run, no model is called to compute it.
+    """
+
+    file_name: str
+    page_count: int
+    input_tokens: int
+    output_tokens: int
+    ## projected wall time (ms) and what limits it: "concurrency", "requests_per_minute" or "tokens_per_minute"
+    duration: float
+    bottleneck: str
+    ## in USD, None when the model's pricing is unknown to litellm
+    cost: Optional[float] = None
+    pages: List[PageEstimate] = field(default_factory=list)
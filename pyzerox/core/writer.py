@@ -0,0 +1,94 @@
+import json
+import os
+from dataclasses import asdict
+from typing import Dict, List, Optional
+
+import aiofiles
+
+# Package Imports
+from .types import Page
+
+
+class MarkdownWriter:
+    """
+    Writes the markdown of a document to ``{file_name}.md`` page by page, in page order, as soon as every earlier page is written.
+
+    Pages may come in completion order: out of order pages are held back until the pages before them are in, so memory is
+    bounded by how far ahead pages complete rather than by the document. Every write is flushed, a crash keeps the pages written so far.
+    With ``jsonl`` every page (content, usage and stats) is also written as one JSON line to ``{file_name}.pages.jsonl``.
+
+    Usage::
+
+        async with MarkdownWriter("output", "document", page_numbers=[1, 2, 3]) as writer:
+            async for page in zerox_stream(file_path="document.pdf", ordered=False):
+                await writer.write(page)
+    """
+
+    def __init__(
+        self,
+        output_dir: str,
+        file_name: str,
+        jsonl: bool = False,
+        page_numbers: Optional[List[int]] = None,
+    ):
+        """
+        :param output_dir: The directory to write the files to.
+        :type output_dir: str
+        :param file_name: The name of the files, without extension.
+        :type file_name: str
+        :param jsonl: Whether to write the per page JSONL sidecar, defaults to False
+        :type jsonl: bool, optional
+        :param page_numbers: The page numbers to expect, in order, defaults to None (pages are written in the order they come in)
+        :type page_numbers: List[int], optional
+        """
+        self.markdown_path = os.path.join(output_dir, f"{file_name}.md")
+        self.jsonl_path = os.path.join(output_dir, f"{file_name}.pages.jsonl") if jsonl else None
+        self.page_numbers = page_numbers
+        self._position = 0
+        self._held_back: Dict[int, Optional[Page]] = {}
+        self._markdown_file = None
+        self._jsonl_file = None
+        self._written = 0
+
+    async def __aenter__(self) -> "MarkdownWriter":
+        self._markdown_file = await aiofiles.open(self.markdown_path, "w")
+        if self.jsonl_path:
+            self._jsonl_file = await aiofiles.open(self.jsonl_path, "w")
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        ## pages still held back lost a predecessor (e.g. the stream failed), keep them rather than dropping them
+        for page_number in sorted(self._held_back):
+            page = self._held_back.pop(page_number)
+            if page is not None:
+                await self._write_markdown(page)
+        await self._markdown_file.close()
+        if self._jsonl_file is not None:
+            await self._jsonl_file.close()
+
+    async def write(self, page: Page, include_markdown: bool = True) -> None:
+        """
+        Writes the page once every earlier page is written, holding it back until then. The JSONL sidecar gets it right away.
+        Pages with include_markdown False (e.g. failed pages) only advance the order and go to the sidecar.
+        """
+        if self._jsonl_file is not None:
+            await self._jsonl_file.write(json.dumps(asdict(page), ensure_ascii=False) + "\n")
+            await self._jsonl_file.flush()
+
+        if self.page_numbers is None:
+            if include_markdown:
+                await self._write_markdown(page)
+            return
+
+        self._held_back[page.page] = page if include_markdown else None
+        while self._position < len(self.page_numbers) and self.page_numbers[self._position] in self._held_back:
+            ready = self._held_back.pop(self.page_numbers[self._position])
+            self._position += 1
+            if ready is not None:
+                await self._write_markdown(ready)
+
+    async def _write_markdown(self, page: Page) -> None:
+        ## pages are separated by a blank line, as in "\n\n".join(pages)
+        await self._markdown_file.write(("\n\n" if self._written else "") + page.content)
+        await self._markdown_file.flush()
+        self._written += 1
@@ -1,37 +1,82 @@
 import os
+import contextlib
+import logging
 import aioshutil as async_shutil
 import tempfile
+import time
 import warnings
-from typing import List, Optional, Union, Iterable
+from typing import AsyncIterator, Callable, ContextManager, Deque, Dict, List, Optional, Union, Iterable
+from dataclasses import replace
 from datetime import datetime
-import aiofiles
 import aiofiles.os as async_os
 import asyncio
+from collections import deque
 
 # Package Imports
 from ..processor import (
-    convert_pdf_to_images,
+    iter_pdf_images,
+    get_render_processes,
+    extract_text_layer,
     download_file,
-    process_page,
-    process_pages_in_batches,
-    create_selected_pages_pdf,
+    ocr_page,
+    process_pages_as_completed,
+    derive_format_template,
+    reduce_prior_page,
+    get_pdf_page_count,
+    validate_page_numbers,
+    shared_http_session,
+    PageHashIndex,
 )
 from ..errors import FileUnavailable
 from ..constants.messages import Messages
-from ..models import litellmmodel
-from .types import Page, ZeroxOutput
+from ..models import get_model
+from ..cache import BaseCache
+from ..checkpoint import BaseCheckpointStore, hash_file, make_checkpoint_key
+from ..scheduler import AdaptiveConcurrencyLimiter, RequestScheduler
+from .types import BlankPageThresholds, DownloadLimits, Page, PriorPageContext, RenderShard, ZeroxBatchOutput, ZeroxOutput
+from .stats import page_percentiles
+from .writer import MarkdownWriter
+
+
+def get_output_file_name(file_path: str) -> str:
+    """
+    Derives the sanitized output file name (without extension) from the input file path or URL, the same name zerox
+    has always written to. It doesn't depend on the downloaded copy, which is saved without the URL's query string.
+    """
+    raw_file_name = os.path.splitext(os.path.basename(file_path))[0]
+    file_name = "".join(c.lower() if c.isalnum() else "_" for c in raw_file_name)
+    # Truncate file name to 255 characters to prevent ENAMETOOLONG errors
+    return file_name[:255]
 
 
 async def zerox(
     cleanup: bool = True,
-    concurrency: int = 10,
+    concurrency: Union[int, asyncio.Semaphore, AdaptiveConcurrencyLimiter] = 10,
     file_path: Optional[str] = "",
     maintain_format: bool = False,
+    format_anchor_pages: Optional[int] = None,
+    prior_page_context: Optional[PriorPageContext] = None,
     model: str = "gpt-4o-mini",
     output_dir: Optional[str] = None,
+    page_jsonl: bool = False,
+    keep_page_content: bool = True,
     temp_dir: Optional[str] = None,
     custom_system_prompt: Optional[str] = None,
     select_pages: Optional[Union[int, Iterable[int]]] = None,
+    in_memory: bool = False,
+    render_processes: Optional[int] = None,
+    download_limits: Optional[DownloadLimits] = None,
+    cache: Optional[BaseCache] = None,
+    scheduler: Optional[RequestScheduler] = None,
+    adaptive_concurrency: bool = False,
+    text_layer_threshold: Optional[float] = None,
+    skip_blank_pages: bool = False,
+    blank_page_thresholds: Optional[BlankPageThresholds] = None,
+    deduplicate_pages: bool = False,
+    page_hash_index: Optional[PageHashIndex] = None,
+    checkpoint: Optional[BaseCheckpointStore] = None,
+    on_page: Optional[Callable[[Page], None]] = None,
+    track_request: Optional[Callable[[], ContextManager]] = None,
     **kwargs
 ) -> ZeroxOutput:
     """
@@ -40,60 +85,384 @@ async def zerox(
 
     :param cleanup: Whether to cleanup the temporary files after processing, defaults to True
     :type cleanup: bool, optional
-    :param concurrency: The number of concurrent processes to run, defaults to 10
-    :type concurrency: int, optional
+    :param concurrency: The number of concurrent processes to run, a semaphore shared with other zerox calls, or an AdaptiveConcurrencyLimiter (pyzerox.scheduler) to adapt it while running, defaults to 10
+    :type concurrency: int or asyncio.Semaphore or AdaptiveConcurrencyLimiter, optional
     :param file_path: The path or URL to the PDF file to process.
     :type file_path: str, optional
     :param maintain_format: Whether to maintain the format from the previous page, defaults to False
     :type maintain_format: bool, optional
+    :param format_anchor_pages: With maintain_format, process pages in parallel instead of one after another: this many anchor pages are OCRed first, a format template (headings, table headers, list and paragraph samples) is derived from their markdown and every remaining page is processed concurrently against it, defaults to None (sequential). pyzerox.constants.FormatTemplateDefaultOptions.ANCHOR_PAGES is a reasonable starting point.
+    :type format_anchor_pages: int, optional
+    :param prior_page_context: With sequential maintain_format, how much of the previous page is sent along with every page: the whole page, its end within a token budget, its structural tail (last section heading and table header plus the end) or its format summary, defaults to None (the whole page). PriorPageContext() keeps the structural tail within 512 tokens.
+    :type prior_page_context: PriorPageContext, optional
     :param model: The model to use for generating completions, defaults to "gpt-4o-mini". Note - Refer: https://docs.litellm.ai/docs/providers to pass correct model name as according to provider it might be different from actual name.
     :type model: str, optional
-    :param output_dir: The directory to save the markdown output, defaults to None
+    :param output_dir: The directory to save the markdown output to, as {file_name}.md with the file name from get_output_file_name, defaults to None
     :type output_dir: str, optional
+    :param page_jsonl: With output_dir, whether to also write every page (content, usage and stats) as one JSON line to {file_name}.pages.jsonl, defaults to False
+    :type page_jsonl: bool, optional
+    :param keep_page_content: Whether the returned pages keep their markdown, defaults to True. With output_dir, False leaves the markdown only on disk and the returned pages keep their usage and stats, so memory doesn't grow with the document.
+    :type keep_page_content: bool, optional
     :param temp_dir: The directory to store temporary files, defaults to some named folder in system's temp directory. If already exists, the contents will be deleted for zerox uses it.
     :type temp_dir: str, optional
     :param custom_system_prompt: The system prompt to use for the model, this overrides the default system prompt of zerox. Generally it is not required unless you want some specific behaviour. When set, it will raise a friendly warning, defaults to None
     :type custom_system_prompt: str, optional
     :param select_pages: Pages to process, can be a single page number or an iterable of page numbers, defaults to None
     :type select_pages: int or Iterable[int], optional
+    :param in_memory: Whether to keep the rendered page images in memory and send them to the model directly instead of writing them to the temp directory, defaults to False. In this mode the temp directory only holds the downloaded file.
+    :type in_memory: bool, optional
+    :param render_processes: The number of processes rasterizing page ranges of the PDF in parallel, the pages are still processed in order. 1 renders in a thread. Per range render times are reported in the output, defaults to None (one per available CPU core)
+    :type render_processes: int, optional
+    :param download_limits: Size, time and retry limits of URL downloads, which are streamed to disk and resumed after dropped connections, defaults to None (pyzerox.constants.DownloadDefaultOptions)
+    :type download_limits: DownloadLimits, optional
+    :param cache: OCR result cache (e.g. pyzerox.cache.InMemoryCache or SQLiteCache) keyed on the page image, model, system prompt, prior page and completion kwargs. Cached pages skip the model call and report no token usage, defaults to None
+    :type cache: BaseCache, optional
+    :param scheduler: Request scheduler (pyzerox.scheduler.RequestScheduler) enforcing requests/tokens per minute budgets and retrying rate limited or transient model errors with backoff. Can be shared across zerox calls, defaults to None (no rate limiting or retries)
+    :type scheduler: RequestScheduler, optional
+    :param adaptive_concurrency: Whether to adapt the number of concurrent requests (AIMD) starting from concurrency: grow while latency and errors are stable, back off on rate limits and timeouts. The final limit and its history are reported in the output, defaults to False
+    :type adaptive_concurrency: bool, optional
+    :param text_layer_threshold: When set, the embedded text layer of every page is scored (0 - 1) first and pages scoring at least this are converted to markdown without a model call, only scanned or poorly extracted pages go to the vision model. Page.provenance tells them apart, defaults to None (every page goes to the vision model). pyzerox.constants.TextLayerDefaultOptions.QUALITY_THRESHOLD is a reasonable starting point.
+    :type text_layer_threshold: float, optional
+    :param skip_blank_pages: Whether to detect blank and near-blank pages (ink coverage, pixel variance and ink components of the rendered page, a single line of text is not blank) and return them empty without a model call. Skipped pages have provenance "blank" and are counted in the output, defaults to False
+    :type skip_blank_pages: bool, optional
+    :param blank_page_thresholds: Thresholds for the blank page detection, defaults to None (pyzerox.constants.BlankPageDefaultOptions)
+    :type blank_page_thresholds: BlankPageThresholds, optional
+    :param deduplicate_pages: Whether to group near-identical pages (letterheads, repeated schedules, annexes) by perceptual hash and only send one page per group to the model, the others reuse its markdown with provenance "duplicate" and are counted in the output, defaults to False
+    :type deduplicate_pages: bool, optional
+    :param page_hash_index: Page hash index (pyzerox.processor.PageHashIndex) to share across zerox calls, so pages are also deduplicated across documents, defaults to None (a new index per call)
+    :type page_hash_index: PageHashIndex, optional
+    :param checkpoint: Checkpoint store (e.g. pyzerox.checkpoint.SQLiteCheckpointStore) recording every completed page under the document content hash and the run configuration. A rerun of an interrupted document resumes from it: finished pages are returned as recorded (Page.resumed, with their recorded usage) and only the rest is rendered and processed, defaults to None
+    :type checkpoint: BaseCheckpointStore, optional
+    :param on_page: Hook called with every page as soon as it is done (including failed and skipped pages), e.g. to export metrics or report progress. It runs on the event loop and must not block, defaults to None
+    :type on_page: Callable[[Page], None], optional
+    :param track_request: Context manager factory wrapping every model request (each attempt, retries included), e.g. a prometheus Gauge's track_inprogress to export the requests in flight or a Histogram's time for their latency. It runs on the event loop and must not block, defaults to None
+    :type track_request: Callable[[], ContextManager], optional
 
     :param kwargs: Additional keyword arguments to pass to the model.completion -> litellm.completion method. Refer: https://docs.litellm.ai/docs/providers and https://docs.litellm.ai/docs/completion/input
     :return: The markdown content generated by the model.
     """
 
-
     input_token_count = 0
     output_token_count = 0
-    prior_page = ""
-    aggregated_markdown: List[str] = []
+    cache_hits = 0
+    blank_pages = 0
+    duplicate_pages = 0
+    resumed_pages = 0
+    render_shards: List[RenderShard] = []
+    formatted_pages: List[Page] = []
+    ## every page, including the ones left out of the output, for the page stats
+    all_pages: List[Page] = []
     start_time = datetime.now()
-    
+
     # File Path Validators
     if not file_path:
         raise FileUnavailable()
-    
-    # Create an instance of the litellm model interface
-    vision_model = litellmmodel(model=model,**kwargs)
 
-    # override the system prompt if a custom prompt is provided
-    if custom_system_prompt:
-        vision_model.system_prompt = custom_system_prompt
+    file_name = get_output_file_name(file_path)
+
+    if adaptive_concurrency and isinstance(concurrency, int):
+        concurrency = AdaptiveConcurrencyLimiter(initial_limit=concurrency)
+    limiter = concurrency if isinstance(concurrency, AdaptiveConcurrencyLimiter) else None
+
+    # Ensure the output directory exists, the markdown is written to it page by page
+    writer = None
+    if output_dir:
+        await async_os.makedirs(output_dir, exist_ok=True)
+        writer = MarkdownWriter(output_dir, file_name, jsonl=page_jsonl)
+
+    async with writer or contextlib.nullcontext():
+        async for page in zerox_stream(
+            cleanup=cleanup,
+            concurrency=concurrency,
+            file_path=file_path,
+            maintain_format=maintain_format,
+            format_anchor_pages=format_anchor_pages,
+            prior_page_context=prior_page_context,
+            model=model,
+            temp_dir=temp_dir,
+            custom_system_prompt=custom_system_prompt,
+            select_pages=select_pages,
+            in_memory=in_memory,
+            render_processes=render_processes,
+            render_shards=render_shards,
+            download_limits=download_limits,
+            cache=cache,
+            scheduler=scheduler,
+            text_layer_threshold=text_layer_threshold,
+            skip_blank_pages=skip_blank_pages,
+            blank_page_thresholds=blank_page_thresholds,
+            deduplicate_pages=deduplicate_pages,
+            page_hash_index=page_hash_index,
+            checkpoint=checkpoint,
+            track_request=track_request,
+            ordered=True,
+            **kwargs,
+        ):
+            ## add token usage
+            input_token_count += page.input_tokens
+            output_token_count += page.output_tokens
+            cache_hits += page.cache_hit
+            blank_pages += page.provenance == "blank"
+            duplicate_pages += page.provenance == "duplicate"
+            resumed_pages += page.resumed
+            if on_page is not None:
+                on_page(page)
+
+            # pages which failed or were blank with maintain_format are left out of the output
+            include_page = not (maintain_format and not page.content)
+            if writer is not None:
+                await writer.write(page, include_markdown=include_page)
+                if not keep_page_content:
+                    ## the markdown is on disk, only the page's usage and stats stay in memory
+                    page = replace(page, content="")
+            all_pages.append(page)
+            if include_page:
+                formatted_pages.append(page)
+
+    # Format JSON response
+    end_time = datetime.now()
+    completion_time = (end_time - start_time).total_seconds() * 1000
+
+    return ZeroxOutput(
+        completion_time=completion_time,
+        file_name=file_name,
+        input_tokens=input_token_count,
+        output_tokens=output_token_count,
+        pages=formatted_pages,
+        cache_hits=cache_hits,
+        concurrency_limit=limiter.limit if limiter else None,
+        concurrency_history=list(limiter.history) if limiter else [],
+        blank_pages=blank_pages,
+        duplicate_pages=duplicate_pages,
+        resumed_pages=resumed_pages,
+        render_shards=render_shards,
+        page_stats=page_percentiles(all_pages),
+    )
+
+
+async def zerox_batch(
+    file_paths: Iterable[str],
+    cleanup: bool = True,
+    concurrency: int = 10,
+    document_concurrency: int = 4,
+    maintain_format: bool = False,
+    format_anchor_pages: Optional[int] = None,
+    prior_page_context: Optional[PriorPageContext] = None,
+    model: str = "gpt-4o-mini",
+    output_dir: Optional[str] = None,
+    page_jsonl: bool = False,
+    keep_page_content: bool = True,
+    temp_dir: Optional[str] = None,
+    custom_system_prompt: Optional[str] = None,
+    in_memory: bool = False,
+    render_processes: Optional[int] = None,
+    download_limits: Optional[DownloadLimits] = None,
+    cache: Optional[BaseCache] = None,
+    scheduler: Optional[RequestScheduler] = None,
+    adaptive_concurrency: bool = False,
+    text_layer_threshold: Optional[float] = None,
+    skip_blank_pages: bool = False,
+    blank_page_thresholds: Optional[BlankPageThresholds] = None,
+    deduplicate_pages: bool = False,
+    page_hash_index: Optional[PageHashIndex] = None,
+    checkpoint: Optional[BaseCheckpointStore] = None,
+    on_page: Optional[Callable[[Page], None]] = None,
+    track_request: Optional[Callable[[], ContextManager]] = None,
+    **kwargs
+) -> ZeroxBatchOutput:
+    """
+    Runs :func:`zerox` over many documents with one global concurrency pool.
+    Up to ``document_concurrency`` documents are downloaded and rasterized at a time, and the pages of all of them share
+    ``concurrency`` model calls. Every document waits in line for the next free slot, so pages are interleaved fairly instead of
+    the first documents starving the others. The scheduler, cache and page hash index (deduplicating pages across documents) are shared as well.
+
+    Usage::
+
+        batch = await zerox_batch(file_paths=["a.pdf", "https://example.com/b.pdf"], output_dir="output")
+        for output in batch.outputs:
+            print(output.file_name, len(output.pages))
+
+    :param file_paths: The paths or URLs of the PDF files to process.
+    :type file_paths: Iterable[str]
+    :param concurrency: The number of concurrent model calls across all the documents, defaults to 10
+    :type concurrency: int, optional
+    :param document_concurrency: The number of documents downloaded, rasterized and processed at the same time, defaults to 4
+    :type document_concurrency: int, optional
+    :param render_processes: The number of processes rasterizing each document, defaults to None (the available CPU cores split between document_concurrency documents)
+    :type render_processes: int, optional
+    :param temp_dir: The directory to store temporary files, every document gets its own sub directory, defaults to some named folder in system's temp directory.
+    :type temp_dir: str, optional
+
+    Rest of the parameters are the same as :func:`zerox`, they apply to every document.
+    Documents which fail are left out of the outputs and reported in :attr:`ZeroxBatchOutput.failed`.
+    """
+    start_time = datetime.now()
+    file_paths = list(file_paths)
+
+    # One pool of model calls for the whole batch
+    pool: Union[asyncio.Semaphore, AdaptiveConcurrencyLimiter] = (
+        AdaptiveConcurrencyLimiter(initial_limit=concurrency) if adaptive_concurrency else asyncio.Semaphore(concurrency)
+    )
+    documents = asyncio.Semaphore(document_concurrency)
+    ## the documents rasterized at the same time split the cores between them
+    if render_processes is None:
+        render_processes = max(1, get_render_processes() // document_concurrency)
+    if deduplicate_pages and page_hash_index is None:
+        page_hash_index = PageHashIndex()
+
+    async def process_document(index: int, file_path: str) -> ZeroxOutput:
+        async with documents:
+            return await zerox(
+                cleanup=cleanup,
+                concurrency=pool,
+                file_path=file_path,
+                maintain_format=maintain_format,
+                format_anchor_pages=format_anchor_pages,
+                prior_page_context=prior_page_context,
+                model=model,
+                output_dir=output_dir,
+                page_jsonl=page_jsonl,
+                keep_page_content=keep_page_content,
+                temp_dir=os.path.join(temp_dir, f"{index}_{get_output_file_name(file_path)}") if temp_dir else None,
+                custom_system_prompt=custom_system_prompt,
+                in_memory=in_memory,
+                render_processes=render_processes,
+                download_limits=download_limits,
+                cache=cache,
+                scheduler=scheduler,
+                text_layer_threshold=text_layer_threshold,
+                skip_blank_pages=skip_blank_pages,
+                blank_page_thresholds=blank_page_thresholds,
+                deduplicate_pages=deduplicate_pages,
+                page_hash_index=page_hash_index,
+                checkpoint=checkpoint,
+                on_page=on_page,
+                track_request=track_request,
+                **kwargs,
+            )
+
+    ## keep the download connection pool alive for the whole batch
+    async with shared_http_session():
+        results = await asyncio.gather(
+            *(process_document(index, file_path) for index, file_path in enumerate(file_paths)),
+            return_exceptions=True,
+        )
+
+    outputs: List[ZeroxOutput] = []
+    failed: Dict[str, str] = {}
+    for file_path, result in zip(file_paths, results):
+        if isinstance(result, BaseException):
+            if not isinstance(result, Exception):
+                raise result
+            logging.error(Messages.BATCH_DOCUMENT_FAILED.format(file_path, result))
+            failed[file_path] = str(result)
+        else:
+            outputs.append(result)
+
+    end_time = datetime.now()
+    limiter = pool if isinstance(pool, AdaptiveConcurrencyLimiter) else None
+
+    return ZeroxBatchOutput(
+        completion_time=(end_time - start_time).total_seconds() * 1000,
+        outputs=outputs,
+        input_tokens=sum(output.input_tokens for output in outputs),
+        output_tokens=sum(output.output_tokens for output in outputs),
+        page_count=sum(len(output.pages) for output in outputs),
+        cache_hits=sum(output.cache_hits for output in outputs),
+        blank_pages=sum(output.blank_pages for output in outputs),
+        duplicate_pages=sum(output.duplicate_pages for output in outputs),
+        failed=failed,
+        concurrency_limit=limiter.limit if limiter else None,
+        concurrency_history=list(limiter.history) if limiter else [],
+        page_stats=page_percentiles(page for output in outputs for page in output.pages),
+    )
+
 
-    # Check if both maintain_format and select_pages are provided
-    if maintain_format and select_pages is not None:
+async def zerox_stream(
+    cleanup: bool = True,
+    concurrency: Union[int, asyncio.Semaphore, AdaptiveConcurrencyLimiter] = 10,
+    file_path: Optional[str] = "",
+    maintain_format: bool = False,
+    format_anchor_pages: Optional[int] = None,
+    prior_page_context: Optional[PriorPageContext] = None,
+    model: str = "gpt-4o-mini",
+    temp_dir: Optional[str] = None,
+    custom_system_prompt: Optional[str] = None,
+    select_pages: Optional[Union[int, Iterable[int]]] = None,
+    in_memory: bool = False,
+    render_processes: Optional[int] = None,
+    download_limits: Optional[DownloadLimits] = None,
+    cache: Optional[BaseCache] = None,
+    scheduler: Optional[RequestScheduler] = None,
+    text_layer_threshold: Optional[float] = None,
+    skip_blank_pages: bool = False,
+    blank_page_thresholds: Optional[BlankPageThresholds] = None,
+    deduplicate_pages: bool = False,
+    page_hash_index: Optional[PageHashIndex] = None,
+    checkpoint: Optional[BaseCheckpointStore] = None,
+    track_request: Optional[Callable[[], ContextManager]] = None,
+    ordered: bool = True,
+    render_shards: Optional[List[RenderShard]] = None,
+    **kwargs
+) -> AsyncIterator[Page]:
+    """
+    Streaming variant of :func:`zerox`, yields each :class:`Page` as soon as it has been processed.
+    Every page carries its page number, token usage and processing time (ms), so consumers can start using the first pages before the whole document is done.
+
+    Usage::
+
+        async for page in zerox_stream(file_path="document.pdf"):
+            print(page.page, page.content)
+
+    :param ordered: Whether to yield pages in page order (True) or in completion order (False), defaults to True. With maintain_format (without format_anchor_pages) pages are processed sequentially, so they are always yielded in page order.
+    :type ordered: bool, optional
+    :param render_shards: When given, the render time of every rasterized page range is appended to it, defaults to None
+    :type render_shards: List[RenderShard], optional
+
+    Rest of the parameters are the same as :func:`zerox`, except for output_dir as no markdown file is written by the stream.
+    """
+
+    # File Path Validators
+    if not file_path:
+        raise FileUnavailable()
+
+    # Shared litellm model interface, created and validated once per model, system prompt and kwargs
+    vision_model = get_model(model=model, system_prompt=custom_system_prompt, **kwargs)
+
+    # Blank page detection is opt-in, thresholds default to BlankPageDefaultOptions
+    if not skip_blank_pages:
+        blank_page_thresholds = None
+    elif blank_page_thresholds is None:
+        blank_page_thresholds = BlankPageThresholds()
+
+    # Page deduplication is opt-in as well, the index lives for this call unless a shared one is given
+    if not deduplicate_pages:
+        page_hash_index = None
+    elif page_hash_index is None:
+        page_hash_index = PageHashIndex()
+
+    # Check if both maintain_format and select_pages are provided, the format template mode doesn't depend on adjacent pages
+    if maintain_format and not format_anchor_pages and select_pages is not None:
         warnings.warn(Messages.MAINTAIN_FORMAT_SELECTED_PAGES_WARNING)
 
     # If select_pages is a single integer, convert it to a list for consistency
     if isinstance(select_pages, int):
         select_pages = [select_pages]
 
-    # Sort the pages to maintain consistency
+    # Sort the pages to maintain consistency, every page is rendered once
     if select_pages is not None:
-        select_pages = sorted(select_pages)
+        select_pages = sorted(set(select_pages))
 
-    # Ensure the output directory exists
-    if output_dir:
-        await async_os.makedirs(output_dir, exist_ok=True)
+    ## the render time of a shard is spread over its pages
+    if render_shards is None:
+        render_shards = []
+
+    def with_render_time(page: Page) -> Page:
+        for shard in reversed(render_shards):
+            if shard.first_page <= page.page <= shard.last_page:
+                page.render_time = shard.render_time / (shard.last_page - shard.first_page + 1)
+                break
+        return page
 
     ## delete tmp_dir if exists and then recreate it
     if temp_dir:
@@ -101,7 +470,6 @@ async def zerox(
             await async_shutil.rmtree(temp_dir)
         await async_os.makedirs(temp_dir, exist_ok=True)
 
-
     # Create a temporary directory to store the PDF and images
     with tempfile.TemporaryDirectory() as temp_dir_:
 
@@ -112,88 +480,175 @@ async def zerox(
             ## use the system temp directory
             temp_directory = temp_dir_
 
-        # Download the PDF. Get file name.
-        local_path = await download_file(file_path=file_path, temp_dir=temp_directory)
-        if not local_path:
-            raise FileUnavailable()
-        
-        raw_file_name = os.path.splitext(os.path.basename(local_path))[0]
-        file_name = "".join(c.lower() if c.isalnum() else "_" for c in raw_file_name)
-        # Truncate file name to 255 characters to prevent ENAMETOOLONG errors
-        file_name = file_name[:255]
-
-        # create a subset pdf in temp dir with only the requested pages if select_pages is provided
-        if select_pages is not None:
-            subset_pdf_create_kwargs = {"original_pdf_path":local_path, "select_pages":select_pages, 
-                                    "save_directory":temp_directory, "suffix":"_selected_pages"}
-            local_path = await asyncio.to_thread(create_selected_pages_pdf, 
-                                                 **subset_pdf_create_kwargs)
-
-        # Convert the file to a series of images, below function returns a list of image paths in page order
-        images = await convert_pdf_to_images(local_path=local_path, temp_dir=temp_directory)
-
-        if maintain_format:
-            for image in images:
-                result, input_token_count, output_token_count, prior_page = await process_page(
-                    image,
-                    vision_model,
-                    temp_directory,
-                    input_token_count,
-                    output_token_count,
-                    prior_page,
+        try:
+            # Download the PDF.
+            local_path = await download_file(file_path=file_path, temp_dir=temp_directory, limits=download_limits)
+            if not local_path:
+                raise FileUnavailable()
+
+            # the selected pages are rendered straight from the file, the page count from the document info is enough to validate them
+            if select_pages is not None:
+                validate_page_numbers(select_pages, await get_pdf_page_count(local_path))
+
+            # Resume: the pages completed by an earlier run of the same document and configuration are not processed again
+            run_key = None
+            restored: Dict[int, Page] = {}
+            vision_pages = select_pages
+            if checkpoint is not None:
+                run_key = make_checkpoint_key(
+                    await asyncio.to_thread(hash_file, local_path),
+                    vision_model.model,
+                    vision_model.system_prompt,
+                    vision_model.kwargs,
+                    options={
+                        "maintain_format": maintain_format,
+                        "format_anchor_pages": format_anchor_pages,
+                        "prior_page_context": prior_page_context,
+                        "text_layer_threshold": text_layer_threshold,
+                        "blank_page_thresholds": blank_page_thresholds,
+                        "deduplicate_pages": deduplicate_pages,
+                    },
                 )
+                restored = await checkpoint.load(run_key)
+                if select_pages is not None:
+                    restored = {page_number: page for page_number, page in restored.items() if page_number in select_pages}
+                if restored:
+                    page_numbers = select_pages or range(1, await get_pdf_page_count(local_path) + 1)
+                    vision_pages = [page_number for page_number in page_numbers if page_number not in restored]
+                for page in restored.values():
+                    page.resumed = True
 
-                if result:
-                    aggregated_markdown.append(result)
-        else:
-            results = await process_pages_in_batches(
-                images,
-                concurrency,
-                vision_model,
-                temp_directory,
-                input_token_count,
-                output_token_count,
-                prior_page,
+            ## pages which don't need the vision model (resumed and text layer pages), merged into the sequence by page number
+            ready_pages: Deque[Page] = deque(restored[page_number] for page_number in sorted(restored))
+
+            async def completed(page: Page) -> Page:
+                """Records a page processed by the vision model, failed pages are left for the next run"""
+                with_render_time(page)
+                if checkpoint is not None and (page.content or page.provenance == "blank"):
+                    await checkpoint.save(run_key, page)
+                return page
+
+            # Pages with a usable embedded text layer don't need the vision model
+            if text_layer_threshold is not None:
+                text_layer = await asyncio.to_thread(
+                    extract_text_layer, local_path, vision_pages, text_layer_threshold
+                )
+                ready_pages = deque(sorted(
+                    [*ready_pages, *(
+                        Page(content=content, content_length=len(content), page=page_number, provenance="text_layer")
+                        for page_number, content in text_layer.items()
+                        if content is not None
+                    )],
+                    key=lambda page: page.page,
+                ))
+                vision_pages = [page_number for page_number, content in text_layer.items() if content is None]
+
+            # Render the file to images in page ordered chunks, pages are handed over to the model as soon as their chunk is ready
+            images = iter_pdf_images(
+                local_path=local_path,
+                temp_dir=temp_directory,
+                in_memory=in_memory,
+                page_numbers=vision_pages,
+                render_processes=render_processes,
+                render_shards=render_shards,
             )
 
-            aggregated_markdown = [result[0] for result in results if isinstance(result[0], str)]
+            if maintain_format and not format_anchor_pages:
+                prior_page = ""
+                index = 0
+                ## pages are sequential here, but a shared pool (e.g. zerox_batch) still bounds them
+                pool = contextlib.nullcontext() if isinstance(concurrency, int) else concurrency
+                limiter = concurrency if isinstance(concurrency, AdaptiveConcurrencyLimiter) else None
+                async for image in images:
+                    # Map image positions back to the page numbers of the original document
+                    page_number = vision_pages[index] if vision_pages is not None else index + 1
 
-            ## add token usage
-            input_token_count += sum([result[1] for result in results])
-            output_token_count += sum([result[2] for result in results])
-
-        # Write the aggregated markdown to a file
-        if output_dir:
-            result_file_path = os.path.join(output_dir, f"{file_name}.md")
-            async with aiofiles.open(result_file_path, "w") as f:
-                await f.write("\n\n".join(aggregated_markdown))
-
-        # Cleanup the downloaded PDF file
-        if cleanup and os.path.exists(temp_directory):
-            await async_shutil.rmtree(temp_directory)
-
-        # Format JSON response
-        end_time = datetime.now()
-        completion_time = (end_time - start_time).total_seconds() * 1000
-
-        # Adjusting the formatted_pages logic to account for select_pages to output the correct page numbers
-        if select_pages is not None:
-            # Map aggregated markdown to the selected pages
-            formatted_pages = [
-                        Page(content=content, page=select_pages[i], content_length=len(content))
-                        for i, content in enumerate(aggregated_markdown)
-                    ]
-        else:
-            # Default behavior when no select_pages is provided
-            formatted_pages = [
-                        Page(content=content, page=i + 1, content_length=len(content))
-                        for i, content in enumerate(aggregated_markdown)
-                    ]
-
-        return ZeroxOutput(
-            completion_time=completion_time,
-            file_name=file_name,
-            input_tokens=input_token_count,
-            output_tokens=output_token_count,
-            pages=formatted_pages,
-        )
\ No newline at end of file
+                    ## resumed and text layer pages in between keep their place in the sequence and give the format context
+                    while ready_pages and ready_pages[0].page < page_number:
+                        page = ready_pages.popleft()
+                        if page.provenance != "blank":
+                            prior_page = reduce_prior_page(page.content, prior_page_context)
+                        yield page
+
+                    queued = time.perf_counter()
+                    async with pool:
+                        queue_wait = (time.perf_counter() - queued) * 1000
+                        page = await ocr_page(
+                            image,
+                            vision_model,
+                            temp_directory,
+                            prior_page,
+                            page_number,
+                            cache,
+                            scheduler,
+                            limiter,
+                            blank_page_thresholds=blank_page_thresholds,
+                            page_hash_index=page_hash_index,
+                            track_request=track_request,
+                        )
+                        page.queue_wait = queue_wait
+
+                    ## failed pages come back empty, which also resets the prior page, blank pages keep it
+                    if page.provenance != "blank":
+                        prior_page = reduce_prior_page(page.content, prior_page_context)
+                    index += 1
+                    yield await completed(page)
+            else:
+                ## in completion order, the resumed and text layer pages are ready right away
+                while ready_pages and not ordered:
+                    yield ready_pages.popleft()
+
+                def process_vision_pages(vision_images, page_numbers, prior_page=""):
+                    return process_pages_as_completed(
+                        vision_images,
+                        concurrency,
+                        vision_model,
+                        temp_directory,
+                        prior_page,
+                        ordered=ordered,
+                        page_numbers=page_numbers,
+                        cache=cache,
+                        scheduler=scheduler,
+                        blank_page_thresholds=blank_page_thresholds,
+                        page_hash_index=page_hash_index,
+                        track_request=track_request,
+                    )
+
+                async def vision_results():
+                    if not maintain_format:
+                        async for result in process_vision_pages(images, vision_pages):
+                            yield result
+                        return
+
+                    # Format consistent pages in parallel: the anchor pages go first, the rest follow the template derived from them
+                    page_numbers = vision_pages
+                    if page_numbers is None:
+                        page_numbers = list(range(1, await get_pdf_page_count(local_path) + 1))
+                    ## anchor pages done by an earlier run are reused
+                    anchor_pages = sorted(
+                        (page for page in restored.values() if page.provenance == "vision"), key=lambda page: page.page
+                    )[:format_anchor_pages]
+                    anchor_count = min(format_anchor_pages - len(anchor_pages), len(page_numbers))
+                    anchor_images = [await anext(images) for _ in range(anchor_count)]
+                    async for result in process_vision_pages(anchor_images, page_numbers[:anchor_count]):
+                        anchor_pages.append(result[1])
+                        yield result
+
+                    template = derive_format_template(
+                        page.content for page in sorted(anchor_pages, key=lambda page: page.page) if page.provenance != "blank"
+                    )
+                    async for result in process_vision_pages(images, page_numbers[anchor_count:], template):
+                        yield result
+
+                async for _, page in vision_results():
+                    while ready_pages and ready_pages[0].page < page.page:
+                        yield ready_pages.popleft()
+                    yield await completed(page)
+
+            while ready_pages:
+                yield ready_pages.popleft()
+
+        finally:
+            # Cleanup the downloaded PDF file
+            if cleanup and os.path.exists(temp_directory):
+                await async_shutil.rmtree(temp_directory)
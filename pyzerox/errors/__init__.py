@@ -4,6 +4,7 @@ from .exceptions import (
     PageNumberOutOfBoundError,
     MissingEnvironmentVariables,
     ResourceUnreachableException,
+    DownloadLimitExceeded,
     FileUnavailable,
     FailedToSaveFile,
     FailedToProcessFile,
@@ -15,6 +16,7 @@ __all__ = [
     "PageNumberOutOfBoundError",
     "MissingEnvironmentVariables",
     "ResourceUnreachableException",
+    "DownloadLimitExceeded",
     "FileUnavailable",
     "FailedToSaveFile",
     "FailedToProcessFile",
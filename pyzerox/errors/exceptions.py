@@ -56,6 +56,17 @@ class ResourceUnreachableException(CustomException):
         super().__init__(message, extra_info)
 
 
+class DownloadLimitExceeded(CustomException):
+    """Exception raised when a download exceeds its size or time limit."""
+
+    def __init__(
+        self,
+        message: str = Messages.DOWNLOAD_TOO_LARGE,
+        extra_info: Optional[Dict] = None,
+    ):
+        super().__init__(message, extra_info)
+
+
 class FileUnavailable(CustomException):
     """Exception raised when a file is unavailable."""
 
@@ -1,7 +1,11 @@
 from .modellitellm import litellmmodel
+from .registry import ModelRegistry, model_registry, get_model
 from .types import CompletionResponse
 
 __all__ = [
     "litellmmodel",
+    "ModelRegistry",
+    "model_registry",
+    "get_model",
     "CompletionResponse",
 ]
@@ -1,4 +1,5 @@
 import os
+import time
 import aiohttp
 import warnings
 import litellm
@@ -10,7 +11,7 @@ from .types import CompletionResponse
 from ..errors import ModelAccessError, NotAVisionModel, MissingEnvironmentVariables
 from ..constants.messages import Messages
 from ..constants.prompts import Prompts
-from ..processor.image import encode_image_to_base64
+from ..processor.image import encode_image_to_base64, encode_image_bytes_to_base64
 
 DEFAULT_SYSTEM_PROMPT = Prompts.DEFAULT_SYSTEM_PROMPT
 
@@ -99,26 +100,32 @@ class litellmmodel(BaseModel):
 
     async def completion(
         self,
-        image_path: str,
+        image_path: Optional[str],
         maintain_format: bool,
         prior_page: str,
+        image_bytes: Optional[bytes] = None,
     ) -> CompletionResponse:
         """LitellM completion for image to markdown conversion.
 
-        :param image_path: Path to the image file.
+        :param image_path: Path to the image file, ignored when image_bytes is given.
         :type image_path: str
         :param maintain_format: Whether to maintain the format from the previous page.
         :type maintain_format: bool
         :param prior_page: The markdown content of the previous page.
         :type prior_page: str
+        :param image_bytes: The PNG encoded image, to send an in-memory image without reading it from disk, defaults to None
+        :type image_bytes: bytes, optional
 
         :return: The markdown content generated by the model.
         """
+        encode_start = time.perf_counter()
         messages = await self._prepare_messages(
             image_path=image_path,
             maintain_format=maintain_format,
             prior_page=prior_page,
+            image_bytes=image_bytes,
         )
+        encode_time = (time.perf_counter() - encode_start) * 1000
 
         try:
             # Pass API key directly in the completion call
@@ -134,26 +141,31 @@ class litellmmodel(BaseModel):
                     content=response["choices"][0]["message"]["content"],
                     input_tokens=response["usage"]["prompt_tokens"],
                     output_tokens=response["usage"]["completion_tokens"],
+                    encode_time=encode_time,
                 )
             return response
         
         except Exception as err:
-            raise Exception(Messages.COMPLETION_ERROR.format(err))
+            ## chained so that callers can still inspect the provider error (status code, Retry-After)
+            raise Exception(Messages.COMPLETION_ERROR.format(err)) from err
 
     async def _prepare_messages(
         self,
-        image_path: str,
+        image_path: Optional[str],
         maintain_format: bool,
         prior_page: str,
+        image_bytes: Optional[bytes] = None,
     ) -> List[Dict[str, Any]]:
         """Prepares the messages to send to the LiteLLM Completion API.
 
-        :param image_path: Path to the image file.
+        :param image_path: Path to the image file, ignored when image_bytes is given.
         :type image_path: str
         :param maintain_format: Whether to maintain the format from the previous page.
         :type maintain_format: bool
         :param prior_page: The markdown content of the previous page.
         :type prior_page: str
+        :param image_bytes: The PNG encoded image, defaults to None
+        :type image_bytes: bytes, optional
         """
         # Default system message
         messages: List[Dict[str, Any]] = [
@@ -173,8 +185,11 @@ class litellmmodel(BaseModel):
                 },
             )
 
-        # Add Image to request
-        base64_image = await encode_image_to_base64(image_path)
+        # Add Image to request, in-memory images skip the disk round trip
+        if image_bytes is not None:
+            base64_image = encode_image_bytes_to_base64(image_bytes)
+        else:
+            base64_image = await encode_image_to_base64(image_path)
         messages.append(
             {
                 "role": "user",
@@ -0,0 +1,95 @@
+import json
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Package Imports
+from .base import BaseModel
+from .modellitellm import litellmmodel
+
+
+class ModelRegistry:
+    """
+    Process-wide registry of model clients, one per (model, system prompt, completion kwargs).
+
+    A client is created and validated (environment, model, access) the first time it is requested and shared by every
+    later call and concurrent job. Clients must not be mutated by their users, anything changing the requests is part of the key.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[..., BaseModel] = litellmmodel,
+        on_create: Optional[Callable[[BaseModel], None]] = None,
+        on_close: Optional[Callable[[BaseModel], None]] = None,
+    ):
+        """
+        :param factory: Creates (and validates) a client from the model name and completion kwargs, defaults to litellmmodel
+        :type factory: Callable[..., BaseModel], optional
+        :param on_create: Lifecycle hook called with every newly created client, e.g. to warm it up or log it, defaults to None
+        :type on_create: Callable[[BaseModel], None], optional
+        :param on_close: Lifecycle hook called with every client when it is evicted or the registry is closed, defaults to None
+        :type on_close: Callable[[BaseModel], None], optional
+        """
+        self.factory = factory
+        self.on_create = on_create
+        self.on_close = on_close
+        self._clients: Dict[Tuple[Optional[str], Optional[str], str], BaseModel] = {}
+        ## validation is blocking and may run from several threads (e.g. asyncio.to_thread), only one creates a client
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(model: Optional[str], system_prompt: Optional[str], kwargs: Dict[str, Any]) -> Tuple[Optional[str], Optional[str], str]:
+        return model, system_prompt, json.dumps(kwargs, sort_keys=True, default=str)
+
+    def get(self, model: Optional[str] = None, system_prompt: Optional[str] = None, **kwargs) -> BaseModel:
+        """
+        Returns the shared client of the model, creating and validating it on first use.
+
+        :param model: The model name, refer: https://docs.litellm.ai/docs/providers
+        :type model: str, optional
+        :param system_prompt: Overrides the default system prompt of the client, defaults to None
+        :type system_prompt: str, optional
+        :param kwargs: Completion kwargs of the client (passed to litellm.completion).
+        """
+        key = self._key(model, system_prompt, kwargs)
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = self.factory(model=model, **kwargs)
+                if system_prompt:
+                    client.system_prompt = system_prompt
+                if self.on_create is not None:
+                    self.on_create(client)
+                self._clients[key] = client
+        return client
+
+    def evict(self, model: Optional[str] = None, system_prompt: Optional[str] = None, **kwargs) -> None:
+        """Removes a client, e.g. after its credentials were rotated, the next get creates and validates a new one."""
+        with self._lock:
+            client = self._clients.pop(self._key(model, system_prompt, kwargs), None)
+        if client is not None and self.on_close is not None:
+            self.on_close(client)
+
+    def close(self) -> None:
+        """Removes every client, calling the on_close hook for each. The registry can still be used afterwards."""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        if self.on_close is not None:
+            for client in clients:
+                self.on_close(client)
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+
+## default registry shared by zerox and the API service
+model_registry = ModelRegistry()
+
+
+def get_model(model: Optional[str] = None, system_prompt: Optional[str] = None, **kwargs) -> BaseModel:
+    """Returns the shared client of the model from the default :data:`model_registry`."""
+    return model_registry.get(model, system_prompt, **kwargs)
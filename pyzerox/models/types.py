@@ -10,3 +10,5 @@ class CompletionResponse:
     content: str
     input_tokens: int
     output_tokens: int
+    ## time (ms) spent preparing the request (image encoding) before calling the model
+    encode_time: float = 0.0
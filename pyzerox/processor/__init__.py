@@ -1,19 +1,67 @@
-from .image import save_image, encode_image_to_base64
+from .image import (
+    save_image,
+    encode_image_to_base64,
+    encode_image_bytes_to_base64,
+    image_to_bytes,
+    encoded_image_bytes,
+    get_image_size,
+)
 from .pdf import (
     convert_pdf_to_images,
+    get_pdf_page_count,
+    get_pdf_page_sizes,
+    rendered_page_size,
+    get_render_processes,
+    iter_pdf_images,
+    ocr_page,
     process_page,
     process_pages_in_batches,
+    process_pages_as_completed,
+)
+from .text import format_markdown, derive_format_template, reduce_prior_page
+from .blank_page import analyze_page_image, is_blank_page, largest_ink_component
+from .dedup import PageHashIndex, page_fingerprint, perceptual_hash
+from .text_layer import extract_text_layer, score_text_layer, text_layer_to_markdown
+from .utils import (
+    download_file,
+    create_selected_pages_pdf,
+    validate_page_numbers,
+    shared_http_session,
+    link_or_copy,
 )
-from .text import format_markdown
-from .utils import download_file, create_selected_pages_pdf
 
 __all__ = [
     "save_image",
     "encode_image_to_base64",
+    "encode_image_bytes_to_base64",
+    "image_to_bytes",
+    "encoded_image_bytes",
+    "get_image_size",
     "convert_pdf_to_images",
+    "get_pdf_page_count",
+    "get_pdf_page_sizes",
+    "rendered_page_size",
+    "get_render_processes",
+    "iter_pdf_images",
+    "ocr_page",
     "format_markdown",
+    "derive_format_template",
+    "reduce_prior_page",
+    "extract_text_layer",
+    "score_text_layer",
+    "text_layer_to_markdown",
+    "analyze_page_image",
+    "largest_ink_component",
+    "is_blank_page",
+    "PageHashIndex",
+    "perceptual_hash",
+    "page_fingerprint",
     "download_file",
+    "shared_http_session",
+    "link_or_copy",
     "process_page",
     "process_pages_in_batches",
+    "process_pages_as_completed",
     "create_selected_pages_pdf",
+    "validate_page_numbers",
 ]
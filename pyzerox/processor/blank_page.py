@@ -0,0 +1,109 @@
+import io
+from typing import Optional, Tuple, Union
+
+import numpy as np
+from PIL import Image
+
+# Package Imports
+from ..constants import BlankPageDefaultOptions
+from ..core.types import BlankPageThresholds
+
+
+def _page_pixels(image: Union[str, bytes], margin_ratio: float) -> np.ndarray:
+    """Grayscale pixels of a page image (path or encoded bytes) at the analysis size, without the margins."""
+    source = io.BytesIO(image) if isinstance(image, bytes) else image
+    with Image.open(source) as opened_image:
+        ## the draft mode lets the decoder skip most of the work for formats supporting it
+        opened_image.draft("L", (BlankPageDefaultOptions.ANALYSIS_SIZE, BlankPageDefaultOptions.ANALYSIS_SIZE))
+        grayscale = opened_image.convert("L")
+    grayscale.thumbnail((BlankPageDefaultOptions.ANALYSIS_SIZE, BlankPageDefaultOptions.ANALYSIS_SIZE))
+    pixels = np.asarray(grayscale, dtype=np.int16)
+
+    height, width = pixels.shape
+    margin_y, margin_x = int(height * margin_ratio), int(width * margin_ratio)
+    return pixels[margin_y : height - margin_y or None, margin_x : width - margin_x or None]
+
+
+def _ink_mask(pixels: np.ndarray, ink_delta: int) -> np.ndarray:
+    ## the median is the paper colour, even for grey or yellowed scans
+    background = np.median(pixels)
+    return pixels < background - ink_delta
+
+
+def analyze_page_image(
+    image: Union[str, bytes],
+    ink_delta: int = BlankPageDefaultOptions.INK_DELTA,
+    margin_ratio: float = BlankPageDefaultOptions.MARGIN_RATIO,
+) -> Tuple[float, float]:
+    """
+    Measures how much is printed on a page image (path or encoded bytes).
+    Returns the ink coverage (fraction of pixels clearly darker than the page background) and the grayscale standard deviation.
+    """
+    pixels = _page_pixels(image, margin_ratio)
+    if pixels.size == 0:
+        return 0.0, 0.0
+    ink_coverage = float(np.count_nonzero(_ink_mask(pixels, ink_delta))) / pixels.size
+    return ink_coverage, float(pixels.std())
+
+
+def largest_ink_component(ink: np.ndarray, gap: int = BlankPageDefaultOptions.INK_COMPONENT_GAP) -> int:
+    """
+    Size (pixels) of the largest connected ink component of an ink mask, once the ink is grown by ``gap`` pixels so the
+    characters of a word or line join into one component. Dust and scanner noise stay small, any text or line doesn't.
+    Components are labelled with vectorized union-find passes (hooking roots, then path compression) over the ink
+    pixels only, so a pass costs a few array operations over the ink, at most ANALYSIS_SIZE x ANALYSIS_SIZE pixels.
+    """
+    if gap:
+        grown = ink.copy()
+        for shift in range(1, gap + 1):
+            grown[shift:, :] |= ink[:-shift, :]
+            grown[:-shift, :] |= ink[shift:, :]
+            grown[:, shift:] |= ink[:, :-shift]
+            grown[:, :-shift] |= ink[:, shift:]
+        ink = grown
+    pixels = np.flatnonzero(ink)
+    if not pixels.size:
+        return 0
+
+    ## union-find over the ink pixels only (flat indices), every pixel points to a pixel of its component and all the
+    ## pixels of a component end up pointing to its smallest index. The other pixels map to a sentinel above any index
+    width = ink.shape[1]
+    sentinel = ink.size
+    ys, xs = np.divmod(pixels, width)
+    padded = np.pad(ink, 1)
+    neighbours = np.stack([
+        np.where(padded[ys + 1 + dy, xs + 1 + dx], pixels + dy * width + dx, sentinel)
+        for dy in (-1, 0, 1) for dx in (-1, 0, 1) if dy or dx
+    ])
+    parent = np.full(sentinel + 1, sentinel)
+    parent[pixels] = pixels
+    while True:
+        ## hook every pixel's root to the smallest root around it, then point every pixel straight at its root
+        smallest = np.minimum(parent[pixels], parent[neighbours].min(axis=0))
+        if np.array_equal(smallest, parent[pixels]):
+            break
+        np.minimum.at(parent, parent[pixels], smallest)
+        parent[pixels] = np.minimum(parent[pixels], smallest)
+        while True:
+            roots = parent[parent[pixels]]
+            if np.array_equal(roots, parent[pixels]):
+                break
+            parent[pixels] = roots
+    return int(np.unique(parent[pixels], return_counts=True)[1].max())
+
+
+def is_blank_page(image: Union[str, bytes], thresholds: Optional[BlankPageThresholds] = None) -> bool:
+    """
+    Whether a page image (path or encoded bytes) is blank or near-blank, i.e. not worth a model call.
+    The ink coverage and variance must both be near zero, and no ink may form more than a speck: a page holding a single
+    line (a total, a signature line) is never blank.
+    """
+    thresholds = thresholds or BlankPageThresholds()
+    pixels = _page_pixels(image, thresholds.margin_ratio)
+    if pixels.size == 0:
+        return True
+
+    ink = _ink_mask(pixels, thresholds.ink_delta)
+    if float(np.count_nonzero(ink)) / pixels.size > thresholds.max_ink_coverage or pixels.std() > thresholds.max_std_dev:
+        return False
+    return largest_ink_component(ink) <= thresholds.max_ink_component
@@ -0,0 +1,150 @@
+import asyncio
+import io
+from collections import OrderedDict
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+from PIL import Image
+
+# Package Imports
+from ..constants import PageHashDefaultOptions
+
+
+def _open_grayscale(image: Union[str, bytes]) -> Image.Image:
+    source = io.BytesIO(image) if isinstance(image, bytes) else image
+    with Image.open(source) as opened_image:
+        return opened_image.convert("L")
+
+
+def _difference_hash(grayscale: Image.Image, hash_size: int, gradient_margin: int) -> np.ndarray:
+    pixels = np.asarray(grayscale.resize((hash_size + 1, hash_size), Image.Resampling.BOX), dtype=np.int16)
+    return np.packbits(pixels[:, :-1] - pixels[:, 1:] > gradient_margin)
+
+
+def _ink_map(grayscale: Image.Image, width: int, ink_delta: int) -> np.ndarray:
+    height = max(1, round(grayscale.height * width / grayscale.width))
+    pixels = np.asarray(grayscale.resize((width, height), Image.Resampling.BOX), dtype=np.int16)
+    return np.packbits(pixels < np.median(pixels) - ink_delta, axis=1)
+
+
+def perceptual_hash(
+    image: Union[str, bytes],
+    hash_size: int = PageHashDefaultOptions.HASH_SIZE,
+    gradient_margin: int = PageHashDefaultOptions.GRADIENT_MARGIN,
+) -> np.ndarray:
+    """
+    Computes the difference hash of a page image (path or encoded bytes) as packed bits.
+    The page is reduced to a (hash_size + 1) x hash_size grayscale grid and every bit tells whether a cell is brighter than its right neighbour.
+    Re-renders and recompressions of the same page land within a few bits of each other.
+    """
+    return _difference_hash(_open_grayscale(image), hash_size, gradient_margin)
+
+
+def page_fingerprint(image: Union[str, bytes]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the perceptual hash and the packed ink map (pixels darker than the page background) of a page image (path or encoded bytes).
+    The hash finds candidate duplicates quickly, the ink map verifies them down to single characters.
+    """
+    grayscale = _open_grayscale(image)
+    return (
+        _difference_hash(grayscale, PageHashDefaultOptions.HASH_SIZE, PageHashDefaultOptions.GRADIENT_MARGIN),
+        _ink_map(grayscale, PageHashDefaultOptions.INK_MAP_WIDTH, PageHashDefaultOptions.INK_DELTA),
+    )
+
+
+def _same_ink(first: np.ndarray, second: np.ndarray) -> bool:
+    """Whether two packed ink maps differ in at most MAX_INK_BLOCK_DIFFERENCE pixels within every block."""
+    if first.shape != second.shape:
+        return False
+    block = PageHashDefaultOptions.INK_BLOCK_SIZE
+    difference = np.unpackbits(np.bitwise_xor(first, second), axis=1)
+    height, width = (difference.shape[0] // block) * block, (difference.shape[1] // block) * block
+    block_sums = difference[:height, :width].reshape(height // block, block, width // block, block).sum(axis=(1, 3))
+    return block_sums.size == 0 or int(block_sums.max()) <= PageHashDefaultOptions.MAX_INK_BLOCK_DIFFERENCE
+
+
+class PageHashIndex:
+    """
+    Index of the pages sent to the model by perceptual hash, so near-identical pages are only sent once.
+
+    A page first claims its fingerprint: the first page of a group becomes its representative and resolves the group with
+    its markdown once done, every later near-identical page waits for that result instead of calling the model.
+    Pages only match within the same context (model, prompt, prior page, completion kwargs), as that changes the output.
+    Share one index across zerox calls to deduplicate pages across documents.
+    """
+
+    def __init__(
+        self,
+        max_distance: float = PageHashDefaultOptions.MAX_DISTANCE,
+        max_entries: int = PageHashDefaultOptions.MAX_ENTRIES,
+    ):
+        """
+        :param max_distance: The maximum fraction of differing hash bits for two pages to be compared, defaults to 0.02
+        :type max_distance: float, optional
+        :param max_entries: The maximum number of pages to keep, the least recently used contexts are evicted first, defaults to 2000
+        :type max_entries: int, optional
+        """
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        ## context -> (packed hashes one row per page, their ink maps, the futures resolving to their markdown)
+        self._groups: "OrderedDict[str, Tuple[np.ndarray, List[np.ndarray], List[asyncio.Future]]]" = OrderedDict()
+        self._size = 0
+
+    def claim(self, context: str, fingerprint: Tuple[np.ndarray, np.ndarray]) -> Tuple[asyncio.Future, bool]:
+        """
+        Looks up a near-identical page in the context, registering the page when there is none.
+        Returns the future resolving to the group's markdown (None if the representative failed) and whether the page is the representative.
+        """
+        page_hash, ink_map = fingerprint
+        group = self._groups.get(context)
+        if group is not None:
+            self._groups.move_to_end(context)
+            hashes, ink_maps, results = group
+            distances = np.unpackbits(np.bitwise_xor(hashes, page_hash), axis=1).sum(axis=1)
+            candidates = np.flatnonzero(distances <= self.max_distance * page_hash.size * 8)
+            for candidate in candidates[np.argsort(distances[candidates], kind="stable")]:
+                if _same_ink(ink_maps[candidate], ink_map):
+                    return results[candidate], False
+        else:
+            hashes, ink_maps, results = np.empty((0, page_hash.size), dtype=np.uint8), [], []
+
+        result = asyncio.get_running_loop().create_future()
+        self._groups[context] = (np.vstack([hashes, page_hash]), ink_maps + [ink_map], results + [result])
+        self._size += 1
+        self._evict()
+        return result, True
+
+    def resolve(self, context: str, result: asyncio.Future, content: Optional[str]) -> None:
+        """Resolves a representative's group with its markdown. Failed pages (None) are dropped so a later duplicate gets a fresh attempt."""
+        group = self._groups.get(context)
+        if content is None and group is not None and result in group[2]:
+            position = group[2].index(result)
+            self._set_group(context, *(self._without(part, position) for part in group))
+        if not result.done():
+            result.set_result(content)
+
+    def clear(self) -> None:
+        """Forgets every page."""
+        self._groups.clear()
+        self._size = 0
+
+    @staticmethod
+    def _without(part: Union[np.ndarray, list], position: int) -> Union[np.ndarray, list]:
+        if isinstance(part, np.ndarray):
+            return np.delete(part, position, axis=0)
+        return part[:position] + part[position + 1 :]
+
+    def _set_group(self, context: str, hashes: np.ndarray, ink_maps: list, results: list) -> None:
+        self._size -= len(self._groups[context][2]) - len(results)
+        if results:
+            self._groups[context] = (hashes, ink_maps, results)
+        else:
+            del self._groups[context]
+
+    def _evict(self) -> None:
+        while self._size > self.max_entries:
+            context, group = next(iter(self._groups.items()))
+            self._set_group(context, *(self._without(part, 0) for part in group))
+
+    def __len__(self) -> int:
+        return self._size
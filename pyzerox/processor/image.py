@@ -1,15 +1,41 @@
 import aiofiles
 import base64
 import io
+from typing import Tuple, Union
+from PIL import Image
 
 
 async def encode_image_to_base64(image_path: str) -> str:
     """Encode an image to base64 asynchronously."""
     async with aiofiles.open(image_path, "rb") as image_file:
         image_data = await image_file.read()
+    return encode_image_bytes_to_base64(image_data)
+
+
+def encode_image_bytes_to_base64(image_data: bytes) -> str:
+    """Encode in-memory image bytes to base64."""
     return base64.b64encode(image_data).decode("utf-8")
 
 
+def image_to_bytes(image, format: str = "png", **save_options) -> bytes:
+    """Serialize a PIL Image to bytes in the given format without touching the disk."""
+    with io.BytesIO() as buffer:
+        image.save(buffer, format=format, **save_options)
+        return buffer.getvalue()
+
+
+def encoded_image_bytes(image, format: str = "png") -> bytes:
+    """
+    Returns the encoded bytes an image was opened from, e.g. the PNGs pdf2image parses out of pdftoppm's output, so they
+    are sent as rendered instead of being decoded and encoded again. Images which weren't opened from an in-memory
+    buffer in that format are encoded with PIL's defaults.
+    """
+    source = getattr(image, "fp", None)
+    if isinstance(source, io.BytesIO) and (image.format or "").lower() == format.lower():
+        return source.getvalue()
+    return image_to_bytes(image, format)
+
+
 async def save_image(image, image_path: str):
     """Save an image to a file asynchronously."""
     # Convert PIL Image to BytesIO object
@@ -20,3 +46,10 @@ async def save_image(image, image_path: str):
     # Write image data to file asynchronously
     async with aiofiles.open(image_path, "wb") as f:
         await f.write(image_data)
+
+
+def get_image_size(image: Union[str, bytes]) -> Tuple[int, int]:
+    """Returns the (width, height) of an image path or encoded image bytes, only the image header is read."""
+    source = io.BytesIO(image) if isinstance(image, bytes) else image
+    with Image.open(source) as opened_image:
+        return opened_image.size
@@ -1,48 +1,430 @@
+import contextlib
 import logging
+import math
 import os
+import time
 import asyncio
-from typing import List, Optional, Tuple
-from pdf2image import convert_from_path
+import aiofiles
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, AsyncIterable, AsyncIterator, Callable, ContextManager, Deque, Dict, Iterable, List, Optional, Tuple, Union
+from pdf2image import convert_from_path, pdfinfo_from_path
+from PyPDF2 import PdfReader
 
 # Package Imports
-from .image import save_image
+from .image import save_image, encoded_image_bytes, get_image_size
 from .text import format_markdown
+from .blank_page import is_blank_page
+from .dedup import PageHashIndex, page_fingerprint
 from ..constants import PDFConversionDefaultOptions, Messages
 from ..models import litellmmodel
+from ..cache import BaseCache, make_cache_key
+from ..scheduler import AdaptiveConcurrencyLimiter, RequestScheduler, estimate_request_tokens
+from ..core.types import BlankPageThresholds, Page, RenderShard
 
 
-async def convert_pdf_to_images(local_path: str, temp_dir: str) -> List[str]:
-    """Converts a PDF file to a series of images in the temp_dir. Returns a list of image paths in page order."""
+def _conversion_options(
+    local_path: str,
+    temp_dir: str,
+    in_memory: bool = False,
+    thread_count: int = PDFConversionDefaultOptions.THREAD_COUNT,
+) -> Dict[str, Any]:
+    """Returns the pdf2image options shared by all the rasterization paths."""
     options = {
         "pdf_path": local_path,
         "output_folder": temp_dir,
         "dpi": PDFConversionDefaultOptions.DPI,
         "fmt": PDFConversionDefaultOptions.FORMAT,
         "size": PDFConversionDefaultOptions.SIZE,
-        "thread_count": PDFConversionDefaultOptions.THREAD_COUNT,
+        "thread_count": thread_count,
         "use_pdftocairo": PDFConversionDefaultOptions.USE_PDFTOCAIRO,
         "paths_only": True,
     }
 
+    if in_memory:
+        # pdftoppm streams the rendered pages through stdout, pdftocairo always goes through a temp folder
+        options.update(output_folder=None, use_pdftocairo=False, paths_only=False)
+
+    return options
+
+
+def _render_pages(
+    local_path: str,
+    temp_dir: str,
+    first_page: int,
+    last_page: int,
+    in_memory: bool = False,
+    thread_count: int = PDFConversionDefaultOptions.THREAD_COUNT,
+) -> Tuple[List[Union[str, bytes]], float]:
+    """
+    Renders a page range of a PDF, returns image paths or (in_memory) PNG encoded images and the render time (ms).
+    Runs in a worker thread or process, so it has to stay a picklable module level function.
+    """
+    start = time.perf_counter()
+    images = convert_from_path(
+        first_page=first_page,
+        last_page=last_page,
+        **_conversion_options(local_path, temp_dir, in_memory, thread_count),
+    )
+
+    if in_memory:
+        ## pdftoppm's PNGs as rendered, the same payload (and cache key) on every run
+        images = [encoded_image_bytes(image, PDFConversionDefaultOptions.FORMAT) for image in images]
+    return images, (time.perf_counter() - start) * 1000
+
+
+def get_render_processes(render_processes: Optional[int] = PDFConversionDefaultOptions.RENDER_PROCESSES) -> int:
+    """Resolves the number of rendering processes, None means one per core available to this process."""
+    if render_processes is not None:
+        return max(1, render_processes)
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+async def convert_pdf_to_images(
+    local_path: str,
+    temp_dir: str,
+    render_processes: Optional[int] = PDFConversionDefaultOptions.RENDER_PROCESSES,
+    pages_per_chunk: int = PDFConversionDefaultOptions.PAGES_PER_CHUNK,
+    render_shards: Optional[List[RenderShard]] = None,
+) -> List[str]:
+    """
+    Converts a PDF file to a series of images in the temp_dir. Returns a list of image paths in page order.
+    Page ranges of ``pages_per_chunk`` pages are rendered in parallel by ``render_processes`` processes (one per core by default),
+    the render time of every range is appended to ``render_shards`` when given.
+    """
     try:
-        image_paths = await asyncio.to_thread(
-            convert_from_path, **options
-        )
-        return image_paths
+        return [
+            image
+            async for image in iter_pdf_images(
+                local_path,
+                temp_dir,
+                pages_per_chunk=pages_per_chunk,
+                ## nothing to overlap with, every range may be rendered as soon as a process is free
+                max_lookahead_chunks=get_render_processes(render_processes),
+                render_processes=render_processes,
+                render_shards=render_shards,
+            )
+        ]
     except Exception as err:
         logging.error(f"Error converting PDF to images: {err}")
 
 
+async def get_pdf_page_count(local_path: str) -> int:
+    """Returns the number of pages of a PDF file, read from the document info without rendering it."""
+    info = await asyncio.to_thread(pdfinfo_from_path, local_path)
+    return int(info["Pages"])
+
+
+def get_pdf_page_sizes(local_path: str, page_numbers: Optional[Iterable[int]] = None) -> Dict[int, Tuple[float, float]]:
+    """
+    Returns page number -> (width, height) in points of the PDF pages as rendered: the crop box, turned by the page rotation.
+    Reads the page tree only, nothing is rendered.
+    """
+    with open(local_path, "rb") as pdf_file:
+        reader = PdfReader(stream=pdf_file)
+        page_numbers = page_numbers if page_numbers is not None else range(1, len(reader.pages) + 1)
+        sizes: Dict[int, Tuple[float, float]] = {}
+        for page_number in page_numbers:
+            page = reader.pages[page_number - 1]
+            width, height = float(page.cropbox.width), float(page.cropbox.height)
+            sizes[page_number] = (height, width) if page.rotation % 180 == 90 else (width, height)
+        return sizes
+
+
+def rendered_page_size(
+    width: float,
+    height: float,
+    dpi: int = PDFConversionDefaultOptions.DPI,
+    size: Union[int, Tuple[Optional[int], Optional[int]], None] = PDFConversionDefaultOptions.SIZE,
+) -> Tuple[int, int]:
+    """
+    Returns the (width, height) in pixels of a page of the given size (points) rendered with the pdf2image dpi and size options,
+    computed the way poppler does: a size of None keeps the dpi, an int scales the longest side, a missing side keeps the aspect ratio.
+    """
+    if isinstance(size, int):
+        x_resolution = y_resolution = 72.0 * size / max(width, height)
+    else:
+        scale_to_x, scale_to_y = size if size is not None else (None, None)
+        x_resolution = 72.0 * scale_to_x / width if scale_to_x else None
+        y_resolution = 72.0 * scale_to_y / height if scale_to_y else None
+        x_resolution, y_resolution = x_resolution or y_resolution or dpi, y_resolution or x_resolution or dpi
+
+    ## rounded first so float noise doesn't add a pixel
+    return (
+        math.ceil(round(width * x_resolution / 72.0, 6)),
+        math.ceil(round(height * y_resolution / 72.0, 6)),
+    )
+
+
+def _page_range_chunks(page_numbers: Iterable[int], pages_per_chunk: int) -> List[Tuple[int, int]]:
+    """Groups sorted page numbers into contiguous (first_page, last_page) ranges of at most pages_per_chunk pages."""
+    chunks: List[Tuple[int, int]] = []
+    for page_number in page_numbers:
+        if chunks:
+            first_page, last_page = chunks[-1]
+            if page_number == last_page + 1 and last_page - first_page + 1 < pages_per_chunk:
+                chunks[-1] = (first_page, page_number)
+                continue
+        chunks.append((page_number, page_number))
+    return chunks
+
+
+async def iter_pdf_images(
+    local_path: str,
+    temp_dir: str,
+    pages_per_chunk: int = PDFConversionDefaultOptions.PAGES_PER_CHUNK,
+    max_lookahead_chunks: int = PDFConversionDefaultOptions.MAX_LOOKAHEAD_CHUNKS,
+    in_memory: bool = False,
+    page_numbers: Optional[Iterable[int]] = None,
+    render_processes: Optional[int] = PDFConversionDefaultOptions.RENDER_PROCESSES,
+    render_shards: Optional[List[RenderShard]] = None,
+) -> AsyncIterator[Union[str, bytes]]:
+    """
+    Converts a PDF file to images in the temp_dir chunk by chunk, yielding image paths in page order as soon as their chunk is rendered.
+
+    Rendering runs in a background producer that stays at most ``max_lookahead_chunks`` chunks ahead of the consumer,
+    so the CPU bound rasterization overlaps with whatever the consumer does with the pages (e.g. model calls).
+    With ``in_memory``, PNG encoded page images (bytes) are yielded instead and nothing is written to the temp_dir.
+    With ``page_numbers``, only those (1-indexed) pages are rendered, contiguous pages share a pdf2image call.
+
+    Chunks are shards rendered in parallel by a process pool of ``render_processes`` (one per available core by default,
+    1 renders in a thread), their images are still yielded in page order. The render time of every chunk is appended to
+    ``render_shards`` when given.
+    """
+    if page_numbers is None:
+        page_count = await get_pdf_page_count(local_path)
+        page_numbers = range(1, page_count + 1)
+    page_ranges = _page_range_chunks(sorted(page_numbers), pages_per_chunk)
+    rendered_chunks: asyncio.Queue = asyncio.Queue(maxsize=max(1, max_lookahead_chunks))
+
+    ## no point in more processes than chunks, and a single process is just a thread without the overhead
+    processes = min(get_render_processes(render_processes), len(page_ranges))
+    thread_count = 1 if processes > 1 else PDFConversionDefaultOptions.THREAD_COUNT
+
+    async def render_chunks():
+        loop = asyncio.get_running_loop()
+        executor = ProcessPoolExecutor(max_workers=processes) if processes > 1 else None
+        in_flight: Deque[Tuple[int, int, asyncio.Future]] = deque()
+
+        async def hand_over():
+            first_page, last_page, rendering = in_flight.popleft()
+            images, render_time = await rendering
+            if render_shards is not None:
+                render_shards.append(RenderShard(first_page=first_page, last_page=last_page, render_time=render_time))
+            await rendered_chunks.put(images)
+
+        try:
+            for first_page, last_page in page_ranges:
+                in_flight.append((
+                    first_page,
+                    last_page,
+                    loop.run_in_executor(
+                        executor, _render_pages, local_path, temp_dir, first_page, last_page, in_memory, thread_count
+                    ),
+                ))
+                ## every process works on a chunk while the finished ones are handed over in page order
+                if len(in_flight) >= processes:
+                    await hand_over()
+            while in_flight:
+                await hand_over()
+            await rendered_chunks.put(None)
+        except Exception as err:
+            logging.error(Messages.PDF_CONVERSION_FAILED.format(err))
+            await rendered_chunks.put(err)
+        finally:
+            for _, _, rendering in in_flight:
+                rendering.cancel()
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+    producer = asyncio.create_task(render_chunks())
+    try:
+        while True:
+            images = await rendered_chunks.get()
+            if images is None:
+                break
+            if isinstance(images, Exception):
+                raise images
+            for image in images:
+                yield image
+    finally:
+        producer.cancel()
+        await asyncio.gather(producer, return_exceptions=True)
+
+
+def _image_stats(image_path: Optional[str], image_bytes: Optional[bytes]) -> Tuple[Optional[Tuple[int, int]], int]:
+    """Returns the (width, height) and encoded size of a page image for its stats, (None, 0) when it can't be read."""
+    try:
+        if image_bytes is not None:
+            return get_image_size(image_bytes), len(image_bytes)
+        return get_image_size(image_path), os.path.getsize(image_path)
+    except Exception:
+        return None, 0
+
+
+async def ocr_page(
+    image: Union[str, bytes],
+    model: litellmmodel,
+    temp_directory: str = "",
+    prior_page: str = "",
+    page_number: int = 0,
+    cache: Optional[BaseCache] = None,
+    scheduler: Optional[RequestScheduler] = None,
+    limiter: Optional[AdaptiveConcurrencyLimiter] = None,
+    blank_page_thresholds: Optional[BlankPageThresholds] = None,
+    page_hash_index: Optional[PageHashIndex] = None,
+    track_request: Optional[Callable[[], ContextManager]] = None,
+) -> Page:
+    """
+    OCR a single page image to markdown. The image can be a path (relative to temp_directory) or PNG encoded bytes.
+    Returns a :class:`Page` with the page's token usage, processing time and stage timings, failed pages have empty content.
+    When a cache is given, completions are looked up and stored by the content addressed key of the request.
+    When a scheduler is given, the model call is admitted within its rate limits and retried on transient errors.
+    When an adaptive limiter is given, the latency and outcome of every model attempt is fed back to it.
+    When blank page thresholds are given, blank and near-blank pages come back empty with provenance "blank", without a model call.
+    When a page hash index is given, near-identical pages wait for the first one of their group and reuse its markdown (provenance "duplicate").
+    When track_request is given, every model attempt runs within the context manager it returns.
+    """
+    start = time.perf_counter()
+    attempts = 0
+    ## set when this page is the representative of its near-identical group, resolved with its markdown
+    representative: Optional[asyncio.Future] = None
+    markdown: Optional[str] = None
+    ## per page stats: time (ms) spent encoding the image and in model calls (all attempts), encoded image size and dimensions
+    encode_time = 0.0
+    model_latency = 0.0
+    payload_bytes = 0
+    image_size: Optional[Tuple[int, int]] = None
+
+    # In-memory images are handed over to the model as is
+    if isinstance(image, bytes):
+        image_path, image_bytes = None, image
+    else:
+        image_path, image_bytes = os.path.join(temp_directory, image), None
+
+    def make_page(content: str = "", **fields) -> Page:
+        return Page(
+            content=content,
+            content_length=len(content),
+            page=page_number,
+            completion_time=(time.perf_counter() - start) * 1000,
+            retries=max(0, attempts - 1),
+            encode_time=encode_time,
+            model_latency=model_latency,
+            payload_bytes=payload_bytes,
+            image_width=image_size[0] if image_size else 0,
+            image_height=image_size[1] if image_size else 0,
+            **fields,
+        )
+
+    try:
+        image_size, payload_bytes = await asyncio.to_thread(_image_stats, image_path, image_bytes)
+
+        if blank_page_thresholds is not None:
+            if await asyncio.to_thread(is_blank_page, image_bytes or image_path, blank_page_thresholds):
+                return make_page(provenance="blank")
+
+        if page_hash_index is not None:
+            hash_context = make_cache_key(b"", model.model, model.system_prompt, prior_page, model.kwargs)
+            fingerprint = await asyncio.to_thread(page_fingerprint, image_bytes or image_path)
+            group_result, is_representative = page_hash_index.claim(hash_context, fingerprint)
+            if is_representative:
+                representative = group_result
+            else:
+                ## a failed representative resolves to None, this page is then processed on its own
+                content = await group_result
+                if content is not None:
+                    return make_page(content, provenance="duplicate")
+
+        cache_key = None
+        if cache is not None:
+            if image_bytes is None:
+                ## read once, the bytes are reused for the completion on a miss
+                async with aiofiles.open(image_path, "rb") as image_file:
+                    image_bytes = await image_file.read()
+            cache_key = make_cache_key(
+                image_bytes, model.model, model.system_prompt, prior_page, model.kwargs
+            )
+            cached = await cache.get(cache_key)
+            if cached is not None:
+                markdown = format_markdown(cached.content)
+                return make_page(markdown, cache_hit=True)
+
+        async def request():
+            nonlocal attempts, encode_time, model_latency
+            attempts += 1
+            attempt_start = time.perf_counter()
+            try:
+                with track_request() if track_request is not None else contextlib.nullcontext():
+                    completion = await model.completion(
+                        image_path=image_path,
+                        maintain_format=True,
+                        prior_page=prior_page,
+                        image_bytes=image_bytes,
+                    )
+            except Exception as error:
+                model_latency += (time.perf_counter() - attempt_start) * 1000
+                if limiter is not None:
+                    limiter.record((time.perf_counter() - attempt_start) * 1000, error)
+                raise
+
+            ## the model reports how long preparing the request took, the rest is the model call itself
+            attempt_latency = (time.perf_counter() - attempt_start) * 1000 - completion.encode_time
+            encode_time += completion.encode_time
+            model_latency += attempt_latency
+            if limiter is not None:
+                limiter.record(attempt_latency, output_tokens=completion.output_tokens)
+            return completion
+
+        # Get the completion from LiteLLM
+        if scheduler is not None:
+            estimated_tokens = 0
+            if scheduler.tracks_tokens:
+                if image_size is None:
+                    image_size = await asyncio.to_thread(get_image_size, image_bytes or image_path)
+                estimated_tokens = estimate_request_tokens(
+                    image_size, model.model, model.system_prompt, prior_page
+                )
+            completion = await scheduler.run(request, estimated_tokens)
+            scheduler.record_usage(estimated_tokens, completion.input_tokens + completion.output_tokens)
+        else:
+            completion = await request()
+
+        if cache_key is not None:
+            await cache.set(cache_key, completion)
+
+        markdown = format_markdown(completion.content)
+        return make_page(
+            markdown,
+            input_tokens=completion.input_tokens,
+            output_tokens=completion.output_tokens,
+        )
+
+    except Exception as error:
+        logging.error(f"{Messages.FAILED_TO_PROCESS_IMAGE} Error:{error}")
+        return make_page()
+
+    finally:
+        if representative is not None:
+            page_hash_index.resolve(hash_context, representative, markdown)
+
+
 async def process_page(
-    image: str,
+    image: Union[str, bytes],
     model: litellmmodel,
     temp_directory: str = "",
     input_token_count: int = 0,
     output_token_count: int = 0,
     prior_page: str = "",
     semaphore: Optional[asyncio.Semaphore] = None,
+    cache: Optional[BaseCache] = None,
+    scheduler: Optional[RequestScheduler] = None,
+    blank_page_thresholds: Optional[BlankPageThresholds] = None,
+    page_hash_index: Optional[PageHashIndex] = None,
 ) -> Tuple[str, int, int, str]:
-    """Process a single page of a PDF"""
+    """Process a single page of a PDF, the image can be a path (relative to temp_directory) or PNG encoded bytes"""
 
     # If semaphore is provided, acquire it before processing the page
     if semaphore:
@@ -54,38 +436,41 @@ async def process_page(
                 input_token_count,
                 output_token_count,
                 prior_page,
+                cache=cache,
+                scheduler=scheduler,
+                blank_page_thresholds=blank_page_thresholds,
+                page_hash_index=page_hash_index,
             )
 
-    image_path = os.path.join(temp_directory, image)
-
-    # Get the completion from LiteLLM
-    try:
-        completion = await model.completion(
-            image_path=image_path,
-            maintain_format=True,
-            prior_page=prior_page,
-        )
+    page = await ocr_page(
+        image,
+        model,
+        temp_directory,
+        prior_page,
+        cache=cache,
+        scheduler=scheduler,
+        blank_page_thresholds=blank_page_thresholds,
+        page_hash_index=page_hash_index,
+    )
 
-        formatted_markdown = format_markdown(completion.content)
-        input_token_count += completion.input_tokens
-        output_token_count += completion.output_tokens
-        prior_page = formatted_markdown
-
-        return formatted_markdown, input_token_count, output_token_count, prior_page
-
-    except Exception as error:
-        logging.error(f"{Messages.FAILED_TO_PROCESS_IMAGE} Error:{error}")
-        return "", input_token_count, output_token_count, ""
+    ## failed pages come back empty, which also resets the prior page
+    input_token_count += page.input_tokens
+    output_token_count += page.output_tokens
+    return page.content, input_token_count, output_token_count, page.content
 
 
 async def process_pages_in_batches(
-    images: List[str],
+    images: List[Union[str, bytes]],
     concurrency: int,
     model: litellmmodel,
     temp_directory: str = "",
     input_token_count: int = 0,
     output_token_count: int = 0,
     prior_page: str = "",
+    cache: Optional[BaseCache] = None,
+    scheduler: Optional[RequestScheduler] = None,
+    blank_page_thresholds: Optional[BlankPageThresholds] = None,
+    page_hash_index: Optional[PageHashIndex] = None,
 ):
     # Create a semaphore to limit the number of concurrent tasks
     semaphore = asyncio.Semaphore(concurrency)
@@ -100,9 +485,137 @@ async def process_pages_in_batches(
             output_token_count,
             prior_page,
             semaphore,
+            cache,
+            scheduler,
+            blank_page_thresholds,
+            page_hash_index,
         )
         for image in images
     ]
 
     # Wait for all tasks to complete
     return await asyncio.gather(*tasks)
+
+
+async def _iterate(images: Union[Iterable[Union[str, bytes]], AsyncIterable[Union[str, bytes]]]) -> AsyncIterator[Union[str, bytes]]:
+    """Iterates over either a regular or an async iterable of images."""
+    if hasattr(images, "__aiter__"):
+        async for image in images:
+            yield image
+    else:
+        for image in images:
+            yield image
+
+
+async def process_pages_as_completed(
+    images: Union[Iterable[Union[str, bytes]], AsyncIterable[Union[str, bytes]]],
+    concurrency: Union[int, asyncio.Semaphore, AdaptiveConcurrencyLimiter],
+    model: litellmmodel,
+    temp_directory: str = "",
+    prior_page: str = "",
+    ordered: bool = False,
+    page_numbers: Optional[List[int]] = None,
+    cache: Optional[BaseCache] = None,
+    scheduler: Optional[RequestScheduler] = None,
+    blank_page_thresholds: Optional[BlankPageThresholds] = None,
+    page_hash_index: Optional[PageHashIndex] = None,
+    reorder_window: int = PDFConversionDefaultOptions.REORDER_WINDOW,
+    track_request: Optional[Callable[[], ContextManager]] = None,
+) -> AsyncIterator[Tuple[int, Page]]:
+    """
+    Process pages concurrently and yield each result as soon as it is available.
+
+    ``images`` may be an async iterable (e.g. :func:`iter_pdf_images`), the next image is only pulled once a
+    concurrency slot is free, so a pipelined producer is never drained faster than the model can consume it.
+
+    Yields ``(index, page)`` where ``index`` is the position of the image in ``images`` and ``page`` is the
+    :class:`Page` returned by :func:`ocr_page`, numbered from ``page_numbers`` (defaults to ``index + 1``).
+    Its completion time is measured from the moment the page acquired a concurrency slot.
+    When ``ordered`` is True, results are held back until every earlier page has been yielded. A page is then only started
+    within ``reorder_window`` pages of the earliest page not yet yielded, so one slow page stalls the dispatch instead of
+    the held back pages piling up behind it.
+
+    ``concurrency`` is either a fixed number of concurrent pages, a semaphore shared with other documents (pages of all
+    documents then take turns for its slots) or an :class:`AdaptiveConcurrencyLimiter`, which is then fed back with the
+    outcome of every model call. ``track_request`` wraps every model call, see :func:`ocr_page`.
+    """
+    # Create a semaphore to limit the number of concurrent tasks, unless a shared semaphore or adaptive limiter is given
+    if isinstance(concurrency, AdaptiveConcurrencyLimiter):
+        semaphore, limiter = concurrency, concurrency
+    elif isinstance(concurrency, asyncio.Semaphore):
+        semaphore, limiter = concurrency, None
+    else:
+        semaphore, limiter = asyncio.Semaphore(concurrency), None
+    completed: asyncio.Queue = asyncio.Queue()
+    tasks: List[asyncio.Task] = []
+    ## ordered mode only, a slot is taken when a page is dispatched and given back once it is yielded in order
+    window = asyncio.Semaphore(max(1, reorder_window)) if ordered else None
+
+    async def run_page(index: int, image: Union[str, bytes], queue_wait: float):
+        try:
+            page_number = page_numbers[index] if page_numbers is not None else index + 1
+            page = await ocr_page(
+                image,
+                model,
+                temp_directory,
+                prior_page,
+                page_number,
+                cache,
+                scheduler,
+                limiter,
+                blank_page_thresholds,
+                page_hash_index,
+                track_request,
+            )
+            page.queue_wait = queue_wait
+            completed.put_nowait((index, page))
+        finally:
+            semaphore.release()
+
+    async def dispatch_pages():
+        try:
+            index = 0
+            async for image in _iterate(images):
+                queued = time.perf_counter()
+                if window is not None:
+                    await window.acquire()
+                await semaphore.acquire()
+                queue_wait = (time.perf_counter() - queued) * 1000
+                tasks.append(asyncio.create_task(run_page(index, image, queue_wait)))
+                index += 1
+            await asyncio.gather(*tasks)
+            completed.put_nowait(None)
+        except Exception as err:
+            completed.put_nowait(err)
+
+    dispatcher = asyncio.create_task(dispatch_pages())
+
+    # Out of order results waiting for their predecessors (ordered mode only)
+    held_back: Dict[int, Page] = {}
+    next_index = 0
+
+    try:
+        while True:
+            item = await completed.get()
+            if item is None:
+                break
+            if isinstance(item, Exception):
+                raise item
+
+            index, page = item
+
+            if not ordered:
+                yield index, page
+                continue
+
+            held_back[index] = page
+            while next_index in held_back:
+                yield next_index, held_back.pop(next_index)
+                next_index += 1
+                window.release()
+    finally:
+        # Consumer stopped early, don't leave rendering or model calls running in the background
+        dispatcher.cancel()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(dispatcher, *tasks, return_exceptions=True)
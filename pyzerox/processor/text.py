@@ -1,7 +1,11 @@
 import re
+from typing import Iterable, List, Optional
 
 # Package imports
+from ..constants import FormatTemplateDefaultOptions
 from ..constants.patterns import Patterns
+from ..core.types import PriorPageContext
+from ..scheduler.tokens import CHARS_PER_TOKEN
 
 
 def format_markdown(text: str) -> str:
@@ -10,3 +14,104 @@ def format_markdown(text: str) -> str:
     formatted_markdown = re.sub(Patterns.MATCH_MARKDOWN_BLOCKS, r"\1", text)
     formatted_markdown = re.sub(Patterns.MATCH_CODE_BLOCKS, r"\1", formatted_markdown)
     return formatted_markdown
+
+
+def derive_format_template(
+    pages: Iterable[str],
+    max_length: int = FormatTemplateDefaultOptions.MAX_LENGTH,
+) -> str:
+    """
+    Reduces the markdown of anchor pages to a format template for the pages processed after them.
+    Keeps the headings, the first rows of every table, the first item of every list and the start of every paragraph, up to max_length characters.
+    """
+    template_lines = []
+    for page in pages:
+        previous = ""
+        table_rows = 0
+        for line in page.splitlines():
+            line = line.rstrip()
+            if not line:
+                if template_lines and template_lines[-1]:
+                    template_lines.append("")
+                previous = ""
+                continue
+
+            if line.lstrip().startswith("|"):
+                table_rows = table_rows + 1 if previous == "table" else 1
+                keep = table_rows <= FormatTemplateDefaultOptions.TABLE_ROWS
+                kind = "table"
+            elif line.lstrip().startswith("#"):
+                keep, kind = True, "heading"
+            elif re.match(Patterns.MATCH_LIST_ITEM, line):
+                keep, kind = previous != "list", "list"
+            else:
+                ## continuation lines of a list item or paragraph belong to it
+                kind = previous if previous in ("list", "paragraph") else "paragraph"
+                keep = previous != kind
+                line = line[: FormatTemplateDefaultOptions.SAMPLE_LENGTH]
+
+            if keep:
+                template_lines.append(line)
+            previous = kind
+
+        if template_lines and template_lines[-1]:
+            template_lines.append("")
+
+    return "\n".join(template_lines).strip()[:max_length]
+
+
+def _tail_lines(lines: List[str], max_length: int) -> List[str]:
+    """The last lines fitting in max_length characters, the end of a single longer line otherwise."""
+    tail: List[str] = []
+    length = 0
+    for line in reversed(lines):
+        if length + len(line) + 1 > max_length:
+            break
+        tail.insert(0, line)
+        length += len(line) + 1
+    if not tail and lines:
+        tail = [lines[-1][-max_length:]]
+    return tail
+
+
+def reduce_prior_page(markdown: str, context: Optional[PriorPageContext] = None) -> str:
+    """
+    Reduces the markdown of the previous page to the context sent along with the next page, within context.max_tokens
+    (estimated) tokens. The end of the page matters most: it is where the next page carries on, e.g. a table spanning both.
+    """
+    if context is None or context.policy == "full":
+        return markdown
+
+    max_length = context.max_tokens * CHARS_PER_TOKEN
+    if len(markdown) <= max_length:
+        return markdown
+    if context.policy == "summary":
+        return derive_format_template([markdown], max_length)
+
+    lines = markdown.rstrip().splitlines()
+    if not lines:
+        return ""
+    if context.policy == "truncate":
+        return "\n".join(_tail_lines(lines, max_length))
+
+    # structural tail: the heading of the last section and the header of the table the page ends in, then the end of the page
+    structure: List[int] = []
+    heading = next((index for index in range(len(lines) - 1, -1, -1) if lines[index].lstrip().startswith("#")), None)
+    if heading is not None:
+        structure.append(heading)
+    if lines[-1].lstrip().startswith("|"):
+        table_start = len(lines) - 1
+        while table_start > 0 and lines[table_start - 1].lstrip().startswith("|"):
+            table_start -= 1
+        structure.extend(index for index in (table_start, table_start + 1) if index < len(lines) and index != heading)
+
+    structure_length = sum(len(lines[index]) + 1 for index in structure) + 4
+    if structure_length > max_length // 2:
+        structure, structure_length = [], 0
+    tail = _tail_lines(lines, max_length - structure_length)
+    tail_start = len(lines) - len(tail)
+
+    head = [lines[index] for index in sorted(structure) if index < tail_start]
+    if head and max(index for index in structure if index < tail_start) + 1 < tail_start:
+        head.append("...")
+    return "\n".join(head + tail)
@@ -0,0 +1,125 @@
+import re
+from typing import Dict, Iterable, List, Optional
+from PyPDF2 import PdfReader
+
+# Package Imports
+from ..constants import TextLayerDefaultOptions
+from .utils import validate_page_numbers
+
+## glyphs without a unicode mapping are extracted as "(cid:123)"
+CID_PATTERN = re.compile(r"\(cid:\d+\)")
+LIST_ITEM_PATTERN = re.compile(r"^\s*([-*•▪◦·]|\d+[.)]|[a-zA-Z][.)])\s+")
+BULLET_PATTERN = re.compile(r"^\s*[•▪◦·]\s+")
+
+
+def score_text_layer(text: str) -> float:
+    """
+    Scores (0 - 1) how usable the extracted text layer of a page is.
+    Penalizes short text, unmapped or unprintable glyphs and word salad from broken extraction,
+    as well as table-like pages (mostly numbers, glued cells) whose layout is lost in plain text.
+    """
+    stripped = (text or "").strip()
+    if not stripped:
+        return 0.0
+
+    if CID_PATTERN.search(stripped):
+        return 0.0
+
+    characters = [character for character in stripped if not character.isspace()]
+    readable_characters = sum(
+        1
+        for character in characters
+        ## replacement character and private use area glyphs come from fonts without a unicode mapping
+        if character.isprintable()
+        and character != "\ufffd"
+        and not ("\ue000" <= character <= "\uf8ff")
+    )
+    readable_ratio = readable_characters / len(characters)
+
+    words = stripped.split()
+    word_like = sum(
+        1
+        for word in words
+        if any(character.isalnum() for character in word)
+        and len(word) <= TextLayerDefaultOptions.MAX_WORD_LENGTH
+    )
+    word_ratio = word_like / len(words)
+
+    length_score = min(1.0, len(characters) / TextLayerDefaultOptions.MIN_CHARS)
+
+    numeric_words = sum(1 for word in words if not any(character.isalpha() for character in word))
+    ## a lowercase letter directly followed by an uppercase one, e.g. table cells glued together ("PhíThưởng")
+    glued_words = sum(
+        1 for word in words if any(a.islower() and b.isupper() for a, b in zip(word, word[1:]))
+    )
+    layout_score = max(0.0, 1.0 - (numeric_words + glued_words) / len(words))
+
+    return readable_ratio * word_ratio * length_score * layout_score
+
+
+def text_layer_to_markdown(text: str) -> str:
+    """Converts the extracted text of a page to markdown paragraphs, keeping list items on their own lines."""
+    paragraphs: List[str] = []
+    current: List[str] = []
+
+    def flush():
+        if current:
+            paragraphs.append(" ".join(current))
+            current.clear()
+
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            flush()
+        elif LIST_ITEM_PATTERN.match(line):
+            flush()
+            paragraphs.append(BULLET_PATTERN.sub("- ", line))
+        else:
+            current.append(line)
+    flush()
+
+    # consecutive list items belong to the same list
+    markdown = ""
+    for index, paragraph in enumerate(paragraphs):
+        if index:
+            is_list = LIST_ITEM_PATTERN.match(paragraph) and LIST_ITEM_PATTERN.match(paragraphs[index - 1])
+            markdown += "\n" if is_list else "\n\n"
+        markdown += paragraph
+    return markdown
+
+
+def extract_text_layer(
+    pdf_path: str,
+    select_pages: Optional[Iterable[int]] = None,
+    threshold: float = TextLayerDefaultOptions.QUALITY_THRESHOLD,
+) -> Dict[int, Optional[str]]:
+    """
+    Reads the embedded text layer of the PDF pages and converts the usable ones to markdown.
+
+    :param pdf_path: Path to the PDF file.
+    :type pdf_path: str
+    :param select_pages: The (1-indexed) pages to read, defaults to None (all pages)
+    :type select_pages: Iterable[int], optional
+    :param threshold: The minimum :func:`score_text_layer` score for a page to skip the vision model, defaults to TextLayerDefaultOptions.QUALITY_THRESHOLD
+    :type threshold: float, optional
+    :return: Page number to markdown, None for the pages which need the vision model, in page order.
+    """
+    with open(pdf_path, "rb") as pdf_file:
+        reader = PdfReader(stream=pdf_file)
+        total_pages = len(reader.pages)
+
+        page_numbers = sorted(select_pages) if select_pages is not None else range(1, total_pages + 1)
+        validate_page_numbers(list(page_numbers), total_pages)
+
+        text_layer: Dict[int, Optional[str]] = {}
+        for page_number in page_numbers:
+            try:
+                text = reader.pages[page_number - 1].extract_text() or ""
+            except Exception:
+                ## unreadable text layer, leave the page to the vision model
+                text = ""
+            text_layer[page_number] = (
+                text_layer_to_markdown(text) if score_text_layer(text) >= threshold else None
+            )
+
+    return text_layer
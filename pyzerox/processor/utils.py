@@ -1,35 +1,208 @@
+import asyncio
+import contextlib
 import os
 import re
-from typing import Optional, Union, Iterable
+import shutil
+from typing import AsyncIterator, Optional, Union, Iterable
 from urllib.parse import urlparse
 import aiofiles
 import aiohttp
 from PyPDF2 import PdfReader, PdfWriter
+from ..constants import DownloadDefaultOptions
 from ..constants.messages import Messages
 
 # Package Imports
-from ..errors.exceptions import ResourceUnreachableException, PageNumberOutOfBoundError
+from ..core.types import DownloadLimits
+from ..errors.exceptions import (
+    DownloadLimitExceeded,
+    FileUnavailable,
+    ResourceUnreachableException,
+    PageNumberOutOfBoundError,
+)
+from ..scheduler.retry import RETRYABLE_STATUS_CODES, backoff_delay
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
+## linux ioctl cloning a file's extents into another file (reflink)
+FICLONE = 0x40049409
+
+
+## one session (connection pool) shared by the downloads running at the same time, e.g. the documents of a zerox batch
+_shared_session: Optional[aiohttp.ClientSession] = None
+_shared_session_loop: Optional[asyncio.AbstractEventLoop] = None
+_shared_session_users = 0
+
+
+@contextlib.asynccontextmanager
+async def shared_http_session() -> AsyncIterator[aiohttp.ClientSession]:
+    """
+    Yields the aiohttp session shared by every download of the running event loop, its connections are reused across calls.
+    The session is closed once its last user is done, hold it around a whole workload to keep the pool alive between downloads.
+    """
+    global _shared_session, _shared_session_loop, _shared_session_users
+
+    loop = asyncio.get_running_loop()
+    if _shared_session is None or _shared_session.closed or _shared_session_loop is not loop:
+        _shared_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=DownloadDefaultOptions.CONNECTION_LIMIT,
+                limit_per_host=DownloadDefaultOptions.CONNECTION_LIMIT_PER_HOST,
+            )
+        )
+        _shared_session_loop, _shared_session_users = loop, 0
+
+    session = _shared_session
+    _shared_session_users += 1
+    try:
+        yield session
+    finally:
+        if session is _shared_session:
+            _shared_session_users -= 1
+            if _shared_session_users == 0:
+                _shared_session, _shared_session_loop = None, None
+                await session.close()
+
+
+def _expected_size(response: aiohttp.ClientResponse) -> Optional[int]:
+    """The full size of the file, from the Content-Range of a partial response or the Content-Length of a full one."""
+    if response.status == 206:
+        total = response.headers.get("Content-Range", "").rpartition("/")[2]
+        return int(total) if total.isdigit() else None
+    return response.content_length
+
+
+async def _download_url(
+    url: str,
+    local_path: str,
+    limits: DownloadLimits,
+    session: aiohttp.ClientSession,
+) -> None:
+    """Streams a URL to local_path in chunks, resuming with a range request after a dropped connection or a transient server error."""
+    downloaded = 0
+    ## ETag or Last-Modified of the file, resumed ranges must come from the same version of it
+    validator: Optional[str] = None
+    timeout = aiohttp.ClientTimeout(total=None, sock_read=limits.read_timeout)
+
+    async with aiofiles.open(local_path, "wb") as file:
+        for attempt in range(limits.max_retries + 1):
+            if attempt:
+                await asyncio.sleep(backoff_delay(attempt - 1))
+
+            headers = {}
+            if downloaded:
+                headers["Range"] = f"bytes={downloaded}-"
+                if validator:
+                    headers["If-Range"] = validator
+
+            try:
+                async with session.get(url, headers=headers, timeout=timeout) as response:
+                    if response.status in RETRYABLE_STATUS_CODES and attempt < limits.max_retries:
+                        continue
+                    if response.status == 416 and response.headers.get("Content-Range") == f"bytes */{downloaded}":
+                        ## the connection dropped after the last byte, nothing left to resume
+                        return
+                    if response.status not in (200, 206):
+                        raise ResourceUnreachableException(
+                            Messages.FILE_UNREACHAGBLE.format(response.status), extra_info={"url": url}
+                        )
+
+                    if response.status == 200 and downloaded:
+                        ## the server ignored the range or the file changed, start over
+                        await file.seek(0)
+                        await file.truncate()
+                        downloaded = 0
+                    validator = validator or response.headers.get("ETag") or response.headers.get("Last-Modified")
+
+                    expected_size = _expected_size(response)
+                    if limits.max_size is not None and expected_size is not None and expected_size > limits.max_size:
+                        raise DownloadLimitExceeded(Messages.DOWNLOAD_TOO_LARGE.format(limits.max_size), extra_info={"url": url})
+
+                    async for chunk in response.content.iter_chunked(DownloadDefaultOptions.CHUNK_SIZE):
+                        downloaded += len(chunk)
+                        if limits.max_size is not None and downloaded > limits.max_size:
+                            raise DownloadLimitExceeded(Messages.DOWNLOAD_TOO_LARGE.format(limits.max_size), extra_info={"url": url})
+                        await file.write(chunk)
+                    return
+
+            except aiohttp.ClientError as err:
+                ## dropped connections and stalled reads are resumed from what made it to disk
+                if attempt < limits.max_retries:
+                    continue
+                if isinstance(err, aiohttp.ServerTimeoutError):
+                    ## also a TimeoutError, which would be reported as the whole download running out of time
+                    raise ResourceUnreachableException(
+                        Messages.DOWNLOAD_STALLED.format(limits.read_timeout, attempt + 1), extra_info={"url": url}
+                    ) from err
+                raise
+
+
+def link_or_copy(source: str, destination: str) -> str:
+    """
+    Materializes the source file at destination, without copying its data whenever the file system allows it:
+    a hard link, then a reflink (copy-on-write clone, e.g. btrfs, XFS), and only then a regular copy.
+    """
+    try:
+        os.link(source, destination)
+        return destination
+    except OSError:
+        pass
+
+    if fcntl is not None:
+        try:
+            with open(source, "rb") as src, open(destination, "wb") as dst:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            return destination
+        except OSError:
+            pass
+
+    ## copyfile uses the kernel side copy (sendfile / copy_file_range) where available
+    shutil.copyfile(source, destination)
+    return destination
 
 
 async def download_file(
     file_path: str,
     temp_dir: str,
+    limits: Optional[DownloadLimits] = None,
+    session: Optional[aiohttp.ClientSession] = None,
+    in_place: bool = True,
 ) -> Optional[str]:
-    """Downloads a file from a URL or local path to a temporary directory."""
+    """
+    Downloads a file from a URL or local path to a temporary directory.
+
+    URLs are streamed to disk in chunks and resumed with range requests after partial failures, within the size and
+    time ``limits`` (:class:`DownloadLimits` defaults). The connections come from ``session`` or the :func:`shared_http_session`.
+
+    Local files are only read, so by default they are used in place and their path is returned as is.
+    With ``in_place`` False they are linked (or copied as a fallback) into the temp_dir, see :func:`link_or_copy`.
+    """
+    limits = limits or DownloadLimits()
 
-    local_pdf_path = os.path.join(temp_dir, os.path.basename(file_path))
     if is_valid_url(file_path):
-        async with aiohttp.ClientSession() as session:
-            async with session.get(file_path) as response:
-                if response.status != 200:
-                    raise ResourceUnreachableException()
-                async with aiofiles.open(local_pdf_path, "wb") as f:
-                    await f.write(await response.read())
+        ## the query string of presigned object store URLs is not part of the file name
+        file_name = os.path.basename(urlparse(file_path).path) or "download.pdf"
+        local_pdf_path = os.path.join(temp_dir, file_name)
+        try:
+            async with asyncio.timeout(limits.timeout):
+                if session is not None:
+                    await _download_url(file_path, local_pdf_path, limits, session)
+                else:
+                    async with shared_http_session() as shared_session:
+                        await _download_url(file_path, local_pdf_path, limits, shared_session)
+        except TimeoutError as err:
+            raise DownloadLimitExceeded(Messages.DOWNLOAD_TIMED_OUT.format(limits.timeout), extra_info={"url": file_path}) from err
     else:
-        async with aiofiles.open(file_path, "rb") as src, aiofiles.open(
-            local_pdf_path, "wb"
-        ) as dst:
-            await dst.write(await src.read())
+        if not os.path.isfile(file_path):
+            raise FileUnavailable(extra_info={"file_path": file_path})
+
+        local_pdf_path = file_path
+        if not in_place:
+            local_pdf_path = await asyncio.to_thread(
+                link_or_copy, file_path, os.path.join(temp_dir, os.path.basename(file_path))
+            )
     return local_pdf_path
 
 
@@ -45,6 +218,15 @@ def is_valid_url(string: str) -> bool:
     except ValueError:
         return False
     
+def validate_page_numbers(select_pages: Iterable[int], total_pages: int) -> None:
+    """Raises PageNumberOutOfBoundError if any of the (1-indexed) page numbers is outside of a document with total_pages pages."""
+    invalid_page_numbers = [page for page in select_pages if page < 1 or page > total_pages]
+    if invalid_page_numbers:
+        raise PageNumberOutOfBoundError(extra_info={"input_pdf_num_pages": total_pages,
+                                                    "select_pages": select_pages,
+                                                    "invalid_page_numbers": invalid_page_numbers})
+
+
 def create_selected_pages_pdf(original_pdf_path: str, select_pages: Union[int, Iterable[int]], 
                               save_directory: str, suffix: str = "_selected_pages",
                               sorted_pages: bool = True) -> str:
@@ -84,16 +266,7 @@ def create_selected_pages_pdf(original_pdf_path: str, select_pages: Union[int, I
         total_pages = len(reader.pages)
 
         # Validate page numbers
-        invalid_page_numbers = []
-        for page in select_pages:
-            if page < 1 or page > total_pages:
-                invalid_page_numbers.append(page)
-
-        ## raise error if invalid page numbers
-        if invalid_page_numbers:
-            raise PageNumberOutOfBoundError(extra_info={"input_pdf_num_pages":total_pages,
-                                                        "select_pages": select_pages,
-                                                        "invalid_page_numbers": invalid_page_numbers})
+        validate_page_numbers(select_pages, total_pages)
 
         # Create a new PDF writer
         writer = PdfWriter(fileobj=new_pdf)
@@ -0,0 +1,17 @@
+from .concurrency import AdaptiveConcurrencyLimiter
+from .rate_limit import RequestScheduler, TokenBucket
+from .retry import is_retryable_error, is_rate_limit_error, get_retry_after, backoff_delay
+from .tokens import estimate_image_tokens, estimate_text_tokens, estimate_request_tokens
+
+__all__ = [
+    "AdaptiveConcurrencyLimiter",
+    "RequestScheduler",
+    "TokenBucket",
+    "is_retryable_error",
+    "is_rate_limit_error",
+    "get_retry_after",
+    "backoff_delay",
+    "estimate_image_tokens",
+    "estimate_text_tokens",
+    "estimate_request_tokens",
+]
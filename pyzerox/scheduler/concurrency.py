@@ -0,0 +1,166 @@
+import asyncio
+import time
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+
+# Package Imports
+from .retry import is_retryable_error
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Concurrency limiter with an AIMD (additive increase, multiplicative decrease) limit, usable in place of an asyncio.Semaphore.
+
+    Every model attempt is fed back through :meth:`record`. While requests succeed and the smoothed latency stays within
+    ``latency_tolerance`` times the best latency seen, the limit grows by one per limit's worth of successes.
+    Attempts reporting their output tokens are compared per token (plus ``latency_overhead_tokens`` for the fixed part of a
+    request), since a page's latency mostly depends on how much markdown it produces rather than on the provider's load.
+    Rate limits, timeouts and server errors cut the limit by ``backoff_ratio``, a latency build up cuts it by ``latency_backoff_ratio``.
+    Decreases are applied at most once per smoothed latency, so a burst of failures from the same window only counts once.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 10,
+        min_limit: int = 1,
+        max_limit: int = 100,
+        backoff_ratio: float = 0.5,
+        latency_backoff_ratio: float = 0.9,
+        latency_tolerance: float = 2.0,
+        smoothing: float = 0.2,
+        latency_overhead_tokens: int = 100,
+    ):
+        """
+        :param initial_limit: The starting number of concurrent requests, defaults to 10
+        :type initial_limit: int, optional
+        :param min_limit: The lowest limit the controller backs off to, defaults to 1
+        :type min_limit: int, optional
+        :param max_limit: The highest limit the controller grows to, defaults to 100
+        :type max_limit: int, optional
+        :param backoff_ratio: Factor applied to the limit on rate limits, timeouts and server errors, defaults to 0.5
+        :type backoff_ratio: float, optional
+        :param latency_backoff_ratio: Factor applied to the limit when latency builds up, defaults to 0.9
+        :type latency_backoff_ratio: float, optional
+        :param latency_tolerance: How many times the best observed latency the smoothed latency may reach before backing off, defaults to 2.0
+        :type latency_tolerance: float, optional
+        :param smoothing: Weight of the latest sample in the exponentially smoothed latency, defaults to 0.2
+        :type smoothing: float, optional
+        :param latency_overhead_tokens: The fixed part of a request's latency (upload, prefill, time to first token) in output tokens, added to the output tokens latency is normalized by, defaults to 100
+        :type latency_overhead_tokens: int, optional
+        """
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_ratio = backoff_ratio
+        self.latency_backoff_ratio = latency_backoff_ratio
+        self.latency_tolerance = latency_tolerance
+        self.smoothing = smoothing
+        self.latency_overhead_tokens = latency_overhead_tokens
+
+        self._limit = float(min(max(initial_limit, min_limit), max_limit))
+        self._in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._started_at = time.monotonic()
+        self._last_decrease_at = 0.0
+        self._successes = 0
+
+        ## in ms, or ms per output token once attempts report their output tokens
+        self.min_latency: Optional[float] = None
+        self.smoothed_latency: Optional[float] = None
+        ## the decrease cooldown is one request's latency, in ms
+        self._smoothed_request_latency: Optional[float] = None
+        ## (seconds since creation, limit) every time the effective limit changes
+        self.history: List[Tuple[float, int]] = [(0.0, self.limit)]
+
+    @property
+    def limit(self) -> int:
+        """The current number of allowed concurrent requests."""
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        """The number of requests currently holding a slot."""
+        return self._in_flight
+
+    async def acquire(self) -> None:
+        """Waits for a free slot under the current limit."""
+        while self._in_flight >= self.limit:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                elif not waiter.cancelled():
+                    ## woken up but cancelled before taking the slot, pass it on
+                    self._wake_waiters()
+                raise
+        self._in_flight += 1
+
+    def release(self) -> None:
+        """Gives a slot back."""
+        self._in_flight -= 1
+        self._wake_waiters()
+
+    async def __aenter__(self) -> "AdaptiveConcurrencyLimiter":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.release()
+
+    def record(self, latency: float, error: Optional[BaseException] = None, output_tokens: Optional[int] = None) -> None:
+        """
+        Feeds the outcome of a model attempt back into the controller.
+
+        :param latency: The attempt latency in ms.
+        :param error: The error raised by the attempt, None on success.
+        :param output_tokens: The output tokens of a successful attempt, latency is then compared per token.
+        """
+        now = time.monotonic()
+
+        if error is not None:
+            ## only throttling signals mean we are pushing the provider too hard
+            if is_retryable_error(error):
+                self._decrease(self.backoff_ratio, now)
+            return
+
+        self._smoothed_request_latency = self._smooth(self._smoothed_request_latency, latency)
+        if output_tokens is not None:
+            latency = latency / (output_tokens + self.latency_overhead_tokens)
+        self.min_latency = latency if self.min_latency is None else min(self.min_latency, latency)
+        self.smoothed_latency = self._smooth(self.smoothed_latency, latency)
+
+        if self.smoothed_latency > self.latency_tolerance * self.min_latency:
+            self._decrease(self.latency_backoff_ratio, now)
+        else:
+            self._successes += 1
+            if self._successes >= self.limit:
+                self._successes = 0
+                self._set_limit(self._limit + 1)
+
+    def _smooth(self, smoothed: Optional[float], sample: float) -> float:
+        return sample if smoothed is None else (1 - self.smoothing) * smoothed + self.smoothing * sample
+
+    def _decrease(self, ratio: float, now: float) -> None:
+        cooldown = (self._smoothed_request_latency or 0) / 1000
+        if now - self._last_decrease_at < cooldown:
+            return
+        self._last_decrease_at = now
+        self._successes = 0
+        self._set_limit(self._limit * ratio)
+
+    def _set_limit(self, limit: float) -> None:
+        previous = self.limit
+        self._limit = min(max(limit, self.min_limit), self.max_limit)
+        if self.limit != previous:
+            self.history.append((time.monotonic() - self._started_at, self.limit))
+            self._wake_waiters()
+
+    def _wake_waiters(self) -> None:
+        free_slots = self.limit - self._in_flight
+        while free_slots > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free_slots -= 1
@@ -0,0 +1,144 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+
+# Package Imports
+from .retry import backoff_delay, get_retry_after, is_retryable_error
+
+T = TypeVar("T")
+
+
+class TokenBucket:
+    """
+    Async token bucket refilled continuously at ``capacity`` tokens per ``period`` seconds.
+    Waiters are served in FIFO order. The balance may go negative when usage is corrected after the fact.
+    """
+
+    def __init__(self, capacity: float, period: float = 60.0):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self, amount: float = 1) -> None:
+        """Waits until ``amount`` tokens are available and takes them. Requests larger than the capacity wait for a full bucket."""
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def adjust(self, amount: float) -> None:
+        """Takes (positive) or gives back (negative) tokens without waiting, e.g. to correct an estimate with the actual usage."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class RequestScheduler:
+    """
+    Schedules model requests within requests-per-minute and tokens-per-minute budgets,
+    and retries transient failures (rate limits, timeouts, server errors) with jittered exponential backoff.
+    A Retry-After sent by the provider pauses every request going through the scheduler.
+
+    A single scheduler can be shared by concurrent zerox calls to keep all of them within the provider limits.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        max_retries: int = 3,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+    ):
+        """
+        :param requests_per_minute: Requests per minute budget, defaults to None (unlimited)
+        :type requests_per_minute: int, optional
+        :param tokens_per_minute: Tokens per minute budget, requests are admitted on their estimated tokens, defaults to None (unlimited)
+        :type tokens_per_minute: int, optional
+        :param max_retries: Maximum number of retries of a failed request, defaults to 3
+        :type max_retries: int, optional
+        :param base_delay: Base delay (seconds) of the exponential backoff, defaults to 1.0
+        :type base_delay: float, optional
+        :param max_delay: Maximum delay (seconds) between two attempts, defaults to 60.0
+        :type max_delay: float, optional
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self._token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._paused_until = 0.0
+
+    @property
+    def tracks_tokens(self) -> bool:
+        """Whether requests need a token estimate to be admitted."""
+        return self._token_bucket is not None
+
+    async def _wait_for_pause(self) -> None:
+        delay = self._paused_until - time.monotonic()
+        while delay > 0:
+            await asyncio.sleep(delay)
+            delay = self._paused_until - time.monotonic()
+
+    async def _admit(self, estimated_tokens: int) -> None:
+        await self._wait_for_pause()
+        if self._request_bucket is not None:
+            await self._request_bucket.acquire(1)
+        if self._token_bucket is not None and estimated_tokens:
+            await self._token_bucket.acquire(estimated_tokens)
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """Corrects the tokens per minute budget once the actual usage of an admitted request is known."""
+        if self._token_bucket is not None:
+            self._token_bucket.adjust(actual_tokens - estimated_tokens)
+
+    async def run(
+        self,
+        request: Callable[[], Awaitable[T]],
+        estimated_tokens: int = 0,
+    ) -> T:
+        """
+        Runs the request within the budgets, retrying retryable errors.
+        Every attempt takes a request from the requests per minute budget, the estimated tokens are only taken once per
+        request (by its first attempt), matching the single :meth:`record_usage` correction.
+
+        :param request: Factory creating a new awaitable for every attempt.
+        :param estimated_tokens: The estimated tokens of the request, used for the tokens per minute budget.
+        :return: The result of the request.
+        """
+        attempt = 0
+        while True:
+            await self._admit(estimated_tokens if attempt == 0 else 0)
+            try:
+                return await request()
+            except Exception as error:
+                if attempt >= self.max_retries or not is_retryable_error(error):
+                    raise
+
+                retry_after = get_retry_after(error)
+                if retry_after is not None:
+                    ## the provider asked everyone to slow down, not just this request
+                    self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+                    delay = retry_after
+                else:
+                    delay = backoff_delay(attempt, self.base_delay, self.max_delay)
+
+                logging.warning(
+                    f"Retryable model error, retrying in {delay:.2f}s (attempt {attempt + 1}/{self.max_retries}): {error}"
+                )
+                await asyncio.sleep(delay)
+                attempt += 1
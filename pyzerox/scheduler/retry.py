@@ -0,0 +1,76 @@
+import asyncio
+import random
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Optional
+
+## HTTP status codes worth retrying: timeouts, conflicts, rate limits and transient server errors
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+
+
+def _root_error(error: BaseException) -> BaseException:
+    """Unwraps errors re-raised by the model interface (raise ... from err) to the provider error."""
+    while error.__cause__ is not None:
+        error = error.__cause__
+    return error
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """Whether the error is transient (rate limit, timeout, connection or server error) and the request can be retried."""
+    error = _root_error(error)
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    return getattr(error, "status_code", None) in RETRYABLE_STATUS_CODES
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """Whether the error is a rate limit (429) response from the provider."""
+    return getattr(_root_error(error), "status_code", None) == 429
+
+
+def _get_header(headers: Any, name: str) -> Optional[str]:
+    if not headers:
+        return None
+    try:
+        return headers.get(name) or headers.get(name.title())
+    except AttributeError:
+        return None
+
+
+def get_retry_after(error: BaseException) -> Optional[float]:
+    """Returns the delay (seconds) requested by the provider through the Retry-After header of the error response, if any."""
+    error = _root_error(error)
+    response = getattr(error, "response", None)
+
+    for headers in (
+        getattr(error, "headers", None),
+        getattr(error, "litellm_response_headers", None),
+        getattr(response, "headers", None),
+    ):
+        retry_after_ms = _get_header(headers, "retry-after-ms")
+        if retry_after_ms:
+            try:
+                return max(0.0, float(retry_after_ms) / 1000)
+            except ValueError:
+                pass
+
+        retry_after = _get_header(headers, "retry-after")
+        if not retry_after:
+            continue
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass
+        ## Retry-After can also be an HTTP date
+        try:
+            retry_at = parsedate_to_datetime(retry_after)
+            return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            pass
+
+    return None
+
+
+def backoff_delay(attempt: int, base_delay: float = 1.0, max_delay: float = 60.0) -> float:
+    """Exponential backoff with full jitter for the given (0 based) retry attempt."""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
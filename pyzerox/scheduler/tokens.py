@@ -0,0 +1,53 @@
+import math
+from typing import Optional, Tuple
+
+## OpenAI high detail image tokens: base + per 512px tile (gpt-4o-mini bills images at ~33x the rate)
+OPENAI_IMAGE_TOKENS = {
+    "gpt-4o-mini": (2833, 5667),
+    "default": (85, 170),
+}
+## Anthropic images cost roughly (width * height) / 750 tokens
+ANTHROPIC_PIXELS_PER_TOKEN = 750
+## rough characters per token for prompt text
+CHARS_PER_TOKEN = 4
+
+
+def estimate_image_tokens(width: int, height: int, model: Optional[str] = None) -> int:
+    """Estimates the input tokens billed for an image of the given size by the given model."""
+    model = (model or "").lower()
+
+    if "claude" in model:
+        return math.ceil(width * height / ANTHROPIC_PIXELS_PER_TOKEN)
+
+    # OpenAI: fit within 2048x2048, then scale the shortest side down to 768
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    tiles = math.ceil(width / 512) * math.ceil(height / 512)
+
+    base_tokens, tile_tokens = next(
+        (costs for name, costs in OPENAI_IMAGE_TOKENS.items() if name in model),
+        OPENAI_IMAGE_TOKENS["default"],
+    )
+    return base_tokens + tile_tokens * tiles
+
+
+def estimate_text_tokens(text: str) -> int:
+    """Estimates the tokens of a prompt text."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def estimate_request_tokens(
+    image_size: Tuple[int, int],
+    model: Optional[str] = None,
+    system_prompt: str = "",
+    prior_page: str = "",
+) -> int:
+    """Estimates the input tokens of a page completion request before it is sent."""
+    width, height = image_size
+    return (
+        estimate_image_tokens(width, height, model)
+        + estimate_text_tokens(system_prompt)
+        + estimate_text_tokens(prior_page)
+    )
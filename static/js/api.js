@@ -97,7 +97,9 @@ function updateProgress(data) {
         progressBar.style.width = `${data.progress}%`;
         
         let statusText = 'Đang xử lý...';
-        if (data.status.startsWith('processing_image')) {
+        if (data.status === 'queued') {
+            statusText = 'Đang chờ xử lý...';
+        } else if (data.status.startsWith('processing_image')) {
             const [_, current, total] = data.status.split('_')[2].split('/');
             statusText = `Đang xử lý ảnh ${current}/${total}`;
         } else if (data.status === 'processing_pdf') {